@@ -4,6 +4,8 @@ import numpy as np
 from PIL import Image
 import os
 
+from app.face_codec import encode_embedding
+
 # Загрузка моделей dlib
 face_detector = dlib.get_frontal_face_detector()
 shape_predictor = dlib.shape_predictor("ml_models/shape_predictor_68_face_landmarks.dat")
@@ -42,12 +44,10 @@ def save_faces_from_directory(name, directory):
             embedding = get_face_embedding(image_path)
             
             if embedding is not None:
-                encoding_str = ",".join(map(str, embedding))
                 cursor.execute(
                     "INSERT INTO faces (person_id, encoding) VALUES (?, ?)",
-                    (person_id, encoding_str)
+                    (person_id, encode_embedding(embedding))
                 )
-                print(encoding_str)
                 print(f"Лицо из {filename} добавлено для {name}.")
             else:
                 print(f"Лицо не найдено в {filename}.")
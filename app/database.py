@@ -1,5 +1,7 @@
 import os
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 from fastapi import Depends
 
@@ -10,6 +12,19 @@ SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+logger = logging.getLogger(__name__)
+
+def ensure_column(engine: Engine, table: str, column: str, ddl_type: str):
+    """Добавляет колонку в уже созданную таблицу: create_all новые колонки не добавляет"""
+    inspector = inspect(engine)
+    if table not in inspector.get_table_names():
+        return
+    if any(c["name"] == column for c in inspector.get_columns(table)):
+        return
+    logger.info(f"Adding column {table}.{column}")
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
 def get_db() -> Session:
     db = SessionLocal()
     try:
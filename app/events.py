@@ -0,0 +1,47 @@
+import itertools
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# id события: миллисекунды от EVENT_EPOCH в старших битах, затем номер процесса и счётчик.
+# id растёт вместе со временем, поэтому keyset-пагинация и фильтр по времени идут по
+# первичному ключу, а таблицу можно разбить на секции по диапазонам id
+EVENT_EPOCH = datetime(2024, 1, 1)
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+LOW_BITS = NODE_BITS + SEQUENCE_BITS
+# Допуск между временем в id и колонкой ts: id могут выдаваться чуть раньше или позже ts
+ID_TIME_SLACK = timedelta(seconds=1)
+
+_node = random.getrandbits(NODE_BITS)
+_sequence = itertools.count()
+_lock = threading.Lock()
+
+
+def to_utc(ts: datetime) -> datetime:
+    """Время без часового пояса в UTC, как в колонках DateTime"""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _millis(ts: datetime) -> int:
+    return int((to_utc(ts) - EVENT_EPOCH).total_seconds() * 1000)
+
+
+def make_event_id(ts: Optional[datetime] = None) -> int:
+    """Новый id события со временем ts (UTC, по умолчанию сейчас)"""
+    with _lock:
+        sequence = next(_sequence) & ((1 << SEQUENCE_BITS) - 1)
+    return (_millis(ts or datetime.utcnow()) << LOW_BITS) | (_node << SEQUENCE_BITS) | sequence
+
+
+def event_id_floor(ts: datetime) -> int:
+    """Наименьший id события, записанного не раньше ts"""
+    return max(0, _millis(ts)) << LOW_BITS
+
+
+def event_id_time(event_id: int) -> datetime:
+    """Время, закодированное в id события"""
+    return EVENT_EPOCH + timedelta(milliseconds=event_id >> LOW_BITS)
@@ -0,0 +1,108 @@
+import logging
+import struct
+from typing import Union
+
+import numpy as np
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import LargeBinary
+
+logger = logging.getLogger(__name__)
+
+# Формат бинарного эмбеддинга (колонка faces.encoding):
+#   1 байт  - версия формата
+#   1 байт  - код типа данных
+#   2 байта - размерность (uint16, little-endian)
+#   далее   - значения little-endian, для float32 это 512 байт на 128-d дескриптор
+# Заголовок занимает 4 байта, поэтому данные выровнены под float32 и
+# читаются через np.frombuffer без копирования.
+FORMAT_VERSION = 1
+DTYPE_FLOAT32 = 1
+HEADER = struct.Struct("<BBH")
+DTYPES = {DTYPE_FLOAT32: np.dtype("<f4")}
+
+EmbeddingValue = Union[bytes, bytearray, memoryview, str]
+
+
+def encode_embedding(embedding) -> bytes:
+    """Упаковывает эмбеддинг в бинарный формат с заголовком версии"""
+    array = np.asarray(embedding, dtype=DTYPES[DTYPE_FLOAT32]).ravel()
+    return HEADER.pack(FORMAT_VERSION, DTYPE_FLOAT32, array.shape[0]) + array.tobytes()
+
+
+def is_legacy_encoding(value: EmbeddingValue) -> bool:
+    """Старый формат - строка чисел через запятую (в том числе прочитанная как bytes)"""
+    if isinstance(value, str):
+        return True
+    return len(value) < HEADER.size or value[0] != FORMAT_VERSION
+
+
+def decode_embedding(value: EmbeddingValue) -> np.ndarray:
+    """Возвращает эмбеддинг как read-only представление буфера, без копирования.
+
+    Строки в старом текстовом формате разбираются как раньше.
+    """
+    if is_legacy_encoding(value):
+        if not isinstance(value, str):
+            value = bytes(value).decode("ascii")
+        return np.array([float(x) for x in value.split(",") if x.strip()], dtype=np.float32)
+
+    version, dtype_code, dim = HEADER.unpack_from(value)
+    if dtype_code not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype code: {dtype_code}")
+    return np.frombuffer(value, dtype=DTYPES[dtype_code], count=dim, offset=HEADER.size)
+
+
+def embedding_to_text(value: EmbeddingValue) -> str:
+    """Представление эмбеддинга для API: числа через запятую, как в старом формате"""
+    if isinstance(value, str):
+        return value
+    return ",".join(map(str, decode_embedding(value).tolist()))
+
+
+def ensure_binary_encoding_column(engine: Engine):
+    """Меняет тип колонки faces.encoding на бинарный в уже созданных базах.
+
+    SQLite хранит BLOB в TEXT-колонке как есть, поэтому менять тип нужно
+    только в PostgreSQL. Старые значения остаются текстом внутри bytea и
+    читаются decode_embedding до запуска migrate_face_encodings.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    inspector = inspect(engine)
+    if "faces" not in inspector.get_table_names():
+        return
+    column = next(c for c in inspector.get_columns("faces") if c["name"] == "encoding")
+    if isinstance(column["type"], LargeBinary):
+        return
+    logger.info("Converting faces.encoding column to BYTEA")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE faces ALTER COLUMN encoding TYPE BYTEA USING convert_to(encoding, 'UTF8')"
+        ))
+
+
+def migrate_face_encodings(engine: Engine, batch_size: int = 500) -> int:
+    """Переписывает строки faces из текстового формата в бинарный, возвращает их количество"""
+    ensure_binary_encoding_column(engine)
+    migrated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT id, encoding FROM faces WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size},
+            ).fetchall()
+            if not rows:
+                break
+            updates = [
+                {"id": face_id, "encoding": encode_embedding(decode_embedding(value))}
+                for face_id, value in rows
+                if value is not None and is_legacy_encoding(value)
+            ]
+            if updates:
+                conn.execute(text("UPDATE faces SET encoding = :encoding WHERE id = :id"), updates)
+            migrated += len(updates)
+            last_id = rows[-1][0]
+    logger.info(f"Migrated {migrated} face encodings to binary format")
+    return migrated
@@ -0,0 +1,89 @@
+from typing import Iterable, List
+
+from sqlalchemy import func, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .database import ensure_column
+from .models import Face, FaceChange, GalleryState, Person
+
+FACE_ADDED = "add"
+FACE_DELETED = "delete"
+PERSON_RENAMED = "rename"
+# База пересоздана: кэши галереи надо загрузить заново
+GALLERY_RESET = "reset"
+STATE_ID = 1
+
+
+def _next_version(db: Session) -> int:
+    """Следующая версия галереи.
+
+    Строка счётчика остаётся заблокированной до конца транзакции, поэтому
+    параллельная запись ждёт коммита и получает большую версию: версии идут
+    в порядке коммитов, и читатель журнала не пропускает запись, закоммиченную позже.
+    """
+    state = db.query(GalleryState).filter(GalleryState.id == STATE_ID).with_for_update().first()
+    if state is None:
+        state = GalleryState(id=STATE_ID, version=gallery_version(db))
+        db.add(state)
+    state.version += 1
+    return state.version
+
+
+def _record(db: Session, op: str, face_id: int, person_id):
+    db.add(FaceChange(op=op, face_id=face_id, person_id=person_id, version=_next_version(db)))
+
+
+def record_face_added(db: Session, face: Face):
+    """Добавляет в журнал новое лицо; face уже должен иметь id (после flush)"""
+    _record(db, FACE_ADDED, face.id, face.person_id)
+
+
+def record_faces_deleted(db: Session, faces: Iterable[Face]):
+    for face in faces:
+        _record(db, FACE_DELETED, face.id, face.person_id)
+
+
+def record_person_renamed(db: Session, person: Person):
+    """Новое имя человека для кэшей галереи; без лиц человек в галерее не участвует"""
+    if person.faces:
+        _record(db, PERSON_RENAMED, person.faces[0].id, person.id)
+
+
+def record_gallery_reset(db: Session, version: int):
+    """Первая запись журнала пересозданной базы: версия продолжает старую, чтобы кэши увидели сброс"""
+    db.add(GalleryState(id=STATE_ID, version=version + 1))
+    db.add(FaceChange(op=GALLERY_RESET, face_id=0, version=version + 1))
+
+
+def gallery_version(db: Session) -> int:
+    return db.query(func.max(FaceChange.version)).scalar() or 0
+
+
+def ensure_gallery_versions(engine: Engine):
+    """Версии для записей журнала, созданных до появления face_changes.version, и строка счётчика"""
+    ensure_column(engine, "face_changes", "version", "BIGINT")
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE face_changes SET version = id WHERE version IS NULL"))
+        conn.execute(text(
+            "INSERT INTO gallery_state (id, version) "
+            "SELECT :id, (SELECT COALESCE(MAX(version), 0) FROM face_changes) "
+            "WHERE NOT EXISTS (SELECT 1 FROM gallery_state)"
+        ), {"id": STATE_ID})
+
+
+def face_changes_since(db: Session, since: int, limit: int) -> List[tuple]:
+    """Изменения с версией больше since вместе с текущим эмбеддингом лица и именем человека.
+
+    Для удалённых лиц encoding будет None: строка faces уже удалена,
+    а следом в журнале идёт запись об удалении.
+    """
+    return (
+        db.query(FaceChange.version, FaceChange.op, FaceChange.face_id, FaceChange.person_id, Face.encoding, Person.name)
+        .outerjoin(Face, Face.id == FaceChange.face_id)
+        .outerjoin(Person, Person.id == FaceChange.person_id)
+        .filter(FaceChange.version > since)
+        .order_by(FaceChange.version)
+        .limit(limit)
+        .all()
+    )
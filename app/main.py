@@ -1,25 +1,44 @@
+import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from kubernetes import client, config
 from typing import List
 
-from . import models, database
-from .routers import cameras, persons, faces, kuber, auth, db
+from . import models, database, face_codec, gallery, presence
+from .routers import cameras, persons, faces, kuber, auth, db, events
+from .routers import presence as presence_router
 
 
 logger = logging.getLogger(__name__)
 
+# Период фонового обновления сводок присутствия, сек; 0 - только через POST /api/presence/refresh
+PRESENCE_ROLLUP_INTERVAL = float(os.getenv("PRESENCE_ROLLUP_INTERVAL", "60"))
+
 models.Base.metadata.create_all(bind=database.engine)
+face_codec.ensure_binary_encoding_column(database.engine)
+database.ensure_column(database.engine, "cameras", "roi", "JSON")
+database.ensure_column(database.engine, "stream_processors", "camera_ids", "JSON")
+database.ensure_column(database.engine, "stream_processors", "output_streams", "JSON")
+gallery.ensure_gallery_versions(database.engine)
+presence.ensure_event_inserted_at(database.engine)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     load_ml_models(app)
+    rollups = None
+    if PRESENCE_ROLLUP_INTERVAL > 0:
+        rollups = asyncio.create_task(
+            presence.run_presence_rollups(database.SessionLocal, PRESENCE_ROLLUP_INTERVAL)
+        )
     logger.info("Application startup complete")
     yield
     # Shutdown
+    if rollups is not None:
+        rollups.cancel()
     logger.info("Application shutdown")
 
 app = FastAPI(
@@ -58,6 +77,8 @@ app.include_router(persons.router, prefix="/api")
 app.include_router(faces.router, prefix="/api")
 app.include_router(kuber.router, prefix="/api")
 app.include_router(db.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
+app.include_router(presence_router.router, prefix="/api")
 
 def load_ml_models(app: FastAPI):
     try:
@@ -1,8 +1,10 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, Text, DateTime, Enum
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, String, Boolean, DateTime, Enum, Float, Index, LargeBinary, JSON, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 
+from .events import make_event_id
+
 Base = declarative_base()
 
 class User(Base):
@@ -24,6 +26,7 @@ class Camera(Base):
     url = Column(String)
     description = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
+    roi = Column(JSON, nullable=True)  # Полигоны зоны интереса в долях кадра: [[[x, y], ...], ...]
     stream_processors = relationship("StreamProcessor", back_populates="camera")
 
 class Person(Base):
@@ -36,18 +39,97 @@ class Face(Base):
     __tablename__ = "faces"
     id = Column(Integer, primary_key=True, index=True)
     person_id = Column(Integer, ForeignKey('persons.id', ondelete="CASCADE"))
-    encoding = Column(Text, nullable=False)  # Храним embedding как строку
+    encoding = Column(LargeBinary, nullable=False)  # float32-эмбеддинг с заголовком версии, см. face_codec
     person = relationship("Person", back_populates="faces")
 
+class FaceChange(Base):
+    """Журнал изменений галереи лиц.
+
+    version выдаётся счётчиком GalleryState под блокировкой его строки, поэтому
+    идёт в порядке коммитов; id из последовательности может закоммититься не по порядку.
+    """
+    __tablename__ = "face_changes"
+    id = Column(Integer, primary_key=True, index=True)
+    version = Column(BigInteger, nullable=True, index=True)
+    op = Column(String, nullable=False)  # "add", "delete" или "rename", см. gallery.py
+    face_id = Column(Integer, nullable=False)
+    person_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class GalleryState(Base):
+    """Единственная строка со счётчиком версий галереи, см. gallery.py"""
+    __tablename__ = "gallery_state"
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
 class StreamProcessor(Base):
     __tablename__ = "stream_processors"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     camera_id = Column(Integer, ForeignKey("cameras.id"))
+    camera_ids = Column(JSON, nullable=True)  # Все камеры многокамерного процессора, camera_id - первая
+    output_streams = Column(JSON, nullable=True)  # Выходы камер многокамерного процессора: {camera_id: url}
     input_stream = Column(String)
     output_stream = Column(String)
     release_name = Column(String, unique=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     camera = relationship("Camera", back_populates="stream_processors")
+
+class Event(Base):
+    """Вход или выход человека в кадре камеры, пишется стрим-процессором.
+
+    id растёт вместе с ts (см. events.make_event_id): история читается
+    keyset-пагинацией по первичному ключу, а выборки по человеку и по
+    процессору за период идут по составным индексам. Пачки, переигранные
+    из файла процессора, приходят со старыми id, поэтому сводки идут по
+    inserted_at - времени записи по часам базы.
+    """
+    __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_person_ts", "person_id", "ts"),
+        Index("ix_events_processor_ts", "stream_processor_id", "ts"),
+        Index("ix_events_inserted_at", "inserted_at", "id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=False, default=make_event_id)
+    event_type = Column(String, nullable=False)  # "enter" или "exit"
+    person_id = Column(Integer, ForeignKey("persons.id", ondelete="SET NULL"), nullable=True)
+    stream_processor_id = Column(Integer, nullable=True)
+    camera_id = Column(Integer, nullable=True)
+    track_id = Column(Integer, nullable=False)
+    duration = Column(Float, nullable=True)  # Время в кадре для exit, сек
+    ts = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # NULL - событие записано до появления колонки и уже учтено в сводках, см. presence.ensure_event_inserted_at
+    inserted_at = Column(DateTime, nullable=True, server_default=func.current_timestamp())
+
+class PresenceRollup(Base):
+    """Присутствие человека перед камерой за час или сутки, собирается из событий выхода.
+
+    Визит, попавший на несколько интервалов, делится между ними: каждому
+    достаётся своя часть времени и по одному визиту, first_seen и
+    last_seen обрезаются по границам интервала. См. presence.update_presence.
+    """
+    __tablename__ = "presence_rollups"
+    __table_args__ = (
+        UniqueConstraint("period", "bucket", "person_id", "camera_id", name="uq_presence_rollups_key"),
+        Index("ix_presence_rollups_person_bucket", "person_id", "period", "bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String, nullable=False)  # "hour" или "day"
+    bucket = Column(DateTime, nullable=False)  # Начало интервала, UTC
+    person_id = Column(Integer, ForeignKey("persons.id", ondelete="CASCADE"), nullable=False)
+    camera_id = Column(Integer, nullable=True)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
+    dwell_seconds = Column(Float, nullable=False, default=0.0)
+    visits = Column(Integer, nullable=False, default=0)
+
+class RollupState(Base):
+    """Докуда обработаны события: (inserted_at, id) последнего учтённого события для каждой сводки"""
+    __tablename__ = "rollup_state"
+    name = Column(String, primary_key=True)
+    last_event_id = Column(BigInteger, nullable=False, default=0)
+    last_inserted_at = Column(DateTime, nullable=True)
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import and_, func, inspect, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .database import ensure_column
+from .events import ID_TIME_SLACK, event_id_floor, to_utc
+from .models import Event, PresenceRollup, RollupState
+
+logger = logging.getLogger(__name__)
+
+HOUR = "hour"
+DAY = "day"
+PERIODS = {HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+STATE_NAME = "presence"
+# inserted_at - время начала транзакции записи: транзакция, начатая раньше, может закоммититься
+# позже уже учтённых событий, поэтому самые свежие записи оставляются следующему запуску
+ROLLUP_LAG = timedelta(seconds=60)
+# Самый длинный визит, который учитывает пересборка периода
+MAX_VISIT = timedelta(days=1)
+
+RollupKey = Tuple[str, datetime, int, Optional[int]]  # (period, bucket, person_id, camera_id)
+
+
+def bucket_start(ts: datetime, period: str) -> datetime:
+    if period == DAY:
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def visit_parts(start: datetime, end: datetime, period: str) -> Iterator[Tuple[datetime, datetime, datetime]]:
+    """Части визита [start, end] по интервалам периода: (начало интервала, от, до)"""
+    step = PERIODS[period]
+    bucket = bucket_start(start, period)
+    while True:
+        yield bucket, max(start, bucket), min(end, bucket + step)
+        bucket += step
+        if bucket >= end:
+            break
+
+
+def aggregate_visits(events: Iterable[Event], window: Optional[Tuple[datetime, datetime]] = None) -> Dict[RollupKey, list]:
+    """Вклад событий выхода в интервалы: ключ -> [first_seen, last_seen, dwell_seconds, visits].
+
+    window - учитывать только интервалы, начинающиеся в [window[0], window[1]).
+    """
+    totals: Dict[RollupKey, list] = {}
+    for event in events:
+        end = event.ts
+        start = end - timedelta(seconds=event.duration or 0)
+        for period in PERIODS:
+            for bucket, first, last in visit_parts(start, end, period):
+                if window is not None and not window[0] <= bucket < window[1]:
+                    continue
+                key = (period, bucket, event.person_id, event.camera_id)
+                dwell = (last - first).total_seconds()
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = [first, last, dwell, 1]
+                else:
+                    total[0] = min(total[0], first)
+                    total[1] = max(total[1], last)
+                    total[2] += dwell
+                    total[3] += 1
+    return totals
+
+
+def merge_rollups(db: Session, totals: Dict[RollupKey, list]):
+    """Прибавляет вклад к строкам сводки, недостающие строки создаёт"""
+    for period in PERIODS:
+        buckets = [key[1] for key in totals if key[0] == period]
+        if not buckets:
+            continue
+        rows = {
+            (row.period, row.bucket, row.person_id, row.camera_id): row
+            for row in db.query(PresenceRollup).filter(
+                PresenceRollup.period == period,
+                PresenceRollup.bucket >= min(buckets),
+                PresenceRollup.bucket <= max(buckets),
+            )
+        }
+        for key, (first, last, dwell, visits) in totals.items():
+            if key[0] != period:
+                continue
+            row = rows.get(key)
+            if row is None:
+                db.add(PresenceRollup(period=period, bucket=key[1], person_id=key[2], camera_id=key[3],
+                                      first_seen=first, last_seen=last, dwell_seconds=dwell, visits=visits))
+                continue
+            row.first_seen = min(row.first_seen, first)
+            row.last_seen = max(row.last_seen, last)
+            row.dwell_seconds += dwell
+            row.visits += visits
+
+
+def _visits_query(db: Session):
+    # Визит целиком описывает выход: время выхода и длительность; неизвестные люди в сводки не входят
+    return db.query(Event).filter(Event.event_type == "exit", Event.person_id.isnot(None))
+
+
+def _locked_state(db: Session) -> RollupState:
+    # Блокировка строки не даёт двум репликам API учесть одни события дважды
+    state = db.query(RollupState).filter(RollupState.name == STATE_NAME).with_for_update().first()
+    if state is None:
+        state = RollupState(name=STATE_NAME, last_event_id=0)
+        db.add(state)
+    return state
+
+
+def _database_now(db: Session) -> datetime:
+    # inserted_at проставляют часы базы, с ними и сравниваем
+    return db.query(func.current_timestamp()).scalar().replace(tzinfo=None)
+
+
+def _after_watermark(state: RollupState):
+    if state.last_inserted_at is None:
+        return Event.inserted_at.isnot(None)
+    return or_(
+        Event.inserted_at > state.last_inserted_at,
+        and_(Event.inserted_at == state.last_inserted_at, Event.id > state.last_event_id),
+    )
+
+
+def _processed(state: RollupState):
+    """События, уже учтённые в сводках: не новее отметки или записанные до появления inserted_at"""
+    if state.last_inserted_at is None:
+        return Event.inserted_at.is_(None)
+    return or_(
+        Event.inserted_at.is_(None),
+        Event.inserted_at < state.last_inserted_at,
+        and_(Event.inserted_at == state.last_inserted_at, Event.id <= state.last_event_id),
+    )
+
+
+def update_presence(db: Session, now: Optional[datetime] = None, batch_size: int = 5000) -> int:
+    """Добавляет в сводки выходы, записанные после прошлого запуска; возвращает число учтённых событий.
+
+    События идут в порядке записи в базу, а не по id: пачка, переигранная
+    из файла стрим-процессора, учитывается в своих прошлых интервалах.
+    now - время по часам базы.
+    """
+    upto = (now or _database_now(db)) - ROLLUP_LAG
+    processed = 0
+    while True:
+        state = _locked_state(db)
+        events = (
+            _visits_query(db)
+            .filter(_after_watermark(state), Event.inserted_at < upto)
+            .order_by(Event.inserted_at, Event.id)
+            .limit(batch_size)
+            .all()
+        )
+        if events:
+            merge_rollups(db, aggregate_visits(events))
+            state.last_inserted_at = events[-1].inserted_at
+            state.last_event_id = events[-1].id
+            processed += len(events)
+        # Сводки и отметка обработанных событий меняются одной транзакцией
+        db.commit()
+        if len(events) < batch_size:
+            return processed
+
+
+def rebuild_presence(db: Session, start: datetime, end: datetime) -> int:
+    """Пересобирает сводки за сутки с start по end из сырых событий, возвращает число строк.
+
+    Нужна после правки событий в базе вручную. Сначала учитываются
+    накопившиеся события, затем период пересобирается из всего, что уже
+    учтено; события новее отметки оставляются update_presence.
+    """
+    start = bucket_start(to_utc(start), DAY)
+    end, day_end = to_utc(end), bucket_start(to_utc(end), DAY)
+    end = day_end if day_end == end else day_end + PERIODS[DAY]
+    update_presence(db)
+    state = _locked_state(db)
+    db.query(PresenceRollup).filter(
+        PresenceRollup.bucket >= start, PresenceRollup.bucket < end
+    ).delete(synchronize_session=False)
+    # Визит, закончившийся после end, мог начаться внутри периода
+    events = (
+        _visits_query(db)
+        .filter(
+            Event.id >= event_id_floor(start - ID_TIME_SLACK),
+            Event.id < event_id_floor(end + MAX_VISIT + ID_TIME_SLACK),
+            _processed(state),
+            Event.ts >= start,
+            Event.ts < end + MAX_VISIT,
+        )
+        .yield_per(5000)
+    )
+    totals = aggregate_visits(events, window=(start, end))
+    merge_rollups(db, totals)
+    db.commit()
+    return len(totals)
+
+
+def ensure_event_inserted_at(engine: Engine):
+    """Добавляет events.inserted_at в уже созданные базы.
+
+    Старые события, уже учтённые по id, остаются с NULL; остальным
+    проставляется текущее время, и их подбирает update_presence.
+    SQLite не меняет DEFAULT у существующей колонки, базу разработки проще пересоздать.
+    """
+    ensure_column(engine, "rollup_state", "last_inserted_at", "TIMESTAMP")
+    inspector = inspect(engine)
+    if "events" not in inspector.get_table_names():
+        return
+    if any(c["name"] == "inserted_at" for c in inspector.get_columns("events")):
+        return
+    ensure_column(engine, "events", "inserted_at", "TIMESTAMP")
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE events ALTER COLUMN inserted_at SET DEFAULT CURRENT_TIMESTAMP"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_events_inserted_at ON events (inserted_at, id)"))
+        conn.execute(text(
+            "UPDATE events SET inserted_at = CURRENT_TIMESTAMP WHERE id > "
+            "COALESCE((SELECT last_event_id FROM rollup_state WHERE name = :name), 0)"
+        ), {"name": STATE_NAME})
+
+
+async def run_presence_rollups(session_factory: Callable[[], Session], interval: float):
+    """Фоновое обновление сводок каждые interval секунд"""
+    while True:
+        await asyncio.to_thread(_update_once, session_factory)
+        await asyncio.sleep(interval)
+
+
+def _update_once(session_factory: Callable[[], Session]):
+    db = session_factory()
+    try:
+        processed = update_presence(db)
+        if processed:
+            logger.info(f"Presence rollups: {processed} new visits")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error updating presence rollups: {e}")
+    finally:
+        db.close()
@@ -30,7 +30,8 @@ def create_camera(
         name=camera.name,
         url=camera.url,  # URL уже строка
         description=camera.description,
-        is_active=camera.is_active
+        is_active=camera.is_active,
+        roi=camera.roi
     )
     db.add(db_camera)
     db.commit()
@@ -82,6 +83,36 @@ def update_camera(
     db.refresh(camera)
     return camera
 
+@router.put("/{camera_id}/roi", response_model=schemas.Camera)
+def set_camera_roi(
+    camera_id: int,
+    roi: schemas.CameraRoi,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    camera = db.query(models.Camera).filter(models.Camera.id == camera_id).first()
+    if camera is None:
+        raise HTTPException(status_code=404, detail="Камера не найдена")
+    # Кортежи точек сохраняем как списки, чтобы JSON в базе совпадал с API
+    camera.roi = [[list(point) for point in polygon] for polygon in roi.polygons]
+    db.commit()
+    db.refresh(camera)
+    return camera
+
+@router.delete("/{camera_id}/roi", response_model=schemas.Camera)
+def delete_camera_roi(
+    camera_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    camera = db.query(models.Camera).filter(models.Camera.id == camera_id).first()
+    if camera is None:
+        raise HTTPException(status_code=404, detail="Камера не найдена")
+    camera.roi = None
+    db.commit()
+    db.refresh(camera)
+    return camera
+
 @router.delete("/{camera_id}")
 def delete_camera(
     camera_id: int,
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 import logging
 
 from .. import models, database, auth
+from ..gallery import gallery_version, record_gallery_reset
 
 # Настройка логгера
 logging.basicConfig(level=logging.DEBUG)
@@ -37,6 +38,10 @@ async def reset_database(
         #         detail="Требуются права суперпользователя"
         #     )
 
+        # Версию галереи запоминаем до удаления: журнал новой базы продолжит её
+        version = gallery_version(db)
+        db.rollback()
+
         # Удаляем все таблицы
         logger.info("Dropping all tables...")
         models.Base.metadata.drop_all(bind=database.engine)
@@ -44,6 +49,8 @@ async def reset_database(
         # Создаем таблицы заново
         logger.info("Creating all tables...")
         models.Base.metadata.create_all(bind=database.engine)
+        record_gallery_reset(db, version)
+        db.commit()
         
         logger.info("Database reset completed successfully")
         return {
@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from .. import models, schemas, auth
+from ..database import get_db
+from ..events import ID_TIME_SLACK, event_id_floor, to_utc
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+@router.get("/", response_model=schemas.EventPage)
+def get_events(
+    person_id: Optional[int] = None,
+    stream_processor_id: Optional[int] = None,
+    camera_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """История событий от новых к старым.
+
+    Следующая страница запрашивается с cursor=next_cursor: выборка идёт
+    по первичному ключу (id < cursor) без OFFSET, поэтому глубокие
+    страницы читаются так же быстро, как первая.
+    """
+    start = to_utc(start) if start is not None else None
+    end = to_utc(end) if end is not None else None
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be earlier than end"
+        )
+    query = db.query(models.Event)
+    if person_id is not None:
+        query = query.filter(models.Event.person_id == person_id)
+    if stream_processor_id is not None:
+        query = query.filter(models.Event.stream_processor_id == stream_processor_id)
+    if camera_id is not None:
+        query = query.filter(models.Event.camera_id == camera_id)
+    if event_type is not None:
+        query = query.filter(models.Event.event_type == event_type)
+    # id растёт вместе со временем: границы периода сужают и диапазон первичного ключа
+    if start is not None:
+        query = query.filter(models.Event.ts >= start, models.Event.id >= event_id_floor(start - ID_TIME_SLACK))
+    if end is not None:
+        query = query.filter(models.Event.ts < end, models.Event.id < event_id_floor(end + ID_TIME_SLACK))
+    if cursor is not None:
+        query = query.filter(models.Event.id < cursor)
+
+    events = query.order_by(models.Event.id.desc()).limit(limit + 1).all()
+    next_cursor = events[limit - 1].id if len(events) > limit else None
+    return {"events": events[:limit], "next_cursor": next_cursor}
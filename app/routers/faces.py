@@ -4,7 +4,9 @@ from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models import Face as FaceDB, Person, User
 from .. import auth
-from ..schemas import Face as FaceSchema, FaceCreate
+from ..face_codec import encode_embedding
+from ..gallery import face_changes_since, gallery_version, record_face_added
+from ..schemas import Face as FaceSchema, FaceCreate, FaceChangeList
 from typing import List
 import numpy as np
 from PIL import Image
@@ -22,6 +24,23 @@ def get_all_faces(
 ):
     return db.query(FaceDB).offset(skip).limit(limit).all()
 
+@router.get("/changes", response_model=FaceChangeList)
+def get_face_changes(
+    since: int = 0,
+    limit: int = 1000,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth.get_current_active_user)
+):
+    """Лица, добавленные или удалённые, и переименованные люди после версии галереи since"""
+    rows = face_changes_since(db, since, limit)
+    changes = [
+        {"version": version, "op": op, "face_id": face_id, "person_id": person_id, "encoding": encoding, "name": name}
+        for version, op, face_id, person_id, encoding, name in rows
+    ]
+    # Версия меньше since значит, что журнал начат заново: клиенту нужна полная перезагрузка
+    version = changes[-1]["version"] if changes else gallery_version(db)
+    return {"version": version, "changes": changes}
+
 @router.post("/upload/{person_id}", status_code=status.HTTP_201_CREATED)
 async def upload_faces(
     person_id: int,
@@ -46,9 +65,11 @@ async def upload_faces(
             if embedding is not None:
                 face = FaceDB(
                     person_id=person_id,
-                    encoding=",".join(map(str, embedding))
+                    encoding=encode_embedding(embedding)
                 )
                 db.add(face)
+                db.flush()
+                record_face_added(db, face)
                 processed += 1
         except Exception as e:
             continue
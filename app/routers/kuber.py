@@ -3,6 +3,7 @@ from kubernetes.client import CoreV1Api
 from kubernetes import config
 import yaml
 import os
+import json
 import logging
 from typing import List
 from sqlalchemy.orm import Session
@@ -73,7 +74,8 @@ async def deploy_stream_processor(
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    logger.info(f"Starting stream processor deployment for camera_id: {config.camera_id}")
+    camera_ids = config.all_camera_ids
+    logger.info(f"Starting stream processor deployment for cameras: {camera_ids}")
     try:
         # Проверяем существование процессора с таким именем
         existing_processor = db.query(models.StreamProcessor).filter(models.StreamProcessor.name == config.name).first()
@@ -84,16 +86,60 @@ async def deploy_stream_processor(
                 detail=f"Stream processor with name {config.name} already exists"
             )
 
-        # Проверяем существование камеры, если указан camera_id
-        if config.camera_id:
-            logger.debug(f"Checking camera existence: {config.camera_id}")
-            camera = db.query(models.Camera).filter(models.Camera.id == config.camera_id).first()
-            if not camera:
-                logger.error(f"Camera not found: {config.camera_id}")
+        # Проверяем существование всех камер процессора
+        logger.debug(f"Checking cameras existence: {camera_ids}")
+        found = {camera.id: camera for camera in db.query(models.Camera).filter(models.Camera.id.in_(camera_ids))}
+        for camera_id in camera_ids:
+            if camera_id not in found:
+                logger.error(f"Camera not found: {camera_id}")
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Camera with id {config.camera_id} not found"
+                    detail=f"Camera with id {camera_id} not found"
                 )
+        cameras = [found[camera_id] for camera_id in camera_ids]
+        camera = cameras[0]
+        output_base = f"rtsp://mediamtx-svc:8554/mediamtx/processed/{config.name}"
+        public_base = f"http://{IP}:80/mediamtx/processed/{config.name}"
+        output_streams = None
+
+        if len(cameras) == 1:
+            camera_env = [
+                {
+                    "name": "RTSP_IN",
+                    "value": camera.url
+                },
+                {
+                    "name": "RTSP_OUT",
+                    "value": output_base
+                },
+                {
+                    # По id камеры процессор читает её ROI из базы
+                    "name": "CAMERA_ID",
+                    "value": str(camera.id)
+                }
+            ]
+        else:
+            # Один под на несколько камер: выход каждой камеры - <output>/<camera_id>
+            output_streams = {item.id: f"{public_base}/{item.id}" for item in cameras}
+            camera_env = [
+                {
+                    "name": "CAMERAS",
+                    "value": json.dumps([
+                        {
+                            "id": item.id,
+                            "name": str(item.id),
+                            "rtsp_in": item.url,
+                            "rtsp_out": f"{output_base}/{item.id}",
+                        }
+                        for item in cameras
+                    ])
+                }
+            ]
+
+        if config.max_batch is not None:
+            camera_env.append({"name": "MAX_BATCH", "value": str(config.max_batch)})
+        if config.max_batch_wait_ms is not None:
+            camera_env.append({"name": "MAX_BATCH_WAIT_MS", "value": str(config.max_batch_wait_ms)})
 
         # Проверяем существование чарта
         logger.debug(f"Checking helm chart existence at: {HELM_CHART_PATH}")
@@ -104,6 +150,23 @@ async def deploy_stream_processor(
                 detail=f"Helm chart not found at {HELM_CHART_PATH}"
             )
 
+        # Запись процессора создаётся до деплоя: её id под пишет в события (stream_processor_id)
+        release_name = f"stream-processor-{config.name}"
+        stream_processor = models.StreamProcessor(
+            name=config.name,
+            camera_id=camera.id,
+            camera_ids=camera_ids if len(camera_ids) > 1 else None,
+            input_stream=camera.url,
+            # У многокамерного процессора общего выхода нет: output_stream - выход первой камеры
+            output_stream=output_streams[camera.id] if output_streams else public_base,
+            output_streams=output_streams,
+            release_name=release_name
+        )
+        db.add(stream_processor)
+        db.commit()
+        db.refresh(stream_processor)
+        camera_env.append({"name": "STREAM_PROCESSOR_ID", "value": str(stream_processor.id)})
+
         # Создаем временный values.yaml с захардкоженными значениями
         values = {
             "replicaCount": 1,
@@ -130,16 +193,7 @@ async def deploy_stream_processor(
                     "cpu": "2"
                 }
             },
-            "env": [
-                {
-                    "name": "RTSP_IN",
-                    "value": camera.url
-                },
-                {
-                    "name": "RTSP_OUT",
-                    "value": f"rtsp://mediamtx-svc:8554/mediamtx/processed/{config.name}"
-                }
-            ]
+            "env": camera_env
         }
         logger.debug(f"Generated values.yaml: {values}")
 
@@ -149,7 +203,6 @@ async def deploy_stream_processor(
         logger.debug(f"Values file written to: {values_path}")
 
         # Деплоим с помощью Helm
-        release_name = f"stream-processor-{config.name}"
         cmd = [
             "helm",
             "upgrade",
@@ -162,7 +215,15 @@ async def deploy_stream_processor(
         ]
         cmd = [x for x in cmd if x]  # Убираем пустые строки
 
-        returncode, stdout, stderr = await run_helm_command(cmd)
+        deployed = False
+        try:
+            returncode, stdout, stderr = await run_helm_command(cmd)
+            deployed = returncode == 0
+        finally:
+            if not deployed:
+                # Релиз не поставлен: запись процессора убираем, имя снова свободно
+                db.delete(stream_processor)
+                db.commit()
         logger.debug(f"Helm command output: {stdout}")
         
         if returncode != 0:
@@ -172,18 +233,6 @@ async def deploy_stream_processor(
                 detail=f"Failed to deploy stream processor: {stderr}"
             )
 
-        # Сохраняем информацию в БД
-        stream_processor = models.StreamProcessor(
-            name=config.name,
-            camera_id=config.camera_id,
-            input_stream=camera.url if camera else None,
-            output_stream=f"http://{IP}:80/mediamtx/processed/{config.name}",
-            release_name=release_name
-        )
-        db.add(stream_processor)
-        db.commit()
-        db.refresh(stream_processor)
-
         # Удаляем временный файл
         os.remove(values_path)
         logger.debug(f"Temporary values file removed: {values_path}")
@@ -192,9 +241,11 @@ async def deploy_stream_processor(
         return StreamProcessorResponse(
             name=config.name,
             release_name=release_name,
-            camera_id=config.camera_id,
+            camera_id=camera.id,
+            camera_ids=stream_processor.camera_ids,
             input_stream=stream_processor.input_stream,
             output_stream=stream_processor.output_stream,
+            output_streams=stream_processor.output_streams,
             status="success",
             message="Stream processor deployed successfully"
         )
@@ -298,6 +349,7 @@ async def get_stream_processor_status(
                     "details": "Process found in database but not deployed in Kubernetes",
                     "database_info": {
                         "camera_id": stream_processor.camera_id,
+                        "camera_ids": stream_processor.camera_ids,
                         "input_stream": stream_processor.input_stream,
                         "output_stream": stream_processor.output_stream,
                         "created_at": stream_processor.created_at.isoformat()
@@ -315,6 +367,7 @@ async def get_stream_processor_status(
             "details": stdout,
             "database_info": {
                 "camera_id": stream_processor.camera_id,
+                "camera_ids": stream_processor.camera_ids,
                 "input_stream": stream_processor.input_stream,
                 "output_stream": stream_processor.output_stream,
                 "created_at": stream_processor.created_at.isoformat()
@@ -4,6 +4,7 @@ from ..database import get_db
 from ..models import Person as PersonDB, User
 from ..schemas import PersonCreate, Person
 from .. import auth
+from ..gallery import record_faces_deleted, record_person_renamed
 
 router = APIRouter(prefix="/persons", tags=["persons"])
 
@@ -64,8 +65,12 @@ def update_person(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Person not found"
         )
+    renamed = person.name != person_update.name
     for var, value in vars(person_update).items():
         setattr(person, var, value)
+    if renamed:
+        # Стрим-процессоры обновят имя в кэше галереи через журнал face_changes
+        record_person_renamed(db, person)
     db.add(person)
     db.commit()
     db.refresh(person)
@@ -85,6 +90,7 @@ def delete_person(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Person not found"
         )
+    record_faces_deleted(db, person.faces)
     db.delete(person)
     db.commit()
     return {"detail": "Person deleted"}
\ No newline at end of file
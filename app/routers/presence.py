@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from .. import models, schemas, auth, presence
+from ..database import get_db
+from ..events import to_utc
+
+router = APIRouter(prefix="/presence", tags=["presence"])
+
+def _check_range(start: Optional[datetime], end: Optional[datetime]):
+    if start is not None and end is not None and to_utc(start) >= to_utc(end):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be earlier than end"
+        )
+
+@router.get("/", response_model=List[schemas.PresenceRollup])
+def get_presence(
+    period: str = Query(presence.HOUR, pattern="^(hour|day)$"),
+    person_id: Optional[int] = None,
+    camera_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Часовые или суточные сводки присутствия, интервалы с началом в [start, end)"""
+    _check_range(start, end)
+    query = db.query(models.PresenceRollup).filter(models.PresenceRollup.period == period)
+    if person_id is not None:
+        query = query.filter(models.PresenceRollup.person_id == person_id)
+    if camera_id is not None:
+        query = query.filter(models.PresenceRollup.camera_id == camera_id)
+    if start is not None:
+        query = query.filter(models.PresenceRollup.bucket >= to_utc(start))
+    if end is not None:
+        query = query.filter(models.PresenceRollup.bucket < to_utc(end))
+    return query.order_by(
+        models.PresenceRollup.bucket, models.PresenceRollup.person_id, models.PresenceRollup.camera_id
+    ).limit(limit).all()
+
+@router.post("/refresh")
+def refresh_presence(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Учесть новые события сейчас, не дожидаясь фонового обновления"""
+    return {"processed": presence.update_presence(db)}
+
+@router.post("/rebuild")
+def rebuild_presence(
+    start: datetime,
+    end: datetime,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Пересобрать сводки за сутки периода из сырых событий"""
+    _check_range(start, end)
+    return {"rows": presence.rebuild_presence(db, start, end)}
@@ -1,12 +1,28 @@
-from pydantic import BaseModel, HttpUrl, field_validator, EmailStr, ConfigDict, constr
-from typing import Optional, List
+from pydantic import BaseModel, HttpUrl, field_validator, model_validator, EmailStr, ConfigDict, constr
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 
+from .face_codec import embedding_to_text
+
+Polygon = List[Tuple[float, float]]
+
+def validate_roi_polygons(polygons: Optional[List[Polygon]]) -> Optional[List[Polygon]]:
+    """Полигон ROI - не меньше трёх точек с координатами в долях кадра (0..1)"""
+    if polygons is None:
+        return None
+    for polygon in polygons:
+        if len(polygon) < 3:
+            raise ValueError("Полигон ROI должен содержать не меньше трёх точек")
+        if any(not (0.0 <= c <= 1.0) for point in polygon for c in point):
+            raise ValueError("Координаты ROI задаются в долях кадра от 0 до 1")
+    return polygons or None
+
 class CameraBase(BaseModel):
     name: str
     url: str
     description: Optional[str] = None
     is_active: bool = True
+    roi: Optional[List[Polygon]] = None
 
     @field_validator('url')
     @classmethod
@@ -15,6 +31,11 @@ class CameraBase(BaseModel):
             raise ValueError("URL должен начинаться с rtsp://")
         return v
 
+    @field_validator('roi')
+    @classmethod
+    def validate_roi(cls, v):
+        return validate_roi_polygons(v)
+
 class CameraCreate(CameraBase):
     pass
 
@@ -26,6 +47,16 @@ class Camera(CameraBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class CameraRoi(BaseModel):
+    polygons: List[Polygon]
+
+    @field_validator('polygons')
+    @classmethod
+    def validate_polygons(cls, v):
+        if not v:
+            raise ValueError("Нужен хотя бы один полигон ROI")
+        return validate_roi_polygons(v)
+
 class PersonBase(BaseModel):
     name: constr(min_length=1)
 
@@ -42,6 +73,13 @@ class FaceBase(BaseModel):
     person_id: int
     encoding: str
 
+    @field_validator('encoding', mode='before')
+    @classmethod
+    def decode_binary_encoding(cls, v):
+        if isinstance(v, (bytes, bytearray, memoryview)):
+            return embedding_to_text(v)
+        return v
+
 class FaceCreate(FaceBase):
     pass
 
@@ -50,6 +88,25 @@ class Face(FaceBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class FaceChange(BaseModel):
+    version: int
+    op: str
+    face_id: int
+    person_id: Optional[int] = None
+    encoding: Optional[str] = None
+    name: Optional[str] = None  # Текущее имя человека
+
+    @field_validator('encoding', mode='before')
+    @classmethod
+    def decode_binary_encoding(cls, v):
+        if isinstance(v, (bytes, bytearray, memoryview)):
+            return embedding_to_text(v)
+        return v
+
+class FaceChangeList(BaseModel):
+    version: int
+    changes: List[FaceChange]
+
 class UserBase(BaseModel):
     email: EmailStr
     username: constr(min_length=1)
@@ -72,7 +129,37 @@ class TokenData(BaseModel):
 
 class StreamProcessorConfig(BaseModel):
     name: str
-    camera_id: int
+    camera_id: Optional[int] = None
+    # Несколько камер в одном процессоре: общие модели и пакетная детекция
+    camera_ids: Optional[List[int]] = None
+    # Пакетная детекция: максимум кадров в вызове YOLO и ожидание неполной пачки, мс
+    max_batch: Optional[int] = None
+    max_batch_wait_ms: Optional[float] = None
+
+    @field_validator('max_batch')
+    def validate_max_batch(cls, v):
+        if v is not None and v < 1:
+            raise ValueError("max_batch должен быть не меньше 1")
+        return v
+
+    @field_validator('max_batch_wait_ms')
+    def validate_max_batch_wait_ms(cls, v):
+        if v is not None and v < 0:
+            raise ValueError("max_batch_wait_ms не может быть отрицательным")
+        return v
+
+    @model_validator(mode='after')
+    def validate_cameras(self):
+        if self.camera_id is None and not self.camera_ids:
+            raise ValueError("Нужно указать camera_id или camera_ids")
+        return self
+
+    @property
+    def all_camera_ids(self) -> List[int]:
+        ids = list(dict.fromkeys(self.camera_ids or []))
+        if self.camera_id is not None and self.camera_id not in ids:
+            ids.insert(0, self.camera_id)
+        return ids
 
 class StreamProcessorResponse(BaseModel):
     status: str
@@ -80,19 +167,51 @@ class StreamProcessorResponse(BaseModel):
     name: Optional[str] = None
     release_name: Optional[str] = None
     camera_id: Optional[int] = None
+    camera_ids: Optional[List[int]] = None
     input_stream: Optional[str] = None
     output_stream: Optional[str] = None
+    output_streams: Optional[Dict[int, str]] = None
 
 class StreamProcessor(BaseModel):
     id: int
     name: str
     camera_id: int
+    camera_ids: Optional[List[int]] = None
     input_stream: str
     output_stream: str
+    output_streams: Optional[Dict[int, str]] = None
     release_name: str
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
 
 class StreamProcessorList(BaseModel):
-    processors: List[StreamProcessor]
\ No newline at end of file
+    processors: List[StreamProcessor]
+
+class Event(BaseModel):
+    id: int
+    event_type: str
+    person_id: Optional[int] = None
+    stream_processor_id: Optional[int] = None
+    camera_id: Optional[int] = None
+    track_id: int
+    duration: Optional[float] = None
+    ts: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class EventPage(BaseModel):
+    events: List[Event]
+    next_cursor: Optional[int] = None  # id последнего события страницы, None - страниц больше нет
+
+class PresenceRollup(BaseModel):
+    period: str
+    bucket: datetime
+    person_id: int
+    camera_id: Optional[int] = None
+    first_seen: datetime
+    last_seen: datetime
+    dwell_seconds: float
+    visits: int
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,213 @@
+"""PDF-отчёт по логу сервиса логирования без загрузки лога в память.
+
+Строки лога имеют вид "%Y-%m-%d %H:%M:%S - сообщение" и пишутся по
+времени, поэтому начало периода ищется бинарным поиском по смещению в
+файле, а чтение останавливается на первой строке после конца периода.
+
+PDF собирается постранично: готовая страница сразу отдаётся куском
+байтов, в памяти остаются только смещения объектов для таблицы xref.
+Шрифт - стандартный Courier без встраивания: при моноширинном шрифте
+перенос строк считается по числу символов. Кириллица кодируется как в
+cp1251 с именами глифов в /Differences, символы без глифа (эмодзи)
+заменяются на "?".
+"""
+import zlib
+from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+TIME_LENGTH = 19
+
+# A4 в пунктах, Courier 9pt: ширина символа 0.6 кегля
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 36
+FONT_SIZE = 9
+LEADING = 11
+CHARS_PER_LINE = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.6))
+LINES_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN) / LEADING) - 2  # Две строки под заголовок страницы
+
+_RUSSIAN = "АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
+# Adobe Glyph List: заглавные afii10017..afii10049, строчные afii10065..afii10097 в порядке алфавита
+_GLYPHS = {
+    **{letter.encode("cp1251")[0]: f"afii{10017 + i}" for i, letter in enumerate(_RUSSIAN)},
+    **{letter.lower().encode("cp1251")[0]: f"afii{10065 + i}" for i, letter in enumerate(_RUSSIAN)},
+}
+
+
+def parse_time(line: bytes) -> Optional[datetime]:
+    """Время в начале строки лога; None - строка без времени (продолжение многострочного сообщения)"""
+    try:
+        return datetime.strptime(line[:TIME_LENGTH].decode("ascii"), TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def to_local(ts: Optional[datetime]) -> Optional[datetime]:
+    """Время с часовым поясом в локальное без пояса, как в строках лога (asctime)"""
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return ts
+
+
+def _line_at(f: BinaryIO, offset: int) -> Tuple[int, Optional[datetime]]:
+    """Начало и время первой строки со временем, начинающейся не раньше offset; время None - конец файла"""
+    if offset > 0:
+        # С offset - 1 дочитывается строка, в середину которой попали; если offset - начало строки, читается только "\n"
+        f.seek(offset - 1)
+        f.readline()
+    else:
+        f.seek(0)
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line:
+            return position, None
+        ts = parse_time(line)
+        if ts is not None:
+            return position, ts
+
+
+def find_offset(f: BinaryIO, start: datetime) -> int:
+    """Смещение первой строки не раньше start: бинарный поиск по файлу, O(log размера) чтений"""
+    f.seek(0, 2)
+    low, high = 0, f.tell()
+    while low < high:
+        middle = (low + high) // 2
+        _, ts = _line_at(f, middle)
+        if ts is None or ts >= start:
+            high = middle
+        else:
+            low = middle + 1
+    return _line_at(f, low)[0]
+
+
+def read_log(path: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[str]:
+    """Строки лога за [start, end) по одной, без перевода строки"""
+    with open(path, "rb") as f:
+        if start is not None:
+            f.seek(find_offset(f, start))
+        for line in f:
+            if end is not None:
+                ts = parse_time(line)
+                if ts is not None and ts >= end:
+                    break
+            yield line.rstrip(b"\r\n").decode("utf-8", errors="replace")
+
+
+def encode_text(text: str) -> bytes:
+    """Текст в кодировке шрифта отчёта: ASCII, кириллица по cp1251, остальное из cp1252 или "?" """
+    encoded = bytearray()
+    for char in text:
+        if ord(char) < 128:
+            encoded.append(ord(char))
+            continue
+        try:
+            code = char.encode("cp1251")[0]
+            if code in _GLYPHS:
+                encoded.append(code)
+                continue
+        except UnicodeEncodeError:
+            pass
+        try:
+            code = char.encode("cp1252")[0]
+        except UnicodeEncodeError:
+            code = None
+        encoded.append(code if code is not None and code not in _GLYPHS else ord("?"))
+    return bytes(encoded)
+
+
+def wrap(text: str, width: int = CHARS_PER_LINE) -> List[str]:
+    text = text.expandtabs(4)
+    return [text[i:i + width] for i in range(0, len(text), width)] or [""]
+
+
+def _escape(data: bytes) -> bytes:
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class PdfStream:
+    """Пишет PDF по объектам: каждый вызов возвращает байты, которые можно сразу отдавать клиенту.
+
+    Номера 1-3 заняты каталогом, деревом страниц и шрифтом; дерево страниц
+    пишется последним, когда известен список страниц.
+    """
+
+    CATALOG, PAGES, FONT = 1, 2, 3
+
+    def __init__(self):
+        self.offsets = {}
+        self.pages: List[int] = []
+        self.position = 0
+        self.next_id = 4
+
+    def _emit(self, data: bytes) -> bytes:
+        self.position += len(data)
+        return data
+
+    def _object(self, object_id: int, body: bytes) -> bytes:
+        self.offsets[object_id] = self.position
+        return self._emit(b"%d 0 obj\n" % object_id + body + b"\nendobj\n")
+
+    def begin(self) -> bytes:
+        differences = b" ".join(b"%d /%s" % (code, name.encode("ascii")) for code, name in sorted(_GLYPHS.items()))
+        return (
+            self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+            + self._object(self.CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES)
+            + self._object(self.FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding "
+                                      b"<< /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [" + differences
+                                      + b"] >> >>")
+        )
+
+    def page(self, header: str, lines: Iterable[str]) -> bytes:
+        content = [b"BT /F1 %d Tf %d TL %d %d Td" % (FONT_SIZE, LEADING, MARGIN, PAGE_HEIGHT - MARGIN - FONT_SIZE)]
+        content.append(b"(%s) Tj T* T*" % _escape(encode_text(header)))
+        content.extend(b"(%s) Tj T*" % _escape(encode_text(line)) for line in lines)
+        content.append(b"ET")
+        stream = zlib.compress(b"\n".join(content))
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.pages.append(page_id)
+        return (
+            self._object(content_id, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream)
+                         + stream + b"\nendstream")
+            + self._object(page_id, b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                                    b"/Resources << /Font << /F1 %d 0 R >> >> >>"
+                           % (self.PAGES, PAGE_WIDTH, PAGE_HEIGHT, content_id, self.FONT))
+        )
+
+    def end(self) -> bytes:
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.pages)
+        data = self._object(self.PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)))
+        xref_offset = self.position
+        xref = [b"xref\n0 %d\n" % self.next_id, b"0000000000 65535 f \n"]
+        xref.extend(b"%010d 00000 n \n" % self.offsets[object_id] for object_id in range(1, self.next_id))
+        trailer = b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            self.next_id, self.CATALOG, xref_offset)
+        return data + self._emit(b"".join(xref) + trailer)
+
+
+def render_report(lines: Iterable[str], title: str) -> Iterator[bytes]:
+    """PDF из строк по одной странице за кусок; в памяти держится только текущая страница"""
+    pdf = PdfStream()
+    yield pdf.begin()
+    page: List[str] = []
+    for line in lines:
+        for part in wrap(line):
+            page.append(part)
+            if len(page) == LINES_PER_PAGE:
+                yield pdf.page(f"{title} - {len(pdf.pages) + 1}", page)
+                page = []
+    if page or not pdf.pages:
+        yield pdf.page(f"{title} - {len(pdf.pages) + 1}", page)
+    yield pdf.end()
+
+
+def log_report(path: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               title: str = "Person detection report") -> Iterator[bytes]:
+    """Куски PDF-отчёта по строкам лога path за [start, end)"""
+    start, end = to_local(start), to_local(end)
+    if start is not None or end is not None:
+        period = f"{start:{TIME_FORMAT}}" if start is not None else "..."
+        period += f" - {end:{TIME_FORMAT}}" if end is not None else " - ..."
+        title = f"{title}, {period}"
+    return render_report(read_log(path, start, end), title)
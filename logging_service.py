@@ -1,8 +1,9 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime, timedelta
 import logging
-from fpdf import FPDF
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -10,34 +11,38 @@ from email import encoders
 import os
 import telebot
 import schedule
+import tempfile
 import time
 import uuid
 
+from log_report import log_report, to_local
+
 app = FastAPI()
 
 # Модель для логов
 class LogMessage(BaseModel):
     message: str
 
+# Пачка логов от стрим-процессора
+class LogBatch(BaseModel):
+    messages: List[str]
+
+LOG_FILE = "person_detection.log"
+
 # Настройка логирования
 logging.basicConfig(
-    filename="person_detection.log",  # Имя файла лога
+    filename=LOG_FILE,  # Имя файла лога
+    encoding="utf-8",  # Отчёт читает лог как UTF-8
     level=logging.INFO,  # Уровень логирования
     format="%(asctime)s - %(message)s",  # Формат записи лога
     datefmt="%Y-%m-%d %H:%M:%S"  # Формат времени
 )
 
-# Функция для создания PDF из логов
-def create_pdf_from_logs(uid: str):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-
-    with open("person_detection.log", "r") as log_file:
-        for line in log_file:
-            pdf.cell(200, 10, txt=line, ln=True)
-
-    pdf.output(f"person_detection_report_{uid}.pdf")
+# Функция для создания PDF из логов: отчёт пишется в файл постранично, лог в память не читается
+def create_pdf_from_logs(uid: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    with open(f"person_detection_report_{uid}.pdf", "wb") as report:
+        for chunk in log_report(LOG_FILE, start, end):
+            report.write(chunk)
 
 # Функция для отправки PDF по email
 def send_email_with_pdf(uid):
@@ -93,10 +98,12 @@ def get_text_messages(message):
     elif message.text == "/help":
         bot.send_message(message.from_user.id, "Напиши привет")
     elif message.text == "/report":
-        uid = str(uuid.uuid1())
-        create_pdf_from_logs(uid)
-        bot.send_document(message.from_user.id, open(f'person_detection_report_{uid}.pdf', 'rb'))
-        os.remove(f"person_detection_report_{uid}.pdf")
+        # Отчёт за последние 30 дней; чтение лога начинается сразу с начала периода
+        with tempfile.TemporaryFile() as report:
+            for chunk in log_report(LOG_FILE, start=datetime.now() - timedelta(days=30)):
+                report.write(chunk)
+            report.seek(0)
+            bot.send_document(message.from_user.id, report, visible_file_name="person_detection_report.pdf")
     else:
         bot.send_message(message.from_user.id, "Я тебя не понимаю. Напиши /help.")
 
@@ -110,21 +117,28 @@ async def receive_log(log_message: LogMessage):
     logging.info(log_message.message)
     return {"status": "success"}
 
-# Эндпоинт для скачивания логов
+# Эндпоинт для приема пачки логов одним запросом
+@app.post("/logs")
+async def receive_logs(batch: LogBatch):
+    for message in batch.messages:
+        logging.info(message)
+    return {"status": "success", "count": len(batch.messages)}
+
+# Эндпоинт для скачивания логов: PDF отдаётся кусками по мере готовности страниц
 @app.get("/download-logs")
-async def download_logs():
-    uid = str(uuid.uuid1())
-    create_pdf_from_logs(uid)
-    if not os.path.exists("person_detection_report_{uid}.pdf"):
+def download_logs(start: Optional[datetime] = None, end: Optional[datetime] = None):
+    if not os.path.exists(LOG_FILE):
         raise HTTPException(status_code=404, detail="Log file not found")
+    start, end = to_local(start), to_local(end)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="start must be earlier than end")
 
-    response = FileResponse(
-        "person_detection_report.pdf",
+    # Синхронный генератор FastAPI читает в пуле потоков, цикл событий не блокируется
+    return StreamingResponse(
+        log_report(LOG_FILE, start, end),
         media_type="application/pdf",
-        filename="person_detection_report.pdf"
+        headers={"Content-Disposition": 'attachment; filename="person_detection_report.pdf"'}
     )
-    os.remove("person_detection_report_{uid}.pdf")
-    return response
 
 # Запуск планировщика
 def run_scheduler():
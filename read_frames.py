@@ -3,29 +3,85 @@ import numpy as np
 import dlib
 import requests
 from ultralytics import YOLO
-from threading import Thread
-from queue import Queue
+from threading import Thread, Lock
+from queue import Queue, Empty, Full
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import torch
 import argparse
 import time
+import os
 
 # Настройки RTSP
 RTSP_INPUT_URL = "rtsp://mediamtx:8554/mediamtx/stream"
 RTSP_OUTPUT_URL = "rtsp://mediamtx:8554/5"
 
-# Загрузка моделей
-FACE_MODEL = YOLO("ml_models/yolov8n-face.pt")  # Модель для распознавания лиц
-OBJECT_MODEL = YOLO("ml_models/yolov8n.pt")  # Модель для обнаружения объектов
-HELMET_MODEL = YOLO("ml_models/hemletYoloV8_100epochs.pt")  # Модель для обнаружения шлемов
-face_detector = dlib.get_frontal_face_detector()
-shape_predictor = dlib.shape_predictor("ml_models/shape_predictor_68_face_landmarks.dat")
-face_rec_model = dlib.face_recognition_model_v1("ml_models/dlib_face_recognition_resnet_model_v1.dat")
-
-used_faces = []  # Список для хранения уже распознанных лиц
+# Загрузчики моделей: модель создаётся при первом обращении через get_model
+MODEL_LOADERS = {
+    "face": lambda: YOLO("ml_models/yolov8n-face.pt"),  # Модель для распознавания лиц
+    "object": lambda: YOLO("ml_models/yolov8n.pt"),  # Модель для обнаружения объектов
+    "helmet": lambda: YOLO("ml_models/hemletYoloV8_100epochs.pt"),  # Модель для обнаружения шлемов
+    "face_detector": dlib.get_frontal_face_detector,
+    "shape_predictor": lambda: dlib.shape_predictor("ml_models/shape_predictor_68_face_landmarks.dat"),
+    "face_rec_model": lambda: dlib.face_recognition_model_v1("ml_models/dlib_face_recognition_resnet_model_v1.dat"),
+}
+# Какие модели нужны для каждого параметра
+PARAMETER_MODELS = {
+    "person": ["face", "face_detector", "shape_predictor", "face_rec_model"],
+    "car": ["object"],
+    "cell phone": ["object"],
+    "traffic light": ["object"],
+    "helmet": ["helmet"],
+}
+loaded_models = {}
+model_stats = {}  # {name: (время загрузки, прирост RSS в байтах)}
+model_lock = Lock()
+
+# Текущий RSS процесса в байтах
+def resident_memory():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+# Функция для получения модели с загрузкой при первом обращении
+def get_model(name):
+    model = loaded_models.get(name)
+    if model is not None:
+        return model
+    with model_lock:
+        if name not in loaded_models:
+            rss_before = resident_memory()
+            start = time.time()
+            loaded_models[name] = MODEL_LOADERS[name]()
+            model_stats[name] = (time.time() - start, max(0, resident_memory() - rss_before))
+            print(f"📦 Model {name} loaded in {model_stats[name][0]:.2f}s, RSS +{model_stats[name][1] / 2**20:.1f} MiB")
+        return loaded_models[name]
+
+# Уже распознанные лица {name: (embedding, last_seen)}, ограничены по размеру и времени жизни
+used_faces = OrderedDict()
+USED_FACES_SIZE = 256
+USED_FACES_TTL = 300  # сек
 url = "http://face_recognition:8000/find_face"
-LOGGING_SERVICE_URL = "http://logging_service:8000/log"  # URL сервиса логирования
+LOGGING_SERVICE_URL = "http://logging_service:8000/logs"  # Пакетный приём логов сервисом логирования
+# Логи отправляет фоновый поток пачками; при недоступном сервисе и переполненной очереди - в файл
+LOG_BATCH_SIZE = 100
+LOG_FLUSH_INTERVAL = 1.0  # сек
+LOG_PUT_TIMEOUT = 0.05  # Сколько обработка ждёт места в очереди логов, сек
+LOG_RETRY_INTERVAL = 5.0  # сек
+LOG_SPILL_PATH = "logging_spill.log"
+log_queue = Queue(maxsize=1000)
+
+# Размер входа моделей и пул потоков для их параллельного запуска
+INFER_SIZE = 640
+model_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="model")
 
 # Очередь для кадров
-frame_queue = Queue(maxsize=10)
+frame_queue = Queue(maxsize=10)  # Пересоздаётся после разбора --capture-policy
+encode_queue = Queue(maxsize=10)  # Обработанные кадры для записи в выходной поток
+dropped_frames = 0  # Кадры, выброшенные политикой захвата
+latencies = deque(maxlen=300)  # Задержки от захвата до записи кадра, мс
 
 # Функция для извлечения эмбеддинга лица
 def get_face_embedding(image: np.ndarray):
@@ -39,15 +95,15 @@ def get_face_embedding(image: np.ndarray):
         rgb_image = image
 
     # Обнаружение лиц
-    dets = face_detector(rgb_image, 1)
+    dets = get_model("face_detector")(rgb_image, 1)
     if len(dets) == 0:
         return None
 
     # Получение ключевых точек лица
-    shape = shape_predictor(rgb_image, dets[0])
+    shape = get_model("shape_predictor")(rgb_image, dets[0])
 
     # Извлечение эмбеддинга лица
-    face_descriptor = face_rec_model.compute_face_descriptor(rgb_image, shape, num_jitters=1)
+    face_descriptor = get_model("face_rec_model").compute_face_descriptor(rgb_image, shape, num_jitters=1)
     return np.array(face_descriptor)
 
 # Функция для поиска совпадения лица
@@ -63,96 +119,228 @@ def find_matching_face(embedding):
         else:
             return None
 
-# Функция для отправки логов в сервис логирования
+# Функция для поиска среди уже распознанных лиц
+def find_used_face(embedding):
+    now = time.time()
+    # Вытесняем лица, которых давно не было
+    while used_faces and now - next(iter(used_faces.values()))[1] > USED_FACES_TTL:
+        used_faces.popitem(last=False)
+    if not used_faces:
+        return None
+    names = list(used_faces)
+    encodings = np.stack([used_faces[name][0] for name in names])
+    distances = np.linalg.norm(encodings - embedding, axis=1)
+    best = int(np.argmin(distances))
+    if distances[best] >= 0.6:
+        return None
+    remember_face(names[best], embedding)
+    return names[best]
+
+# Функция для сохранения распознанного лица
+def remember_face(name, embedding):
+    used_faces[name] = (embedding, time.time())
+    used_faces.move_to_end(name)
+    while len(used_faces) > USED_FACES_SIZE:
+        used_faces.popitem(last=False)
+
+# Функция для отправки логов в сервис логирования: только ставит сообщение в очередь
 def send_log_to_service(log_message):
     try:
-        response = requests.post(LOGGING_SERVICE_URL, json={"message": log_message})
-        if response.status_code != 200:
-            print(f"Failed to send log: {response.text}")
+        log_queue.put(log_message, timeout=LOG_PUT_TIMEOUT)
+    except Full:
+        spill_logs([log_message])
+
+# Функция для сохранения неотправленных логов в файл
+def spill_logs(messages):
+    if not messages:
+        return
+    try:
+        with open(LOG_SPILL_PATH, "a", encoding="utf-8") as f:
+            for message in messages:
+                f.write(message.replace("\n", " ") + "\n")
+    except OSError as e:
+        print(f"Error spilling {len(messages)} logs: {e}")
+
+# Функция для отправки пачки логов одним запросом
+def post_logs(messages):
+    try:
+        response = requests.post(LOGGING_SERVICE_URL, json={"messages": messages}, timeout=5)
+        if response.status_code == 200:
+            return True
+        print(f"Failed to send logs: {response.text}")
     except Exception as e:
-        print(f"Error sending log: {e}")
+        print(f"Error sending logs: {e}")
+    return False
+
+# Функция для досылки логов из файла после восстановления сервиса
+def replay_spilled_logs():
+    if not os.path.exists(LOG_SPILL_PATH):
+        return True
+    replay_path = LOG_SPILL_PATH + ".replay"
+    os.replace(LOG_SPILL_PATH, replay_path)
+    with open(replay_path, encoding="utf-8") as f:
+        messages = [line.rstrip("\n") for line in f if line.strip()]
+    os.remove(replay_path)
+    for start in range(0, len(messages), LOG_BATCH_SIZE):
+        if not post_logs(messages[start:start + LOG_BATCH_SIZE]):
+            spill_logs(messages[start:])
+            return False
+    return True
+
+# Поток отправки логов: пачка уходит по LOG_BATCH_SIZE сообщениям или раз в LOG_FLUSH_INTERVAL
+def send_logs():
+    retry_at = 0.0
+    running = True
+    while running:
+        batch = []
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                message = log_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except Empty:
+                break
+            if message is None:
+                running = False
+                break
+            batch.append(message)
+        if time.monotonic() < retry_at:
+            spill_logs(batch)
+            continue
+        if batch and not post_logs(batch):
+            spill_logs(batch)
+            retry_at = time.monotonic() + LOG_RETRY_INTERVAL
+        elif not replay_spilled_logs():
+            retry_at = time.monotonic() + LOG_RETRY_INTERVAL
+
+# Подготовка кадра один раз для всех моделей: letterbox до INFER_SIZE и тензор BCHW в [0, 1]
+def prepare_frame(frame):
+    height, width = frame.shape[:2]
+    scale = min(INFER_SIZE / height, INFER_SIZE / width)
+    new_width, new_height = int(round(width * scale)), int(round(height * scale))
+    pad_x, pad_y = (INFER_SIZE - new_width) // 2, (INFER_SIZE - new_height) // 2
+    canvas = np.full((INFER_SIZE, INFER_SIZE, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = cv2.resize(
+        frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    rgb = canvas[:, :, ::-1].transpose(2, 0, 1)
+    tensor = torch.from_numpy(np.ascontiguousarray(rgb)).unsqueeze(0).float().div_(255.0)
+    return tensor, scale, pad_x, pad_y
+
+# Запуск одной модели на общем тензоре, боксы возвращаются в координатах исходного кадра
+def run_model(model, tensor, scale, pad_x, pad_y, frame_shape, classes=None):
+    results = model(tensor, verbose=False, classes=classes)
+    detections = []
+    for box in results[0].boxes:
+        class_name = model.names[int(box.cls)]
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        x1 = int(np.clip((x1 - pad_x) / scale, 0, frame_shape[1]))
+        y1 = int(np.clip((y1 - pad_y) / scale, 0, frame_shape[0]))
+        x2 = int(np.clip((x2 - pad_x) / scale, 0, frame_shape[1]))
+        y2 = int(np.clip((y2 - pad_y) / scale, 0, frame_shape[0]))
+        detections.append({"label": class_name, "box": (x1, y1, x2, y2), "conf": float(box.conf)})
+    return detections
+
+# Все выбранные модели на одном подготовленном кадре, параллельно в пуле потоков
+def detect_all(frame, parameters):
+    tensor, scale, pad_x, pad_y = prepare_frame(frame)
+    jobs = {}
+    if "person" in parameters:
+        jobs["face"] = (get_model("face"), [0])
+    if any("object" in PARAMETER_MODELS[p] for p in parameters):
+        object_model = get_model("object")
+        jobs["object"] = (object_model, [c for c, name in object_model.names.items() if name in parameters])
+    if "helmet" in parameters:
+        helmet_model = get_model("helmet")
+        jobs["helmet"] = (helmet_model, [c for c, name in helmet_model.names.items() if name == "helmet"])
+
+    futures = {
+        kind: model_executor.submit(run_model, model, tensor, scale, pad_x, pad_y, frame.shape, classes)
+        for kind, (model, classes) in jobs.items()
+    }
+    return {kind: future.result() for kind, future in futures.items()}
+
+# Отрисовка объединённых детекций одним проходом
+def draw_detections(frame, detections):
+    for detection in detections:
+        x1, y1, x2, y2 = detection["box"]
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color=(0, 255, 0))
+        cv2.putText(frame, detection["label"], (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
 
 # Функция для обработки кадров
 def process_frames(parameters):
     while True:
-        if not frame_queue.empty():
-            frame = frame_queue.get()
-            if frame is None:
-                break
-
-            annotated_frame = frame.copy()
-
-            # Применение модели в зависимости от параметров
-            if "person" in parameters:
-                # Обработка лиц
-                results = FACE_MODEL(frame)
-                annotated_frame = results[0].plot(conf=False)
-
-                # Распознавание лиц с помощью dlib
-                for result in results:
-                    for box in result.boxes:
-                        if int(box.cls) == 0:  # Класс 0 соответствует лицу в YOLO
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            face_image = frame[y1:y2, x1:x2]
-
-                            # Извлечение эмбеддинга лица
-                            embedding = get_face_embedding(face_image)
-                            if embedding is not None:
-                                # Поиск совпадения в базе данных
-                                match = None
-                                for name, encoding in used_faces:
-                                    dist = np.linalg.norm(encoding - embedding)
-                                    min_dist = float("inf")
-                                    if dist < 0.6 and dist < min_dist:
-                                        match = name
-                                        min_dist = dist
-                                if match is None:
-                                    match = find_matching_face(embedding)
-                                    if match:
-                                        # Логирование нового лица
-                                        log_message = f"Person '{match}' entered the camera vision."
-                                        send_log_to_service(log_message)
-                                        used_faces.append((match, embedding))
-                                if match:
-                                    # Добавление текста с именем на кадр
-                                    cv2.putText(frame, match, (x1, y1 - 10),
-                                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-                                    cv2.rectangle(frame, (x1, y1), (x2, y2), color=(0, 255, 0))
-                                    
-            if "car" in parameters or "cell phone" in parameters or "traffic light" in parameters:
-                # Обработка объектов
-                results = OBJECT_MODEL(frame)
-                annotated_frame = results[0].plot(conf=False)
-
-                # Фильтрация объектов по выбранным параметрам
-                for result in results:
-                    for box in result.boxes:
-                        class_id = int(box.cls)
-                        class_name = OBJECT_MODEL.names[class_id]
-                        if class_name in parameters:
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            # Добавление текста с именем класса на кадр
-                            cv2.putText(annotated_frame, class_name, (x1, y1 - 10),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-            if "helmet" in parameters:
-                # Обработка шлемов
-                results = HELMET_MODEL(frame)
-                annotated_frame = results[0].plot(conf=False)
-
-                # Фильтрация объектов по выбранным параметрам
-                for result in results:
-                    for box in result.boxes:
-                        class_id = int(box.cls)
-                        class_name = HELMET_MODEL.names[class_id]
-                        if class_name == "helmet":  # Проверка на класс "шлем"
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            # Добавление текста с именем класса на кадр
-                            cv2.putText(annotated_frame, class_name, (x1, y1 - 10),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-            # Отправка обработанного кадра в выходной RTSP-поток
-            out.write(frame)
+        # Блокирующее ожидание кадра вместо опроса очереди
+        item = frame_queue.get()
+        if item is None:
+            break
+        captured_at, frame = item
+
+        # Один препроцессинг и параллельный запуск всех выбранных моделей
+        results = detect_all(frame, parameters)
+        detections = results.get("object", []) + results.get("helmet", [])
+
+        # Распознавание лиц с помощью dlib
+        for face in results.get("face", []):
+            x1, y1, x2, y2 = face["box"]
+            face_image = frame[y1:y2, x1:x2]
+
+            # Извлечение эмбеддинга лица
+            embedding = get_face_embedding(face_image)
+            if embedding is None:
+                detections.append({"label": "face", "box": face["box"], "conf": face["conf"]})
+                continue
+            # Поиск совпадения в базе данных
+            match = find_used_face(embedding)
+            if match is None:
+                match = find_matching_face(embedding)
+                if match:
+                    # Логирование нового лица
+                    log_message = f"Person '{match}' entered the camera vision."
+                    send_log_to_service(log_message)
+                    remember_face(match, embedding)
+            detections.append({"label": match or "face", "box": face["box"], "conf": face["conf"]})
+
+        # Отрисовка всех детекций на одном кадре
+        draw_detections(frame, detections)
+
+        # Отправка обработанного кадра на кодирование в выходной RTSP-поток
+        encode_queue.put((captured_at, frame))
+    encode_queue.put(None)
+
+# Функция для кодирования кадров в выходной поток
+def encode_frames():
+    while True:
+        item = encode_queue.get()
+        if item is None:
+            break
+        captured_at, frame = item
+        out.write(frame)
+        latencies.append((time.monotonic() - captured_at) * 1000)
+
+# Функция для постановки кадра в очередь согласно политике захвата:
+# block ждёт свободного места, drop-oldest и latest-only вытесняют старые кадры
+def offer_frame(item, policy):
+    global dropped_frames
+    if policy == "block":
+        frame_queue.put(item)
+        return
+    with frame_queue.not_full:
+        while frame_queue._qsize() >= frame_queue.maxsize:
+            frame_queue._get()
+            frame_queue.unfinished_tasks -= 1
+            dropped_frames += 1
+        frame_queue._put(item)
+        frame_queue.unfinished_tasks += 1
+        frame_queue.not_empty.notify()
+
+# Функция для вывода глубины очередей и загрузки CPU
+def report_queues(cpu_state):
+    now, cpu = time.time(), time.process_time()
+    cpu_cores = (cpu - cpu_state[1]) / max(now - cpu_state[0], 1e-6)
+    delay = f"{sum(latencies) / len(latencies):.0f}/{max(latencies):.0f} ms" if latencies else "-"
+    print(f"📊 Queues: capture={frame_queue.qsize()} encode={encode_queue.qsize()} | "
+          f"Dropped: {dropped_frames} | Capture-to-output avg/max: {delay} | CPU: {cpu_cores:.2f} cores")
+    return now, cpu
 
 # Парсинг аргументов командной строки
 parser = argparse.ArgumentParser(description="Process video stream with specific parameters.")
@@ -163,8 +351,22 @@ parser.add_argument(
     default=[],  # Changed default to an empty list
     help="List of parameters to process: person, car, cell phone, traffic light, helmet."
 )
+parser.add_argument(
+    "--capture-policy",
+    choices=["block", "drop-oldest", "latest-only"],
+    default="block",
+    help="What to do when processing falls behind: block capture, drop the oldest frame or keep only the latest one."
+)
 args = parser.parse_args()
 
+# latest-only - очередь на один кадр
+frame_queue = Queue(maxsize=1 if args.capture_policy == "latest-only" else 10)
+
+# Загружаем заранее только модели, нужные для выбранных параметров
+for parameter in args.parameters:
+    for model_name in PARAMETER_MODELS[parameter]:
+        get_model(model_name)
+
 # Открытие RTSP-потока
 cap = cv2.VideoCapture(RTSP_INPUT_URL)
 if not cap.isOpened():
@@ -199,6 +401,11 @@ if not out.isOpened():
 # Запуск потока для обработки кадров
 processor_thread = Thread(target=process_frames, args=(args.parameters,))
 processor_thread.start()
+encoder_thread = Thread(target=encode_frames)
+encoder_thread.start()
+log_thread = Thread(target=send_logs)
+log_thread.start()
+cpu_state = (time.time(), time.process_time())
 
 frame_ind = 0
 while cap.isOpened():
@@ -207,12 +414,18 @@ while cap.isOpened():
         print("❌ Error: Failed to read frame from RTSP stream!")
         break
 
-    frame_queue.put(frame)
+    offer_frame((time.monotonic(), frame), args.capture_policy)
     frame_ind += 1
+    if frame_ind % 900 == 0:
+        cpu_state = report_queues(cpu_state)
 
 # Остановка потока обработки
-frame_queue.put(None)
+offer_frame(None, args.capture_policy)
 processor_thread.join()
+encoder_thread.join()
+log_queue.put(None)
+log_thread.join()
+model_executor.shutdown()
 
 # Освобождение ресурсов
 out.release()
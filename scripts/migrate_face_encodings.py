@@ -0,0 +1,17 @@
+"""Переводит faces.encoding из текстового формата в бинарный.
+
+Запуск из корня проекта: python scripts/migrate_face_encodings.py
+База берётся из DATABASE_URL, как и в приложении.
+"""
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine
+from app.face_codec import migrate_face_encodings
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate_face_encodings(engine)
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from frame_pool import ScratchBuffers
+
+Color = Tuple[int, int, int]
+
+
+class AnnotationRenderer:
+    """Отрисовка рамок и подписей детекций без копий всего кадра.
+
+    Полупрозрачная рамка смешивается только в прямоугольнике вокруг бокса
+    через рабочий буфер: вне рамки overlay совпадает с кадром, поэтому
+    результат тот же, что у смешивания целого кадра. Подписи рисуются
+    после всех рамок одним проходом; растр каждой подписи (маска пикселей
+    текста) строится cv2.putText один раз и хранится в LRU-кэше на
+    max_labels подписей - имена людей повторяются на каждом кадре.
+    Растр хранится как покрытие 0..1 и смешивается с кадром, поэтому
+    сглаженный текст (OpenCV 5 всегда сглаживает putText) выглядит так же.
+    """
+
+    def __init__(self, color: Color = (0, 255, 0), thickness: int = 2, font=cv2.FONT_HERSHEY_SIMPLEX,
+                 font_scale: float = 0.9, text_thickness: int = 2, max_labels: int = 256):
+        self.color = color
+        self.thickness = thickness
+        self.font = font
+        self.font_scale = font_scale
+        self.text_thickness = text_thickness
+        self.max_labels = max_labels
+        self.scratch = ScratchBuffers()
+        self._labels: "OrderedDict[str, Tuple[np.ndarray, int, int]]" = OrderedDict()
+        self.label_hits = 0
+        self.label_misses = 0
+
+    def draw_box(self, frame: np.ndarray, box, alpha: float = 1.0, color: Optional[Color] = None):
+        """Рамка с прозрачностью alpha (1.0 - непрозрачная)"""
+        color = color or self.color
+        x1, y1, x2, y2 = (int(v) for v in box)
+        if alpha >= 1.0:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, self.thickness)
+            return
+        height, width = frame.shape[:2]
+        pad = self.thickness
+        rx1, ry1 = max(0, x1 - pad), max(0, y1 - pad)
+        rx2, ry2 = min(width, x2 + pad + 1), min(height, y2 + pad + 1)
+        if rx2 <= rx1 or ry2 <= ry1:
+            return
+        region = frame[ry1:ry2, rx1:rx2]
+        overlay = self.scratch.get("overlay", region.shape)
+        np.copyto(overlay, region)
+        cv2.rectangle(overlay, (x1 - rx1, y1 - ry1), (x2 - rx1, y2 - ry1), color, self.thickness)
+        cv2.addWeighted(overlay, alpha, region, 1 - alpha, 0, region)
+
+    def label_mask(self, text: str) -> Tuple[np.ndarray, int, int]:
+        """Покрытие подписи (h, w, 1) и смещение её левого верхнего угла относительно точки putText"""
+        cached = self._labels.get(text)
+        if cached is not None:
+            self._labels.move_to_end(text)
+            self.label_hits += 1
+            return cached
+        self.label_misses += 1
+        (text_width, text_height), baseline = cv2.getTextSize(text, self.font, self.font_scale, self.text_thickness)
+        # Запас на толщину линий: putText рисует штрихи шире номинального размера текста
+        pad = self.text_thickness + 1
+        mask = np.zeros((text_height + baseline + 2 * pad, text_width + 2 * pad), dtype=np.uint8)
+        cv2.putText(mask, text, (pad, pad + text_height), self.font, self.font_scale, 255, self.text_thickness)
+        cached = ((mask.astype(np.float32) / 255.0)[..., None], -pad, -(pad + text_height))
+        self._labels[text] = cached
+        if len(self._labels) > self.max_labels:
+            self._labels.popitem(last=False)
+        return cached
+
+    def draw_label(self, frame: np.ndarray, text: str, origin, color: Optional[Color] = None):
+        """То же, что cv2.putText(frame, text, origin, ...), но из кэшированного растра"""
+        mask, dx, dy = self.label_mask(text)
+        height, width = frame.shape[:2]
+        left, top = int(origin[0]) + dx, int(origin[1]) + dy
+        # Обрезаем растр по границам кадра
+        x1, y1 = max(0, left), max(0, top)
+        x2, y2 = min(width, left + mask.shape[1]), min(height, top + mask.shape[0])
+        if x2 <= x1 or y2 <= y1:
+            return
+        visible = mask[y1 - top:y2 - top, x1 - left:x2 - left]
+        region = frame[y1:y2, x1:x2]
+        color = np.asarray(color or self.color, dtype=np.float32)
+        region[...] = region * (1.0 - visible) + color * visible + 0.5
+
+    def draw(self, frame: np.ndarray, boxes: Iterable[Tuple], labels: Iterable[Tuple] = ()):
+        """Сначала все рамки (box, alpha[, color]), затем все подписи (text, origin[, color])"""
+        for box in boxes:
+            self.draw_box(frame, *box)
+        for label in labels:
+            self.draw_label(frame, *label)
+        return frame
+
+    @property
+    def cached_labels(self) -> int:
+        return len(self._labels)
@@ -0,0 +1,75 @@
+"""Полнота и задержка IVF-индекса относительно точного поиска FaceGallery.
+
+Запуск: python test/bench_ann_index.py --faces 200000 --nprobe 1 2 4 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ann_index import IVFFlatIndex
+from face_gallery import FaceGallery
+
+
+def make_gallery(n_faces, per_person, seed):
+    """Синтетические дескрипторы: несколько снимков на человека вокруг общего центра"""
+    rng = np.random.default_rng(seed)
+    n_persons = max(1, n_faces // per_person)
+    centers = rng.normal(size=(n_persons, 128)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    person_ids = rng.integers(0, n_persons, n_faces)
+    embeddings = centers[person_ids] + rng.normal(scale=0.03, size=(n_faces, 128)).astype(np.float32)
+    return embeddings, person_ids, centers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark of IVFFlatIndex against exact search.")
+    parser.add_argument("--faces", type=int, default=200000)
+    parser.add_argument("--per-person", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    embeddings, person_ids, centers = make_gallery(args.faces, args.per_person, seed=0)
+    face_ids = np.arange(args.faces)
+    query_persons = rng.integers(0, centers.shape[0], args.queries)
+    queries = centers[query_persons] + rng.normal(scale=0.03, size=(args.queries, 128)).astype(np.float32)
+
+    start = time.perf_counter()
+    index = IVFFlatIndex.build(embeddings, face_ids, person_ids, nlist=args.nlist)
+    print(f"Built IVF index: {len(index)} faces, {index.nlist} lists in {time.perf_counter() - start:.1f}s")
+
+    gallery = FaceGallery(capacity=args.faces)
+    gallery.add(face_ids, person_ids, embeddings)
+
+    def run(search):
+        results = []
+        start = time.perf_counter()
+        for i in range(0, args.queries, args.batch):
+            results.append(search(queries[i:i + args.batch]))
+        elapsed = (time.perf_counter() - start) / args.queries
+        return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results]), elapsed
+
+    exact_idx, _, exact_time = run(gallery.nearest)
+    exact_faces = gallery.face_ids[exact_idx]
+    exact_persons, _ = gallery.match_batch(queries)
+    print(f"{'search':>10} | {'recall@1':>8} | {'same person':>11} | {'per query':>10} | {'speedup':>7}")
+    print(f"{'exact':>10} | {1.0:>8.3f} | {1.0:>11.3f} | {exact_time * 1000:>7.3f} ms | {1.0:>6.1f}x")
+    for nprobe in args.nprobe:
+        if nprobe > index.nlist:
+            continue
+        ann_idx, _, ann_time = run(lambda q: index.nearest(q, nprobe=nprobe))
+        recall = np.mean(index.face_ids[ann_idx] == exact_faces)
+        ann_persons, _ = index.match_batch(queries, nprobe=nprobe)
+        same_person = np.mean(ann_persons == exact_persons)
+        print(
+            f"{f'nprobe={nprobe}':>10} | {recall:>8.3f} | {same_person:>11.3f} | "
+            f"{ann_time * 1000:>7.3f} ms | {exact_time / ann_time:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
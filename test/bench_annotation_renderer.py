@@ -0,0 +1,75 @@
+"""Микробенчмарк отрисовки детекций: прежний draw_detections из temp.py против AnnotationRenderer.
+
+Прежняя функция на каждую детекцию копирует весь кадр и смешивает его
+целиком; рендерер смешивает только область рамки и берёт подписи из кэша.
+
+Запуск: python test/bench_annotation_renderer.py --width 1920 --height 1080 --faces 10
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from annotation_renderer import AnnotationRenderer
+
+
+def draw_detections_legacy(frame, detections):
+    for det in detections:
+        x1, y1, x2, y2 = det['box']
+        overlay = frame.copy()
+        alpha = 0.3 + 0.4 * det['conf']
+        cv2.rectangle(overlay, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+        if det['person']:
+            cv2.putText(frame, det['person'], (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+
+def draw_detections_renderer(renderer, frame, detections):
+    boxes = [(det['box'], 0.3 + 0.4 * det['conf']) for det in detections]
+    labels = [(det['person'], (det['box'][0], det['box'][1] - 10)) for det in detections if det['person']]
+    renderer.draw(frame, boxes, labels)
+
+
+def make_detections(width, height, faces, rng):
+    detections = []
+    for i in range(faces):
+        size = int(rng.integers(60, 200))
+        x1, y1 = int(rng.integers(0, width - size)), int(rng.integers(20, height - size))
+        detections.append({
+            'box': (x1, y1, x1 + size, y1 + size),
+            'conf': float(rng.uniform(0.5, 1.0)),
+            'person': f"Person {i}" if i % 3 else None,
+        })
+    return detections
+
+
+def timeit(fn, frames):
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn()
+    return (time.perf_counter() - start) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-detection full-frame blending against AnnotationRenderer.")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+    print(f"{args.width}x{args.height}, {args.frames} frames per run")
+    print(f"{'faces':>6} | {'legacy':>10} | {'renderer':>10} | {'speedup':>8}")
+    for faces in args.faces:
+        detections = make_detections(args.width, args.height, faces, rng)
+        renderer = AnnotationRenderer()
+        legacy = timeit(lambda: draw_detections_legacy(frame, detections), args.frames)
+        current = timeit(lambda: draw_detections_renderer(renderer, frame, detections), args.frames)
+        print(f"{faces:>6} | {legacy * 1000:>7.2f} ms | {current * 1000:>7.2f} ms | {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Бенчмарк FaceEmbedder: повторный HOG-поиск внутри кропа против бокса YOLO.
+
+Кропы берутся из каталога вида <dir>/<person>/<image>.jpg; каждый кроп
+содержит лицо с отступом --padding пикселей, как в read_frames.
+Для каждого режима выводится время на кроп, доля кропов с эмбеддингом и
+доля верных совпадений (leave-one-out поиск по остальным кропам).
+
+Запуск: python test/bench_face_embedder.py --crops /data/face_crops --padding 20
+"""
+import argparse
+import os
+import time
+
+import cv2
+import dlib
+import numpy as np
+
+from face_embedder import FaceEmbedder
+from face_gallery import FaceGallery
+
+
+def load_crops(root):
+    crops, labels = [], []
+    for label, person in enumerate(sorted(os.listdir(root))):
+        person_dir = os.path.join(root, person)
+        if not os.path.isdir(person_dir):
+            continue
+        for name in sorted(os.listdir(person_dir)):
+            image = cv2.imread(os.path.join(person_dir, name))
+            if image is not None:
+                crops.append(image)
+                labels.append(label)
+    return crops, np.asarray(labels, dtype=np.int64)
+
+
+def match_rate(embeddings, valid, labels):
+    """Доля кропов, для которых ближайший другой кроп того же человека ближе порога"""
+    rows = np.nonzero(valid)[0]
+    if rows.size < 2:
+        return 0.0
+    hits = 0
+    for row in rows:
+        gallery = FaceGallery(capacity=rows.size)
+        others = rows[rows != row]
+        gallery.add(others, labels[others], embeddings[others])
+        person_id, _ = gallery.match(embeddings[row])
+        hits += person_id == labels[row]
+    return hits / len(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HOG re-detection against YOLO boxes for dlib embeddings.")
+    parser.add_argument("--crops", required=True, help="Directory with one subdirectory of face crops per person")
+    parser.add_argument("--padding", type=int, default=20, help="Padding around the YOLO box in each crop")
+    parser.add_argument("--batch", type=int, default=3, help="Faces per embed_crops call (max_det in read_frames)")
+    parser.add_argument("--models", default="ml_models")
+    args = parser.parse_args()
+
+    crops, labels = load_crops(args.crops)
+    face_boxes = [
+        (args.padding, args.padding, crop.shape[1] - args.padding, crop.shape[0] - args.padding)
+        for crop in crops
+    ]
+    shape_predictor = dlib.shape_predictor(os.path.join(args.models, "shape_predictor_68_face_landmarks.dat"))
+    face_rec_model = dlib.face_recognition_model_v1(
+        os.path.join(args.models, "dlib_face_recognition_resnet_model_v1.dat"))
+
+    print(f"{len(crops)} crops of {len(set(labels.tolist()))} people")
+    print(f"{'mode':>8} | {'per crop':>10} | {'embedded':>9} | {'matched':>8}")
+    for mode, redetect in (("hog", True), ("yolo", False)):
+        embedder = FaceEmbedder(dlib.get_frontal_face_detector(), shape_predictor, face_rec_model, redetect=redetect)
+        embeddings = np.zeros((len(crops), 128), dtype=np.float32)
+        valid = np.zeros(len(crops), dtype=bool)
+        start = time.perf_counter()
+        for i in range(0, len(crops), args.batch):
+            batch_embeddings, batch_valid = embedder.embed_crops(crops[i:i + args.batch], face_boxes[i:i + args.batch])
+            embeddings[i:i + args.batch] = batch_embeddings
+            valid[i:i + args.batch] = batch_valid
+        per_crop = (time.perf_counter() - start) / max(1, len(crops))
+        print(
+            f"{mode:>8} | {per_crop * 1000:>7.2f} ms | {valid.mean():>8.1%} | "
+            f"{match_rate(embeddings, valid, labels):>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
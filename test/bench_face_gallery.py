@@ -0,0 +1,65 @@
+"""Бенчмарк поиска по галерее лиц: цикл по словарю против FaceGallery.
+
+Запуск: python test/bench_face_gallery.py --sizes 100 1000 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from face_gallery import FaceGallery
+
+
+def legacy_find(cache, embedding):
+    """Старая реализация find_matching_face: цикл по словарю с np.linalg.norm"""
+    min_dist = float("inf")
+    best_match = None
+    for face_id, (cached_encoding, person_name) in cache.items():
+        dist = np.linalg.norm(cached_encoding - embedding)
+        if dist < 0.6 and dist < min_dist:
+            min_dist = dist
+            best_match = person_name
+    return best_match
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FaceGallery nearest-neighbour search.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000, 100000, 1000000])
+    parser.add_argument("--batch", type=int, default=16, help="Number of faces per batched query")
+    parser.add_argument("--legacy-limit", type=int, default=100000, help="Skip the Python loop above this size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'faces':>10} | {'legacy 1q':>12} | {'gallery 1q':>12} | {f'gallery {args.batch}q':>12} | {'per face':>10}")
+    for size in args.sizes:
+        embeddings = rng.normal(size=(size, 128)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        queries = embeddings[rng.integers(0, size, args.batch)] + 0.01
+
+        gallery = FaceGallery(capacity=size)
+        gallery.add(np.arange(size), np.arange(size) % 1000, embeddings)
+        repeat = max(1, 100000 // size)
+
+        legacy = "-"
+        if size <= args.legacy_limit:
+            cache = {i: (embeddings[i].astype(np.float64), f"p{i}") for i in range(size)}
+            legacy_time = timeit(lambda: legacy_find(cache, queries[0]), max(1, repeat // 10))
+            legacy = f"{legacy_time * 1000:.3f} ms"
+
+        single = timeit(lambda: gallery.match(queries[0]), repeat)
+        batch = timeit(lambda: gallery.match_batch(queries), repeat)
+        print(
+            f"{size:>10} | {legacy:>12} | {single * 1000:>9.3f} ms | {batch * 1000:>9.3f} ms | "
+            f"{batch / args.batch * 1000:>7.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
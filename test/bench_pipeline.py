@@ -0,0 +1,78 @@
+"""Сколько CPU тратит потребитель очереди: опрос empty() против блокирующего get().
+
+Производитель отдаёт кадры с частотой --fps, потребитель делает --work мс
+работы на кадр. Печатается процессорное время на секунду работы (в ядрах).
+
+Запуск: python test/bench_pipeline.py --seconds 5 --fps 30 --work 5
+"""
+import argparse
+import threading
+import time
+from queue import Queue
+
+import numpy as np
+
+from pipeline import Pipeline
+
+
+def work(frame, seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+    return frame
+
+
+def produce(put, fps, seconds):
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        put(frame)
+        time.sleep(1.0 / fps)
+
+
+def busy_wait(args):
+    """Прежний цикл process_frames"""
+    frame_queue = Queue(maxsize=10)
+
+    def consumer():
+        while True:
+            if not frame_queue.empty():
+                frame = frame_queue.get()
+                if frame is None:
+                    break
+                work(frame, args.work / 1000)
+
+    thread = threading.Thread(target=consumer)
+    thread.start()
+    produce(frame_queue.put, args.fps, args.seconds)
+    frame_queue.put(None)
+    thread.join()
+
+
+def blocking(args):
+    pipeline = Pipeline().add_stage("process", lambda frame: work(frame, args.work / 1000)).start()
+    produce(pipeline.put, args.fps, args.seconds)
+    pipeline.close()
+
+
+def measure(fn, args):
+    wall, cpu = time.monotonic(), time.process_time()
+    fn(args)
+    return (time.process_time() - cpu) / (time.monotonic() - wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CPU usage of busy-wait and blocking queue consumers.")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--work", type=float, default=5.0, help="Work per frame, ms")
+    args = parser.parse_args()
+
+    useful = args.fps * args.work / 1000
+    print(f"useful work: {useful:.2f} cores")
+    for name, fn in (("busy-wait", busy_wait), ("blocking", blocking)):
+        print(f"{name:>10}: {measure(fn, args):.2f} cores")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Извлечение эмбеддингов dlib в пуле процессов.
+
+shape_predictor и compute_face_descriptor держат GIL, поэтому в потоке
+обработки всплеск распознавания (в кадр вошла группа людей) задерживает
+вывод видео. EmbeddingPool выносит их в отдельные процессы: каждый
+воркер один раз создаёт свой FaceEmbedder (и загружает модели dlib), кропы
+лиц копируются в слот общей памяти вместо сериализации, а по очереди
+передаются только смещения и формы. submit() не ждёт воркера, готовые
+результаты забираются неблокирующим poll().
+
+При создании пула, до старта потоков захвата, через fork запускается
+процесс-супервизор, а уже он форкает воркеры: главный скрипт не
+импортируется в воркерах заново, а фабрике эмбеддера не нужно быть
+сериализуемой. Упавший воркер супервизор форкает заново из себя - в нём
+нет потоков, поэтому в новый воркер не попадут блокировки, захваченные
+потоками стрим-процессора. workers=0 - эмбеддинги считаются в вызывающем
+потоке, результат отдаётся следующим poll().
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from queue import Empty
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from face_gallery import EMBEDDING_DIM
+from metrics import Metrics, metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+STOP = None
+
+BoxType = Tuple[int, int, int, int]
+
+
+@dataclass
+class EmbeddingResult:
+    """Результат задания: ключ из submit(), матрица (N, 128) и маска valid в порядке кропов"""
+    key: Any
+    embeddings: np.ndarray
+    valid: np.ndarray
+    rejected: int = 0  # Лица, отброшенные shape_filter эмбеддера
+    seconds: float = 0.0  # Время расчёта в воркере
+
+
+def empty_result(key, count: int) -> EmbeddingResult:
+    return EmbeddingResult(key, np.zeros((count, EMBEDDING_DIM), dtype=np.float32), np.zeros(count, dtype=bool))
+
+
+def embed_job(embedder, crops: Sequence[Optional[np.ndarray]],
+              face_boxes: Optional[Sequence[Optional[BoxType]]]) -> Tuple[np.ndarray, np.ndarray, int, float]:
+    rejected = embedder.rejected
+    start = time.perf_counter()
+    embeddings, valid = embedder.embed_crops(crops, face_boxes)
+    return embeddings, valid, embedder.rejected - rejected, time.perf_counter() - start
+
+
+def _worker(embedder_factory: Callable[[], Any], buffer: memoryview, tasks, results):
+    embedder = embedder_factory()
+    while True:
+        job = tasks.get()
+        if job is STOP:
+            break
+        job_id, layout, face_boxes = job
+        try:
+            crops = [
+                np.ndarray(shape, dtype=np.uint8, buffer=buffer, offset=offset) if shape is not None else None
+                for offset, shape in layout
+            ]
+            results.put((job_id,) + embed_job(embedder, crops, face_boxes))
+        except Exception as e:
+            logger.error(f"Error in embedding worker: {e}")
+            results.put((job_id, None, None, 0, 0.0))
+
+
+def _supervise(embedder_factory: Callable[[], Any], buffer: memoryview, tasks, results, workers: int,
+               alive, restarts, stopping, restart_delay: float):
+    """Держит workers воркеров, форкая их из себя; alive и restarts - общие счётчики для пула"""
+    children: Dict[int, int] = {}  # pid -> номер воркера
+
+    def start(index: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                _worker(embedder_factory, buffer, tasks, results)
+            except BaseException as e:
+                logger.error(f"Embedding worker {index} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def terminate(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    for index in range(workers):
+        start(index)
+    alive.value = len(children)
+    while children:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        alive.value = len(children)
+        if index is None or stopping.is_set():
+            continue
+        # Воркер, убитый OOM или упавший в dlib, иначе навсегда оставил бы пул без процессов;
+        # его задание вернётся пустым по job_timeout
+        logger.error(f"Embedding worker {index} died with status {status}, restarting workers")
+        # Убитый воркер мог держать блокировку чтения заданий или записи результатов, и все
+        # остальные ждали бы её вечно. Останавливаем остальных: после этого блокировки может
+        # держать только мёртвый процесс, и их можно снять. Их задания тоже вернутся по таймауту
+        for other in list(children):
+            os.kill(other, signal.SIGKILL)
+            os.waitpid(other, 0)
+        children.clear()
+        for lock in (tasks._rlock, results._wlock):
+            lock.acquire(False)
+            lock.release()
+        # Пауза не даёт крутить перезапуск, если воркер падает сразу после старта
+        time.sleep(restart_delay)
+        for index in range(workers):
+            start(index)
+        alive.value = len(children)
+        with restarts.get_lock():
+            restarts.value += workers
+
+
+class EmbeddingPool:
+    """Асинхронный расчёт эмбеддингов в workers процессах.
+
+    Под задания выделено slots слотов общей памяти по slot_bytes байт; слот
+    занят, пока результат не забран poll(). Если свободных слотов нет,
+    submit() возвращает False и кропы не принимает - распознавание просто
+    повторится на следующих кадрах. Задание, не вернувшееся за job_timeout
+    секунд (например, воркер упал), отдаётся пустым результатом, а его слот
+    освобождается. Если воркер упал, супервизор через restart_delay секунд
+    перезапускает все воркеры.
+    """
+
+    def __init__(self, embedder_factory: Callable[[], Any], workers: int = 1, slots: Optional[int] = None,
+                 slot_bytes: int = 4 * 2**20, job_timeout: float = 10.0, restart_delay: float = 1.0,
+                 metrics: Optional[Metrics] = None):
+        self.workers = workers
+        self.slots = slots or 2 * max(1, workers)
+        self.slot_bytes = slot_bytes
+        self.job_timeout = job_timeout
+        self.metrics = metrics or default_metrics
+        self._jobs: Dict[int, Tuple[Any, int, int, float]] = {}  # job_id -> (key, слот, кропов, время отправки)
+        self._ids = itertools.count()
+        self._free: Deque[int] = deque(range(self.slots))
+        self._done: Deque[EmbeddingResult] = deque()
+        self._supervisor: Optional[multiprocessing.Process] = None
+        self._embedder = None
+        self._shm = None
+        self._restarts_seen = 0
+        if workers <= 0:
+            self._embedder = embedder_factory()
+        else:
+            context = multiprocessing.get_context("fork")
+            self._shm = shared_memory.SharedMemory(create=True, size=self.slots * slot_bytes)
+            self._tasks = context.Queue()
+            self._results = context.Queue()
+            self._alive = context.Value("i", 0)
+            self._restarts = context.Value("i", 0)
+            self._stopping = context.Event()
+            self._supervisor = context.Process(
+                target=_supervise, name="embedding-supervisor", daemon=True,
+                args=(embedder_factory, self._shm.buf, self._tasks, self._results, workers,
+                      self._alive, self._restarts, self._stopping, restart_delay),
+            )
+            self._supervisor.start()
+        self.metrics.register_gauge("embedding_jobs_pending", lambda: len(self._jobs))
+        self.metrics.register_gauge("embedding_workers_alive", lambda: self.workers_alive)
+
+    @property
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def workers_alive(self) -> int:
+        if self._supervisor is None or not self._supervisor.is_alive():
+            return 0
+        return self._alive.value
+
+    def submit(self, key, crops: Sequence[Optional[np.ndarray]],
+               face_boxes: Optional[Sequence[Optional[BoxType]]] = None) -> bool:
+        """Ставит кропы (uint8) в очередь; False - все слоты заняты, задание не принято"""
+        if self._embedder is not None:
+            embeddings, valid, rejected, seconds = embed_job(self._embedder, crops, face_boxes)
+            self._done.append(EmbeddingResult(key, embeddings, valid, rejected, seconds))
+            self.metrics.observe("embedding_ms", seconds * 1000)
+            return True
+        if not self._free:
+            self.metrics.inc("embedding_pool_busy")
+            return False
+        slot = self._free.popleft()
+        offset, end = slot * self.slot_bytes, (slot + 1) * self.slot_bytes
+        layout = []
+        for crop in crops:
+            if crop is None or crop.size == 0:
+                layout.append((0, None))
+                continue
+            if offset + crop.nbytes > end:
+                # Кроп не помещается в слот: лицо считается ненайденным
+                self.metrics.inc("embedding_crops_oversized")
+                layout.append((0, None))
+                continue
+            np.copyto(np.ndarray(crop.shape, dtype=np.uint8, buffer=self._shm.buf, offset=offset), crop)
+            layout.append((offset, crop.shape))
+            offset += crop.nbytes
+        job_id = next(self._ids)
+        self._jobs[job_id] = (key, slot, len(layout), time.monotonic())
+        self._tasks.put((job_id, layout, list(face_boxes) if face_boxes is not None else None))
+        return True
+
+    def poll(self) -> List[EmbeddingResult]:
+        """Готовые результаты без ожидания"""
+        results = list(self._done)
+        self._done.clear()
+        if self._shm is None:
+            return results
+        restarts = self._restarts.value
+        if restarts > self._restarts_seen:
+            self.metrics.inc("embedding_worker_restarts", restarts - self._restarts_seen)
+            self._restarts_seen = restarts
+        now = time.monotonic()
+        while True:
+            try:
+                job_id, embeddings, valid, rejected, seconds = self._results.get_nowait()
+            except Empty:
+                break
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                # Задание уже отдано по таймауту
+                continue
+            key, slot, count, submitted_at = job
+            self._free.append(slot)
+            if embeddings is None:
+                self.metrics.inc("embedding_errors")
+                results.append(empty_result(key, count))
+                continue
+            self.metrics.observe("embedding_ms", seconds * 1000)
+            self.metrics.observe("embedding_latency_ms", (now - submitted_at) * 1000)
+            results.append(EmbeddingResult(key, embeddings, valid, rejected, seconds))
+        for job_id, (key, slot, count, submitted_at) in list(self._jobs.items()):
+            if now - submitted_at > self.job_timeout:
+                del self._jobs[job_id]
+                self._free.append(slot)
+                self.metrics.inc("embedding_timeouts")
+                logger.error(f"Embedding job {job_id} timed out after {self.job_timeout}s")
+                results.append(empty_result(key, count))
+        return results
+
+    def close(self, timeout: float = 5.0):
+        """Останавливает воркеры и освобождает общую память"""
+        if self._shm is None:
+            return
+        self._stopping.set()
+        for _ in range(self.workers):
+            self._tasks.put(STOP)
+        self._supervisor.join(timeout)
+        if self._supervisor.is_alive():
+            # Супервизор по SIGTERM убивает свои воркеры
+            self._supervisor.terminate()
+            self._supervisor.join(timeout)
+        self._tasks.close()
+        self._results.close()
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import threading
+import time
+from queue import Empty, Full, Queue
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import Metrics, metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+STOP = object()
+
+Event = Dict[str, Any]
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Временная ли ошибка записи: по умолчанию только OSError (обрыв соединения, таймаут)"""
+    return isinstance(error, OSError)
+
+
+class EventSink(threading.Thread):
+    """Фоновая запись событий пачками, поток обработки кадров базу не ждёт.
+
+    emit() кладёт событие (словарь с JSON-значениями) в буфер на max_buffer
+    событий. Поток записи отдаёт write_batch до batch_size событий за раз:
+    как только их набралось столько или первое событие пачки прождало
+    flush_interval секунд. Если буфер полон, emit() ждёт до put_timeout
+    (обратное давление на обработку), затем пишет событие сразу в файл
+    spill_path. Туда же строками JSON уходят пачки, которые не удалось
+    записать из-за недоступной базы (is_transient(ошибка) истинно);
+    retry_interval секунд после такой ошибки новые пачки пишутся в файл без
+    попытки записи, затем файл переигрывается через write_batch. Остальные
+    ошибки считаются ошибками данных (например, нарушение внешнего ключа):
+    пачка делится пополам, пока плохие события не останутся по одному, и
+    они уходят в dead_letter_path, а не на повтор.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Event]], None], max_buffer: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.5, put_timeout: float = 0.05, spill_path: Optional[str] = None,
+                 retry_interval: float = 5.0, dead_letter_path: Optional[str] = None,
+                 is_transient: Callable[[Exception], bool] = is_connection_error, metrics: Optional[Metrics] = None):
+        super().__init__(name="event-sink", daemon=True)
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.spill_path = spill_path
+        self.retry_interval = retry_interval
+        self.dead_letter_path = dead_letter_path
+        self.is_transient = is_transient
+        self.metrics = metrics or default_metrics
+        self._queue: Queue = Queue(maxsize=max_buffer)
+        self._spill_lock = threading.Lock()
+        self._retry_at = 0.0
+        self._stopping = False
+        self.metrics.register_gauge("events_buffered", self._queue.qsize)
+
+    def emit(self, event: Event) -> bool:
+        """Ставит событие в буфер; False - буфер полон и событие ушло в файл (или потеряно без spill_path)"""
+        try:
+            self._queue.put(event, timeout=self.put_timeout)
+            return True
+        except Full:
+            self.metrics.inc("events_backpressure")
+            self._spill([event])
+            return False
+
+    @property
+    def buffered(self) -> int:
+        return self._queue.qsize()
+
+    def _next_batch(self) -> List[Event]:
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except Empty:
+            return []
+        if first is STOP:
+            self._stopping = True
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except Empty:
+                break
+            if item is STOP:
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def _write(self, batch: List[Event]) -> bool:
+        """True - пачка записана (плохие события отложены в dead letter), False - ушла в файл на повтор"""
+        if time.monotonic() < self._retry_at:
+            # База недавно не ответила: не держим буфер на таймаутах подключения
+            self._spill(batch)
+            return False
+        start = time.monotonic()
+        try:
+            self.write_batch(batch)
+        except Exception as e:
+            if not self.is_transient(e):
+                return self._isolate(batch, e)
+            logger.error(f"Error writing {len(batch)} events: {e}")
+            self.metrics.inc("events_write_errors")
+            self._retry_at = time.monotonic() + self.retry_interval
+            self._spill(batch)
+            return False
+        self.metrics.inc("events_written", len(batch))
+        self.metrics.observe("events_batch_size", len(batch))
+        self.metrics.observe("events_flush_ms", (time.monotonic() - start) * 1000)
+        return True
+
+    def _isolate(self, batch: List[Event], error: Exception) -> bool:
+        # Пачка с ошибкой данных пишется по половинам: хорошие события не ждут и не повторяются
+        self.metrics.inc("events_rejected_batches")
+        if len(batch) == 1:
+            self._dead_letter(batch[0], error)
+            return True
+        middle = len(batch) // 2
+        first = self._write(batch[:middle])
+        return self._write(batch[middle:]) and first
+
+    def _dead_letter(self, event: Event, error: Exception):
+        logger.error(f"Event rejected by the database: {error}")
+        if not self.dead_letter_path:
+            self.metrics.inc("events_dropped")
+            return
+        try:
+            with self._spill_lock, open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"error": str(error), "event": event}, ensure_ascii=False) + "\n")
+            self.metrics.inc("events_dead_lettered")
+        except OSError as e:
+            self.metrics.inc("events_dropped")
+            logger.error(f"Error writing a rejected event to {self.dead_letter_path}: {e}")
+
+    def _spill(self, events: List[Event]):
+        if not events:
+            return
+        if not self.spill_path:
+            self.metrics.inc("events_dropped", len(events))
+            logger.error(f"Dropped {len(events)} events: no spill file")
+            return
+        try:
+            with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.metrics.inc("events_spilled", len(events))
+        except OSError as e:
+            self.metrics.inc("events_dropped", len(events))
+            logger.error(f"Error spilling {len(events)} events to {self.spill_path}: {e}")
+
+    def replay(self) -> int:
+        """Переписывает события из файла через write_batch, возвращает число записанных"""
+        if not self.spill_path or time.monotonic() < self._retry_at:
+            return 0
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            # Файл мог остаться от прошлого запуска, прерванного на середине
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return 0
+                os.replace(self.spill_path, replay_path)
+        written = 0
+        events = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Недописанная строка, если процесс упал во время записи
+                    self.metrics.inc("events_dropped")
+        for start in range(0, len(events), self.batch_size):
+            if not self._write(events[start:start + self.batch_size]):
+                # _write уже вернул неудачную пачку в файл, остаток дописываем за ней
+                self._spill(events[start + self.batch_size:])
+                break
+            written += len(events[start:start + self.batch_size])
+        os.remove(replay_path)
+        if written:
+            self.metrics.inc("events_replayed", written)
+            logger.info(f"Replayed {written} spilled events")
+        return written
+
+    def run(self):
+        while not self._stopping:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            self.replay()
+
+    def close(self, timeout: Optional[float] = None):
+        """Дописывает буфер и останавливает поток"""
+        self._queue.put(STOP)
+        self.join(timeout)
@@ -0,0 +1,125 @@
+import logging
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import cv2
+import dlib
+import numpy as np
+
+from face_gallery import EMBEDDING_DIM
+from frame_pool import ScratchBuffers
+
+BoxType = Tuple[int, int, int, int]
+
+logger = logging.getLogger(__name__)
+
+
+class FaceEmbedder:
+    """Пакетное извлечение дескрипторов dlib для всех лиц кадра (или нескольких кадров).
+
+    Ключевые точки ищутся для каждого кроп-изображения, а сеть
+    face_rec_model вызывается один раз на всю пачку: dlib принимает список
+    изображений и список найденных на них лиц.
+
+    redetect=False пропускает повторный поиск лица HOG-детектором: кроп уже
+    получен от YOLO, поэтому прямоугольник для shape_predictor строится
+    прямо из бокса детектора.
+
+    shape_filter(shape) может отбросить лицо по ключевым точкам (например,
+    слишком повёрнутое) до вызова сети; такие лица считает rejected.
+
+    RGB-копии кропов пишутся в переиспользуемые буферы, поэтому один
+    экземпляр нельзя вызывать из нескольких потоков одновременно.
+    """
+
+    def __init__(self, face_detector, shape_predictor, face_rec_model, num_jitters: int = 1, upsample: int = 1,
+                 redetect: bool = True, shape_filter: Optional[Callable] = None):
+        self.face_detector = face_detector
+        self.shape_predictor = shape_predictor
+        self.face_rec_model = face_rec_model
+        self.num_jitters = num_jitters
+        self.upsample = upsample
+        self.redetect = redetect
+        self.shape_filter = shape_filter
+        self.scratch = ScratchBuffers()
+        self.rejected = 0
+
+    def locate(self, rgb_crop: np.ndarray, face_box: Optional[BoxType] = None):
+        """Прямоугольник лица внутри кропа или None.
+
+        face_box - бокс детектора в координатах кропа; без него при
+        redetect=False лицом считается весь кроп.
+        """
+        if not self.redetect:
+            if face_box is None:
+                face_box = (0, 0, rgb_crop.shape[1], rgb_crop.shape[0])
+            x1, y1, x2, y2 = (int(v) for v in face_box)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(rgb_crop.shape[1], x2), min(rgb_crop.shape[0], y2)
+            if x2 <= x1 or y2 <= y1:
+                return None
+            # Правая и нижняя границы dlib.rectangle включительны
+            return dlib.rectangle(x1, y1, x2 - 1, y2 - 1)
+
+        dets = self.face_detector(rgb_crop, self.upsample)
+        if len(dets) == 0:
+            return None
+        return dets[0]
+
+    def embed_crops(self, crops: Sequence[np.ndarray],
+                    face_boxes: Optional[Sequence[Optional[BoxType]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Возвращает матрицу (N, 128) и маску valid: для кропов без лица строка нулевая"""
+        embeddings = np.zeros((len(crops), EMBEDDING_DIM), dtype=np.float32)
+        valid = np.zeros(len(crops), dtype=bool)
+
+        images: List[np.ndarray] = []
+        shapes: List = []
+        rows: List[int] = []
+        for row, crop in enumerate(crops):
+            if crop is None or crop.size == 0:
+                continue
+            try:
+                rgb_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=self.scratch.get(f"rgb_{row}", crop.shape))
+                rect = self.locate(rgb_crop, face_boxes[row] if face_boxes is not None else None)
+                if rect is None:
+                    continue
+                shape = self.shape_predictor(rgb_crop, rect)
+                if self.shape_filter is not None and not self.shape_filter(shape):
+                    self.rejected += 1
+                    continue
+                detections = dlib.full_object_detections()
+                detections.append(shape)
+            except Exception as e:
+                logger.error(f"Error preparing face crop: {e}")
+                continue
+            images.append(rgb_crop)
+            shapes.append(detections)
+            rows.append(row)
+
+        if not images:
+            return embeddings, valid
+
+        try:
+            descriptors = self.face_rec_model.compute_face_descriptor(images, shapes, self.num_jitters)
+        except Exception as e:
+            logger.error(f"Error in batched compute_face_descriptor: {e}")
+            return embeddings, valid
+
+        for row, image_descriptors in zip(rows, descriptors):
+            embeddings[row] = np.asarray(image_descriptors[0], dtype=np.float32)
+            valid[row] = True
+        return embeddings, valid
+
+    def embed_frames(self, frames: Sequence[np.ndarray],
+                     boxes_per_frame: Sequence[Sequence[BoxType]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Эмбеддинги всех боксов нескольких кадров одной пачкой, строки идут в порядке боксов"""
+        crops = [
+            frame[y1:y2, x1:x2]
+            for frame, boxes in zip(frames, boxes_per_frame)
+            for x1, y1, x2, y2 in boxes
+        ]
+        return self.embed_crops(crops)
+
+    def embed(self, crop: np.ndarray) -> Optional[np.ndarray]:
+        """Эмбеддинг одного кропа, None если лицо не найдено"""
+        embeddings, valid = self.embed_crops([crop])
+        return embeddings[0] if valid[0] else None
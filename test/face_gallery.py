@@ -0,0 +1,306 @@
+import logging
+import struct
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 128  # Размер дескриптора dlib
+MATCH_THRESHOLD = 0.6  # Порог евклидова расстояния для совпадения
+SEARCH_CHUNK_SIZE = 65536  # Сколько лиц галереи сравниваем за один проход
+
+# Бинарный формат faces.encoding: заголовок (версия, код типа, размерность)
+# и float32-значения little-endian. Копия констант и decode_embedding из
+# app/face_codec.py - образ стрим-процессора не включает пакет app/, поэтому
+# при изменении формата обе копии нужно менять вместе
+ENCODING_HEADER = struct.Struct("<BBH")
+ENCODING_VERSION = 1
+ENCODING_FLOAT32 = 1
+
+
+def decode_embedding(value) -> np.ndarray:
+    """Читает эмбеддинг из faces.encoding без копирования, старый текстовый формат тоже поддерживается"""
+    if isinstance(value, str) or len(value) < ENCODING_HEADER.size or value[0] != ENCODING_VERSION:
+        if not isinstance(value, str):
+            value = bytes(value).decode("ascii")
+        return np.array([float(x) for x in value.split(",") if x.strip()], dtype=np.float32)
+
+    _, dtype_code, dim = ENCODING_HEADER.unpack_from(value)
+    if dtype_code != ENCODING_FLOAT32:
+        raise ValueError(f"Unsupported embedding dtype code: {dtype_code}")
+    return np.frombuffer(value, dtype="<f4", count=dim, offset=ENCODING_HEADER.size)
+
+
+class FaceGallery:
+    """Галерея эмбеддингов лиц в одной непрерывной float32-матрице.
+
+    Строка i матрицы соответствует face_ids[i] и person_ids[i], поэтому поиск
+    ближайшего соседа сводится к одному матричному умножению вместо цикла
+    по словарю. version - последняя применённая версия журнала face_changes.
+
+    names - кэш имён людей галереи: совпадение сразу даёт person_id, и
+    события пишутся без запроса к persons. Имя обновляется записью журнала
+    "rename", а человек забывается вместе с последним своим лицом.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, threshold: float = MATCH_THRESHOLD, capacity: int = 1024):
+        self.dim = dim
+        self.threshold = threshold
+        self.names: Dict[int, str] = {}  # {person_id: name}
+        self.version = 0
+        self._rows: Dict[int, int] = {}  # {face_id: номер строки}
+        self._person_faces: Dict[int, int] = {}  # {person_id: число лиц в галерее}
+        self._size = 0
+        # Галерею обновляет поток синхронизации, пока поток обработки ищет совпадения
+        self._lock = threading.RLock()
+        self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity: int):
+        """Выделяет буферы заданной ёмкости, сохраняя уже загруженные лица"""
+        embeddings = np.empty((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        face_ids = np.empty(capacity, dtype=np.int64)
+        person_ids = np.empty(capacity, dtype=np.int64)
+        if self._size:
+            embeddings[:self._size] = self._embeddings[:self._size]
+            sq_norms[:self._size] = self._sq_norms[:self._size]
+            face_ids[:self._size] = self._face_ids[:self._size]
+            person_ids[:self._size] = self._person_ids[:self._size]
+        self._embeddings = embeddings
+        self._sq_norms = sq_norms
+        self._face_ids = face_ids
+        self._person_ids = person_ids
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self._embeddings[:self._size]
+
+    @property
+    def face_ids(self) -> np.ndarray:
+        return self._face_ids[:self._size]
+
+    @property
+    def person_ids(self) -> np.ndarray:
+        return self._person_ids[:self._size]
+
+    def __contains__(self, face_id):
+        return face_id in self._rows
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._rows.clear()
+            self._person_faces.clear()
+            self.names.clear()
+
+    def add(self, face_ids, person_ids, embeddings):
+        """Добавляет пачку лиц в конец матрицы, уже известные face_id пропускаются"""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        face_ids = np.asarray(face_ids, dtype=np.int64).reshape(-1)
+        person_ids = np.asarray(person_ids, dtype=np.int64).reshape(-1)
+        with self._lock:
+            new = np.array([int(f) not in self._rows for f in face_ids], dtype=bool)
+            if not new.all():
+                embeddings, face_ids, person_ids = embeddings[new], face_ids[new], person_ids[new]
+            count = embeddings.shape[0]
+            if count == 0:
+                return
+            required = self._size + count
+            if required > self._embeddings.shape[0]:
+                # Растим буфер геометрически, чтобы добавление было амортизированно O(1)
+                self._allocate(max(required, 2 * self._embeddings.shape[0]))
+
+            start, end = self._size, self._size + count
+            self._embeddings[start:end] = embeddings
+            self._sq_norms[start:end] = np.einsum("ij,ij->i", embeddings, embeddings)
+            self._face_ids[start:end] = face_ids
+            self._person_ids[start:end] = person_ids
+            self._rows.update(zip(face_ids.tolist(), range(start, end)))
+            for person_id in person_ids.tolist():
+                self._person_faces[person_id] = self._person_faces.get(person_id, 0) + 1
+            self._size = end
+
+    def remove(self, face_ids) -> int:
+        """Удаляет лица, переставляя на их место последние строки матрицы"""
+        removed = 0
+        with self._lock:
+            for face_id in face_ids:
+                row = self._rows.pop(int(face_id), None)
+                if row is None:
+                    continue
+                self._forget_face_of(int(self._person_ids[row]))
+                last = self._size - 1
+                if row != last:
+                    self._embeddings[row] = self._embeddings[last]
+                    self._sq_norms[row] = self._sq_norms[last]
+                    self._face_ids[row] = self._face_ids[last]
+                    self._person_ids[row] = self._person_ids[last]
+                    self._rows[int(self._face_ids[row])] = row
+                self._size = last
+                removed += 1
+        return removed
+
+    def _forget_face_of(self, person_id: int):
+        count = self._person_faces.get(person_id, 0) - 1
+        if count > 0:
+            self._person_faces[person_id] = count
+        else:
+            # Последнее лицо человека удалено (или удалён сам человек): имя больше не нужно
+            self._person_faces.pop(person_id, None)
+            self.names.pop(person_id, None)
+
+    def load(self, rows: Iterable[Tuple[int, int, str, np.ndarray]]):
+        """Заполняет галерею строками (face_id, person_id, name, embedding)"""
+        face_ids, person_ids, embeddings, names = [], [], [], {}
+        for face_id, person_id, name, embedding in rows:
+            if embedding is None or embedding.shape != (self.dim,):
+                logger.error(f"Error loading face {face_id}: invalid embedding")
+                continue
+            face_ids.append(face_id)
+            person_ids.append(person_id)
+            embeddings.append(embedding)
+            names[person_id] = name
+        with self._lock:
+            self.clear()
+            self.names.update(names)
+            if embeddings:
+                self.add(face_ids, person_ids, np.stack(embeddings))
+
+    def apply_changes(self, changes: Iterable[Tuple[int, str, int, int, Optional[str], Optional[np.ndarray]]]) -> int:
+        """Применяет записи журнала (version, op, face_id, person_id, name, embedding).
+
+        Добавление без эмбеддинга значит, что лицо уже удалено и удаление
+        придёт следом, такие записи пропускаются. rename несёт новое имя
+        человека в name.
+        """
+        applied = 0
+        with self._lock:
+            for version, op, face_id, person_id, name, embedding in changes:
+                if op == "add" and embedding is not None:
+                    if face_id not in self._rows:
+                        self.add([face_id], [person_id], embedding)
+                        applied += 1
+                    if name is not None:
+                        self.names[person_id] = name
+                elif op == "delete":
+                    applied += self.remove([face_id])
+                elif op == "rename":
+                    if name is not None and person_id in self._person_faces:
+                        self.names[person_id] = name
+                        applied += 1
+                self.version = max(self.version, version)
+        return applied
+
+    def name_of(self, person_id: Optional[int]) -> Optional[str]:
+        if person_id is None:
+            return None
+        return self.names.get(person_id)
+
+    def nearest(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Возвращает индекс ближайшего лица галереи и расстояние до него для каждого запроса"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        best_idx = np.full(queries.shape[0], -1, dtype=np.int64)
+        best_sq = np.full(queries.shape[0], np.inf, dtype=np.float32)
+        with self._lock:
+            if self._size == 0 or queries.shape[0] == 0:
+                return best_idx, np.sqrt(best_sq)
+            self._search(queries, best_idx, best_sq)
+        return best_idx, np.sqrt(np.maximum(best_sq, 0.0))
+
+    def _search(self, queries: np.ndarray, best_idx: np.ndarray, best_sq: np.ndarray):
+        """Обновляет best_idx/best_sq на месте, вызывается под блокировкой"""
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q·g, считаем блоками по галерее,
+        # чтобы матрица расстояний для миллиона лиц не занимала гигабайты
+        for start in range(0, self._size, SEARCH_CHUNK_SIZE):
+            end = min(start + SEARCH_CHUNK_SIZE, self._size)
+            sq = queries @ self._embeddings[start:end].T
+            sq *= -2.0
+            sq += self._sq_norms[start:end]
+            sq += q_sq[:, None]
+            idx = np.argmin(sq, axis=1)
+            chunk_best = sq[np.arange(queries.shape[0]), idx]
+            better = chunk_best < best_sq
+            best_sq[better] = chunk_best[better]
+            best_idx[better] = idx[better] + start
+
+    def match_batch(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Ищет людей для пачки эмбеддингов.
+
+        Возвращает массив person_id (-1, если расстояние не меньше порога)
+        и массив расстояний до ближайшего лица.
+        """
+        with self._lock:
+            idx, distances = self.nearest(queries)
+            person_ids = np.full(idx.shape[0], -1, dtype=np.int64)
+            matched = (idx >= 0) & (distances < self.threshold)
+            person_ids[matched] = self._person_ids[idx[matched]]
+        return person_ids, distances
+
+    def match(self, embedding: np.ndarray) -> Tuple[Optional[int], float]:
+        """Ищет человека для одного эмбеддинга, возвращает (person_id, distance)"""
+        person_ids, distances = self.match_batch(embedding)
+        person_id = int(person_ids[0])
+        return (person_id if person_id >= 0 else None), float(distances[0])
+
+
+class GallerySync(threading.Thread):
+    """Фоновый поток, который подтягивает изменения галереи с версии gallery.version.
+
+    fetch_changes(since, limit) возвращает список записей в формате
+    FaceGallery.apply_changes, упорядоченных по версии. Если база пересоздана -
+    в журнале запись "reset" или fetch_version() вернул версию меньше нашей -
+    галерея загружается заново вызовом reload().
+    """
+
+    def __init__(self, gallery: FaceGallery, fetch_changes: Callable[[int, int], List[tuple]],
+                 interval: float = 5.0, batch_size: int = 1000,
+                 reload: Optional[Callable[[], None]] = None, fetch_version: Optional[Callable[[], int]] = None):
+        super().__init__(name="gallery-sync", daemon=True)
+        self.gallery = gallery
+        self.fetch_changes = fetch_changes
+        self.interval = interval
+        self.batch_size = batch_size
+        self.reload = reload
+        self.fetch_version = fetch_version
+        self._stop_event = threading.Event()
+
+    def poll(self) -> int:
+        """Применяет все накопившиеся изменения, возвращает их количество"""
+        applied = 0
+        while True:
+            changes = self.fetch_changes(self.gallery.version, self.batch_size)
+            if self.reload is not None:
+                if not changes and self.fetch_version is not None and self.fetch_version() < self.gallery.version:
+                    return applied + self._reload("gallery version went back")
+                if any(change[1] == "reset" for change in changes):
+                    return applied + self._reload("gallery was reset")
+            if not changes:
+                return applied
+            applied += self.gallery.apply_changes(changes)
+            if len(changes) < self.batch_size:
+                return applied
+
+    def _reload(self, reason: str) -> int:
+        """Полная загрузка галереи, возвращает число лиц в ней"""
+        logger.info(f"Reloading face gallery: {reason}")
+        self.reload()
+        return len(self.gallery)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                applied = self.poll()
+                if applied:
+                    logger.info(f"Applied {applied} gallery changes, version {self.gallery.version}, "
+                                f"{len(self.gallery)} faces")
+            except Exception as e:
+                logger.error(f"Error syncing face gallery: {e}")
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,82 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class FramePool:
+    """Кольцо заранее выделенных кадров одного размера.
+
+    acquire() отдаёт самый давно возвращённый буфер, release() кладёт его
+    обратно в конец кольца. Буфер возвращает тот, кто последним с ним
+    работает (стадия кодирования или обработчик выброшенного кадра). Если
+    свободных буферов нет, выделяется новый и учитывается в misses - в
+    установившемся режиме кадров в полёте не больше размера пула и
+    выделений нет. При смене разрешения потока пул пересоздаёт буферы.
+    """
+
+    def __init__(self, size: int, shape: Optional[Tuple[int, ...]] = None, dtype=np.uint8):
+        self.size = size
+        self.dtype = np.dtype(dtype)
+        self.shape: Optional[Tuple[int, ...]] = None
+        self.allocated = 0
+        self.misses = 0
+        self._free: Deque[np.ndarray] = deque()
+        self._lock = threading.Lock()
+        if shape is not None:
+            self.resize(shape)
+
+    def resize(self, shape: Tuple[int, ...]):
+        """Выделяет size буферов формы shape, старые буферы отбрасываются"""
+        with self._lock:
+            self.shape = tuple(shape)
+            self._free = deque(np.empty(self.shape, dtype=self.dtype) for _ in range(self.size))
+            self.allocated = self.size
+
+    @property
+    def available(self) -> int:
+        return len(self._free)
+
+    def acquire(self, shape: Optional[Tuple[int, ...]] = None) -> np.ndarray:
+        if shape is not None and tuple(shape) != self.shape:
+            self.resize(shape)
+        with self._lock:
+            if self._free:
+                return self._free.popleft()
+            self.misses += 1
+            self.allocated += 1
+        return np.empty(self.shape, dtype=self.dtype)
+
+    def release(self, buffer: np.ndarray):
+        """Возвращает буфер в кольцо; чужие и лишние буферы просто отбрасываются"""
+        if buffer is None or buffer.shape != self.shape or buffer.dtype != self.dtype:
+            return
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(buffer)
+
+
+class ScratchBuffers:
+    """Именованные рабочие буферы для dst= аргументов OpenCV.
+
+    Под каждым именем хранится плоский буфер, который растёт только при
+    запросе большей формы; get() возвращает C-непрерывное представление
+    нужной формы, поэтому кропы разного размера не выделяют память заново.
+    Содержимое буфера живёт до следующего get() с тем же именем.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.dtype != dtype or buffer.size < size:
+            buffer = self._buffers[name] = np.empty(size, dtype=dtype)
+        return buffer[:size].reshape(shape)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
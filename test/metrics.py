@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """Счётчики и gauge-метрики процесса.
+
+    Gauge задаётся либо значением (set_gauge), либо функцией, которая
+    вызывается при снятии снимка (register_gauge) - так глубина очередей
+    не требует обновления на каждом кадре. observe() копит последние
+    window значений (например, задержки), в снимке они дают <name>_avg и <name>_max.
+    """
+
+    def __init__(self, window: int = 300):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._gauge_fns: Dict[str, Callable[[], float]] = {}
+        self._windows: Dict[str, Deque[float]] = {}
+        self.window = window
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_gauge(self, name: str, fn: Callable[[], float]):
+        with self._lock:
+            self._gauge_fns[name] = fn
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            window = self._windows.get(name)
+            if window is None:
+                window = self._windows[name] = deque(maxlen=self.window)
+            window.append(value)
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            values = dict(self._counters)
+            values.update(self._gauges)
+            for name, window in self._windows.items():
+                if window:
+                    values[f"{name}_avg"] = round(sum(window) / len(window), 3)
+                    values[f"{name}_max"] = round(max(window), 3)
+            fns = dict(self._gauge_fns)
+        for name, fn in fns.items():
+            try:
+                values[name] = fn()
+            except Exception as e:
+                logger.error(f"Error reading gauge {name}: {e}")
+        return values
+
+
+class CpuMeter:
+    """Доля одного ядра, потраченная процессом между вызовами sample()"""
+
+    def __init__(self):
+        self._wall = time.monotonic()
+        self._cpu = time.process_time()
+
+    def sample(self) -> float:
+        wall, cpu = time.monotonic(), time.process_time()
+        elapsed = wall - self._wall
+        usage = (cpu - self._cpu) / elapsed if elapsed > 0 else 0.0
+        self._wall, self._cpu = wall, cpu
+        return usage
+
+
+class MetricsReporter(threading.Thread):
+    """Периодически пишет снимок метрик и загрузку CPU в лог"""
+
+    def __init__(self, metrics: "Metrics", interval: float = 30.0, log: Optional[logging.Logger] = None):
+        super().__init__(name="metrics-reporter", daemon=True)
+        self.metrics = metrics
+        self.interval = interval
+        self.log = log or logger
+        self.cpu = CpuMeter()
+        self._stop_event = threading.Event()
+
+    def report(self):
+        self.metrics.set_gauge("process_cpu_cores", round(self.cpu.sample(), 3))
+        values = " ".join(f"{name}={value}" for name, value in sorted(self.metrics.snapshot().items()))
+        self.log.info(f"Metrics: {values}")
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.report()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# Общие метрики процесса
+metrics = Metrics()
@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.getenv("MODELS_DIR", "ml_models")
+
+# Какие модели нужны для каждого значения --parameters
+PARAMETER_MODELS: Dict[str, List[str]] = {
+    "person": ["face", "face_detector", "shape_predictor", "face_rec_model"],
+    "car": ["object"],
+    "cell phone": ["object"],
+    "traffic light": ["object"],
+    "helmet": ["helmet"],
+}
+
+
+def resident_memory() -> int:
+    """RSS процесса в байтах (из /proc, 0 если недоступно)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ModelRegistry:
+    """Реестр моделей с загрузкой при первом обращении.
+
+    Загрузчики регистрируются по имени, модель создаётся один раз на процесс
+    и разделяется всеми пайплайнами. Для каждой модели запоминаются время
+    загрузки и прирост RSS процесса.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], object]] = {}
+        self._models: Dict[str, object] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def register(self, name: str, loader: Callable[[], object]):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def get(self, name: str):
+        """Возвращает модель, загружая её при первом обращении"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+        # Отдельная блокировка на модель: параллельные пайплайны ждут одну загрузку
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+            rss_before = resident_memory()
+            start = time.time()
+            model = self._loaders[name]()
+            load_time = time.time() - start
+            rss_delta = max(0, resident_memory() - rss_before)
+            self._models[name] = model
+            self.stats[name] = {"load_time": load_time, "rss_bytes": rss_delta}
+            logger.info(f"Loaded model {name} in {load_time:.2f}s, RSS +{rss_delta / 2**20:.1f} MiB")
+            return model
+
+    def preload(self, parameters: Iterable[str]) -> List[str]:
+        """Загружает модели, нужные для заданных --parameters, возвращает их имена"""
+        names = models_for(parameters)
+        for name in names:
+            self.get(name)
+        return names
+
+    def report(self) -> str:
+        lines = [
+            f"{name:16} | load: {stat['load_time']:6.2f}s | RSS: {stat['rss_bytes'] / 2**20:8.1f} MiB"
+            for name, stat in self.stats.items()
+        ]
+        return "\n".join(lines)
+
+
+def models_for(parameters: Iterable[str]) -> List[str]:
+    """Имена моделей для --parameters без повторов, в порядке появления"""
+    names: List[str] = []
+    for parameter in parameters:
+        for name in PARAMETER_MODELS.get(parameter, []):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def _yolo(filename: str, **settings) -> Callable[[], object]:
+    def load():
+        from ultralytics import YOLO
+        model = YOLO(os.path.join(MODELS_DIR, filename))
+        for key, value in settings.items():
+            setattr(model, key, value)
+        return model
+    return load
+
+
+def _dlib(factory: str, filename: Optional[str] = None) -> Callable[[], object]:
+    def load():
+        import dlib
+        if filename is None:
+            return getattr(dlib, factory)()
+        return getattr(dlib, factory)(os.path.join(MODELS_DIR, filename))
+    return load
+
+
+def register_default_models(registry: ModelRegistry, face_settings: Optional[dict] = None):
+    """Регистрирует модели из ml_models; face_settings - атрибуты YOLO-модели лиц"""
+    registry.register("face", _yolo("yolov8n-face.pt", **(face_settings or {})))
+    registry.register("object", _yolo("yolov8n.pt"))
+    registry.register("helmet", _yolo("hemletYoloV8_100epochs.pt"))
+    registry.register("face_detector", _dlib("get_frontal_face_detector"))
+    registry.register("shape_predictor", _dlib("shape_predictor", "shape_predictor_68_face_landmarks.dat"))
+    registry.register("face_rec_model", _dlib("face_recognition_model_v1", "dlib_face_recognition_resnet_model_v1.dat"))
+
+
+# Общий реестр процесса
+models = ModelRegistry()
+register_default_models(models)
@@ -0,0 +1,53 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Дешёвая проверка изменений в кадре перед запуском детектора.
+
+    Кадр уменьшается до size в градациях серого и сравнивается с кадром,
+    на котором последний раз запускалась детекция. Если изменилось меньше
+    threshold пикселей (разница яркости больше pixel_threshold), детекцию
+    можно пропустить. Раз в max_skip кадров детекция запускается в любом
+    случае, чтобы трекер не терял медленно движущиеся объекты.
+    """
+
+    def __init__(self, threshold: float = 0.005, pixel_threshold: int = 25, size: Tuple[int, int] = (80, 45),
+                 max_skip: int = 50):
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.size = size
+        self.max_skip = max_skip
+        self.checked = 0
+        self.skipped = 0
+        self.last_change = 0.0  # Доля изменившихся пикселей на последней проверке
+        self._reference: Optional[np.ndarray] = None
+        self._since_inference = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # Лёгкое размытие гасит шум сенсора и артефакты сжатия
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def check(self, frame: np.ndarray) -> bool:
+        """True, если на кадре нужна детекция; тогда кадр становится опорным"""
+        self.checked += 1
+        small = self._prepare(frame)
+        if self._reference is not None and self._since_inference < self.max_skip:
+            diff = cv2.absdiff(small, self._reference)
+            self.last_change = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+            if self.last_change < self.threshold:
+                self.skipped += 1
+                self._since_inference += 1
+                return False
+        self._reference = small
+        self._since_inference = 0
+        return True
@@ -0,0 +1,264 @@
+"""Несколько камер в одном процессе стрим-процессора.
+
+Каждая камера читается своим потоком захвата (CameraSource) в собственную
+ограниченную очередь кадров с политикой захвата, кадры берутся из пула
+камеры. Обработчик получает от FairScheduler пачку - не больше одного кадра
+с каждой камеры, в которой кадр уже готов, - и прогоняет её через одну
+общую модель. Чтобы пачки не состояли из одного кадра, планировщик
+придерживает первый готовый кадр до max_wait, пока не наберётся max_batch
+камер. Камеры обходятся по кругу, начиная со следующей после
+последней обслуженной в прошлый раз, поэтому загруженная камера не может
+вытеснить остальные. Треки ведутся отдельно для каждой камеры (IouTracker),
+а номера треков общие на процесс, чтобы события разных камер не путались.
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from queue import Empty
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from frame_pool import FramePool
+from metrics import Metrics, metrics as default_metrics
+from pipeline import FrameQueue
+from stride_controller import iou
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CameraConfig:
+    """Камера процессора: id в таблице cameras, входной и выходной RTSP и необязательный ROI"""
+    id: Optional[int]
+    name: str
+    rtsp_in: str
+    rtsp_out: str
+    roi: Optional[list] = None
+
+
+def parse_cameras(value: Optional[str], rtsp_in: Optional[str] = None, rtsp_out: Optional[str] = None,
+                  camera_id: Optional[str] = None) -> List[CameraConfig]:
+    """Камеры из JSON-списка CAMERAS; без него - одна камера из RTSP_IN/RTSP_OUT/CAMERA_ID"""
+    if not value:
+        if not rtsp_in or not rtsp_out:
+            raise ValueError("Either CAMERAS or RTSP_IN and RTSP_OUT must be set")
+        return [CameraConfig(int(camera_id) if camera_id else None, str(camera_id or "camera"), rtsp_in, rtsp_out)]
+    cameras = []
+    for i, item in enumerate(json.loads(value)):
+        camera_id = item.get("id")
+        cameras.append(CameraConfig(
+            id=int(camera_id) if camera_id is not None else None,
+            name=str(item.get("name") or camera_id or f"camera{i}"),
+            rtsp_in=item["rtsp_in"],
+            rtsp_out=item["rtsp_out"],
+            roi=item.get("roi"),
+        ))
+    if not cameras:
+        raise ValueError("CAMERAS is empty")
+    names = [camera.name for camera in cameras]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate camera names: {names}")
+    return cameras
+
+
+class CameraSource(threading.Thread):
+    """Поток захвата одной камеры.
+
+    Кадр декодируется в буфер из пула камеры и кладётся в очередь как
+    (frame_id, captured_at, frame); кадры, выброшенные политикой захвата,
+    возвращаются в пул. После каждого кадра вызывается on_frame (будит
+    планировщик). При обрыве потока захват переоткрывается через
+    open_capture, пока тот не вернёт None.
+    """
+
+    def __init__(self, config: CameraConfig, open_capture: Callable[[str], Any], queue_size: int = 2,
+                 policy: str = "drop-oldest", pool_size: Optional[int] = None,
+                 on_frame: Optional[Callable[[], None]] = None, metrics: Optional[Metrics] = None):
+        super().__init__(name=f"capture-{config.name}", daemon=True)
+        self.config = config
+        self.open_capture = open_capture
+        self.on_frame = on_frame
+        self.metrics = metrics or default_metrics
+        # Кадры в полёте: очередь, кадр в обработке, в кодировании и читаемый
+        self.pool = FramePool(pool_size or queue_size + 3)
+        self.queue = FrameQueue(maxsize=queue_size, policy=policy, on_drop=self._release_dropped)
+        self.frames = 0
+        self.fps: Optional[float] = None
+        self.finished = threading.Event()
+        self._stop_event = threading.Event()
+
+    def _release_dropped(self, item):
+        self.pool.release(item[2])
+        self.metrics.inc(f"camera_{self.config.name}_dropped")
+
+    def read_frames(self, cap) -> Iterator[np.ndarray]:
+        while not self._stop_event.is_set():
+            buffer = self.pool.acquire() if self.pool.shape else None
+            ret, frame = cap.read(buffer) if buffer is not None else cap.read()
+            if not ret:
+                self.pool.release(buffer)
+                logger.error(f"Failed to read frame from camera {self.config.name}")
+                return
+            if frame.shape != self.pool.shape:
+                self.pool.resize(frame.shape)
+            yield frame
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                cap = self.open_capture(self.config.rtsp_in)
+                if cap is None:
+                    logger.error(f"Camera {self.config.name}: could not connect to {self.config.rtsp_in}")
+                    break
+                self.fps = cap.get(cv2.CAP_PROP_FPS) or self.fps
+                try:
+                    for frame in self.read_frames(cap):
+                        self.queue.offer((self.frames, time.monotonic(), frame))
+                        self.frames += 1
+                        self.metrics.inc(f"camera_{self.config.name}_captured")
+                        if self.on_frame is not None:
+                            self.on_frame()
+                finally:
+                    cap.release()
+        finally:
+            self.finished.set()
+            if self.on_frame is not None:
+                self.on_frame()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class FairScheduler:
+    """Собирает пачки кадров со всех камер по кругу, не больше одного кадра с камеры.
+
+    Пачка отдаётся, как только кадры готовы у max_batch камер или самый
+    старый кадр в очередях прождал max_wait секунд (время считается от
+    захвата, так что кадры, накопившиеся за обработку прошлой пачки, не
+    ждут повторно). max_wait=0 - отдавать то, что готово, без ожидания.
+    """
+
+    def __init__(self, sources: Sequence[CameraSource], max_batch: Optional[int] = None,
+                 max_wait: float = 0.0, metrics: Optional[Metrics] = None):
+        self.sources = list(sources)
+        self.max_batch = max_batch or len(self.sources)
+        self.max_wait = max_wait
+        self.metrics = metrics or default_metrics
+        self._ready = threading.Condition()
+        self._next = 0
+        self.metrics.set_gauge("inference_max_batch", self.max_batch)
+        self.metrics.set_gauge("inference_max_wait_ms", round(self.max_wait * 1000, 3))
+
+    def notify(self):
+        """Вызывается потоками захвата после каждого кадра"""
+        with self._ready:
+            self._ready.notify()
+
+    def _has_frames(self) -> bool:
+        return any(source.queue.qsize() for source in self.sources)
+
+    def _ready_cameras(self) -> int:
+        return sum(1 for source in self.sources if source.queue.qsize())
+
+    def _batch_full(self) -> bool:
+        # Закончившие камеры без кадров больше ничего не дадут, их не ждём
+        alive = sum(1 for source in self.sources if source.queue.qsize() or not source.finished.is_set())
+        return self._ready_cameras() >= min(self.max_batch, alive)
+
+    def _oldest_captured_at(self) -> Optional[float]:
+        oldest = None
+        for source in self.sources:
+            with source.queue.mutex:
+                if source.queue.queue:
+                    captured_at = source.queue.queue[0][1]
+                    oldest = captured_at if oldest is None else min(oldest, captured_at)
+        return oldest
+
+    def _finished(self) -> bool:
+        return all(source.finished.is_set() for source in self.sources) and not self._has_frames()
+
+    def next_batch(self, timeout: Optional[float] = None) -> List[Tuple[CameraSource, Tuple]]:
+        """Ждёт хотя бы один кадр; пустой список - таймаут или все камеры закончились"""
+        with self._ready:
+            self._ready.wait_for(lambda: self._has_frames() or self._finished(), timeout)
+            oldest = self._oldest_captured_at()
+            if oldest is not None and self.max_wait > 0:
+                remaining = oldest + self.max_wait - time.monotonic()
+                if remaining > 0:
+                    self._ready.wait_for(self._batch_full, remaining)
+        oldest = self._oldest_captured_at()
+        batch = []
+        count = len(self.sources)
+        start = self._next
+        for offset in range(count):
+            index = (start + offset) % count
+            try:
+                item = self.sources[index].queue.get_nowait()
+            except Empty:
+                continue
+            batch.append((self.sources[index], item))
+            # Следующая пачка начнётся с камеры после последней обслуженной
+            self._next = (index + 1) % count
+            if len(batch) >= self.max_batch:
+                break
+        if batch:
+            self.metrics.observe("inference_batch_size", len(batch))
+            if oldest is not None:
+                self.metrics.observe("inference_batch_wait_ms", (time.monotonic() - oldest) * 1000)
+            self.metrics.inc("inference_batches_full" if len(batch) >= self.max_batch else "inference_batches_partial")
+        return batch
+
+    @property
+    def finished(self) -> bool:
+        return self._finished()
+
+
+class IouTracker:
+    """Простой трекер одной камеры: бокс получает номер трека с наибольшим IoU.
+
+    Трек, не сопоставленный max_age кадров подряд, забывается. Номера
+    выдаёт общий для всех камер счётчик id_source.
+    """
+
+    def __init__(self, min_iou: float = 0.3, max_age: int = 30, id_source: Optional[Iterator[int]] = None):
+        self.min_iou = min_iou
+        self.max_age = max_age
+        self.id_source = id_source or itertools.count(1)
+        self._tracks = {}  # track_id -> (box, кадров без сопоставления)
+
+    def update(self, boxes: Sequence[Sequence[float]]) -> List[int]:
+        candidates = sorted(
+            ((iou(box, track_box), row, track_id)
+             for row, box in enumerate(boxes)
+             for track_id, (track_box, _) in self._tracks.items()),
+            reverse=True,
+        )
+        ids: List[Optional[int]] = [None] * len(boxes)
+        used = set()
+        for overlap, row, track_id in candidates:
+            if overlap < self.min_iou:
+                break
+            if ids[row] is not None or track_id in used:
+                continue
+            ids[row] = track_id
+            used.add(track_id)
+        for track_id in list(self._tracks):
+            if track_id not in used:
+                box, age = self._tracks[track_id]
+                if age + 1 >= self.max_age:
+                    del self._tracks[track_id]
+                else:
+                    self._tracks[track_id] = (box, age + 1)
+        for row, box in enumerate(boxes):
+            if ids[row] is None:
+                ids[row] = next(self.id_source)
+            self._tracks[ids[row]] = (tuple(box), 0)
+        return ids
+
+    def __len__(self):
+        return len(self._tracks)
@@ -0,0 +1,140 @@
+"""Пайплайн из потоков, связанных ограниченными очередями.
+
+Каждая стадия блокируется на get() своей входной очереди, поэтому простаивающая
+стадия не тратит CPU, а заполненная очередь притормаживает предыдущую стадию.
+Остановка - сентинел STOP, который каждая стадия передаёт следующей после
+обработки всего, что уже стоит в очереди.
+
+Очередь первой стадии может работать по политике захвата:
+  block       - захват ждёт, пока освободится место (кадры не теряются);
+  drop-oldest - при переполнении выбрасывается самый старый кадр;
+  latest-only - очередь на один кадр, новый кадр заменяет необработанный.
+"""
+import logging
+import threading
+from queue import Queue
+from typing import Any, Callable, List, Optional
+
+from metrics import Metrics, metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+STOP = object()  # Сентинел остановки
+CAPTURE_POLICIES = ("block", "drop-oldest", "latest-only")
+
+
+class FrameQueue(Queue):
+    """Ограниченная очередь с политикой переполнения для offer().
+
+    on_drop вызывается для каждого выброшенного элемента, например чтобы
+    вернуть буфер кадра в пул.
+    """
+
+    def __init__(self, maxsize: int = 10, policy: str = "block", on_drop: Optional[Callable[[Any], None]] = None):
+        if policy not in CAPTURE_POLICIES:
+            raise ValueError(f"Unknown capture policy: {policy}")
+        super().__init__(maxsize=1 if policy == "latest-only" else maxsize)
+        self.policy = policy
+        self.on_drop = on_drop
+        self.dropped = 0
+
+    def offer(self, item) -> int:
+        """Кладёт элемент согласно политике, возвращает число выброшенных элементов"""
+        if self.policy == "block":
+            self.put(item)
+            return 0
+        evicted = []
+        with self.not_full:
+            # Вытеснение и вставка под одной блокировкой, чтобы потребитель не увидел пустую очередь
+            while self.maxsize > 0 and self._qsize() >= self.maxsize:
+                evicted.append(self._get())
+                self.unfinished_tasks -= 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+        self.dropped += len(evicted)
+        if self.on_drop is not None:
+            for old in evicted:
+                self.on_drop(old)
+        return len(evicted)
+
+
+class Stage(threading.Thread):
+    """Стадия: берёт элемент из inbox, передаёт результат handler в outbox.
+
+    Если handler вернул None, элемент дальше не передаётся.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Any], inbox: Queue, outbox: Optional[Queue] = None,
+                 metrics: Optional[Metrics] = None):
+        super().__init__(name=f"stage-{name}", daemon=True)
+        self.stage_name = name
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.metrics = metrics or default_metrics
+
+    def run(self):
+        while True:
+            item = self.inbox.get()
+            if item is STOP:
+                break
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                self.metrics.inc(f"{self.stage_name}_errors")
+                logger.error(f"Error in stage {self.stage_name}: {e}")
+                continue
+            self.metrics.inc(f"{self.stage_name}_items")
+            if self.outbox is not None and result is not None:
+                self.outbox.put(result)
+        if self.outbox is not None:
+            self.outbox.put(STOP)
+
+
+class Pipeline:
+    """Цепочка стадий; put() кладёт элемент в очередь первой стадии.
+
+    Глубина очереди каждой стадии публикуется как gauge <name>_queue_depth.
+    """
+
+    def __init__(self, metrics: Optional[Metrics] = None):
+        self.metrics = metrics or default_metrics
+        self.stages: List[Stage] = []
+        self.queues: List[FrameQueue] = []
+
+    def add_stage(self, name: str, handler: Callable[[Any], Any], maxsize: int = 10,
+                  policy: str = "block", on_drop: Optional[Callable[[Any], None]] = None) -> "Pipeline":
+        """Добавляет стадию; policy и on_drop действуют на put() в её очередь (важно для первой стадии)"""
+        inbox = FrameQueue(maxsize=maxsize, policy=policy, on_drop=on_drop)
+        if self.stages:
+            self.stages[-1].outbox = inbox
+        self.queues.append(inbox)
+        self.stages.append(Stage(name, handler, inbox, metrics=self.metrics))
+        self.metrics.register_gauge(f"{name}_queue_depth", inbox.qsize)
+        return self
+
+    @property
+    def inbox(self) -> FrameQueue:
+        return self.queues[0]
+
+    def start(self) -> "Pipeline":
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def put(self, item) -> int:
+        """Передаёт элемент первой стадии по её политике, возвращает число выброшенных кадров"""
+        dropped = self.inbox.offer(item)
+        if dropped:
+            self.metrics.inc(f"{self.stages[0].stage_name}_dropped", dropped)
+        return dropped
+
+    def queue_depths(self):
+        return {stage.stage_name: queue.qsize() for stage, queue in zip(self.stages, self.queues)}
+
+    def close(self, timeout: Optional[float] = None):
+        """Останавливает стадии по очереди, дожидаясь обработки уже принятых элементов"""
+        self.inbox.put(STOP)
+        for stage in self.stages:
+            stage.join(timeout)
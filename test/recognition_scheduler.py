@@ -0,0 +1,106 @@
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from track_store import TrackState
+
+# Индексы 68-точечной разметки dlib
+NOSE_TIP = 30
+LEFT_EYE_OUTER = 36
+RIGHT_EYE_OUTER = 45
+
+
+def sharpness(crop: np.ndarray) -> float:
+    """Дисперсия лапласиана: чем меньше, тем сильнее размыто лицо"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def yaw_ratio(shape) -> float:
+    """Отношение расстояний от кончика носа до внешних уголков глаз (1.0 - анфас)"""
+    nose, left, right = (shape.part(i) for i in (NOSE_TIP, LEFT_EYE_OUTER, RIGHT_EYE_OUTER))
+    to_left = np.hypot(nose.x - left.x, nose.y - left.y)
+    to_right = np.hypot(nose.x - right.x, nose.y - right.y)
+    if min(to_left, to_right) == 0:
+        return float("inf")
+    return float(max(to_left, to_right) / min(to_left, to_right))
+
+
+class RecognitionScheduler:
+    """Решает, для каких треков кадра стоит считать эмбеддинг.
+
+    Нераспознанный трек повторяется с экспоненциальной задержкой
+    (base_delay, 2*base_delay, ... до max_delay), в кадре считается не больше
+    budget эмбеддингов, а маленькие, размытые и повёрнутые лица пропускаются.
+    counters показывает, сколько попыток сделано и почему остальные пропущены.
+    """
+
+    def __init__(self, budget: int = 2, base_delay: float = 0.5, max_delay: float = 10.0,
+                 min_face_size: int = 40, min_sharpness: float = 30.0, max_yaw_ratio: float = 2.5):
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_face_size = min_face_size
+        self.min_sharpness = min_sharpness
+        self.max_yaw_ratio = max_yaw_ratio
+        self.counters: Dict[str, int] = {
+            "attempted": 0,
+            "recognized": 0,
+            "skipped_backoff": 0,
+            "skipped_budget": 0,
+            "skipped_size": 0,
+            "skipped_blur": 0,
+            "skipped_pose": 0,
+        }
+
+    def check_quality(self, crop: np.ndarray) -> Optional[str]:
+        """Причина отказа по размеру или резкости кропа, None если кроп годится"""
+        if crop is None or min(crop.shape[:2]) < self.min_face_size:
+            return "size"
+        if sharpness(crop) < self.min_sharpness:
+            return "blur"
+        return None
+
+    def check_pose(self, shape) -> bool:
+        """Фильтр для FaceEmbedder: отбрасывает сильно повёрнутые лица по ключевым точкам.
+
+        Фильтр работает в процессах EmbeddingPool, поэтому skipped_pose
+        считается по EmbeddingResult.rejected, а не здесь.
+        """
+        return yaw_ratio(shape) <= self.max_yaw_ratio
+
+    def select(self, candidates: Sequence[Tuple[TrackState, np.ndarray]],
+               now: Optional[float] = None) -> List[Tuple[TrackState, np.ndarray]]:
+        """Отбирает кандидатов (трек, кроп) для распознавания в этом кадре"""
+        now = time.time() if now is None else now
+        ready = []
+        for track, crop in candidates:
+            if track.name is not None:
+                continue
+            if now < track.next_attempt:
+                self.counters["skipped_backoff"] += 1
+                continue
+            reason = self.check_quality(crop)
+            if reason is not None:
+                self.counters[f"skipped_{reason}"] += 1
+                continue
+            ready.append((track, crop))
+
+        # Сначала треки с меньшим числом попыток, чтобы новые лица не ждали
+        ready.sort(key=lambda item: item[0].attempts)
+        self.counters["skipped_budget"] += max(0, len(ready) - self.budget)
+        selected = ready[:self.budget]
+        self.counters["attempted"] += len(selected)
+        return selected
+
+    def record(self, track: TrackState, recognized: bool, now: Optional[float] = None):
+        """Учитывает результат попытки и назначает следующую для нераспознанного трека"""
+        now = time.time() if now is None else now
+        track.attempts += 1
+        if recognized:
+            self.counters["recognized"] += 1
+            return
+        delay = min(self.max_delay, self.base_delay * 2 ** (track.attempts - 1))
+        track.next_attempt = now + delay
@@ -0,0 +1,87 @@
+import json
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Polygon = Sequence[Sequence[float]]
+
+
+def parse_roi(value) -> Optional[List[Polygon]]:
+    """ROI из cameras.roi или переменной окружения: JSON-строка или уже разобранный список"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (str, bytes)):
+        value = json.loads(value)
+    return value or None
+
+
+class RegionOfInterest:
+    """Области кадра, где могут появиться лица.
+
+    Полигоны заданы в долях ширины и высоты кадра (0..1), как в API камер.
+    Детектору отдаётся только ограничивающий прямоугольник всех полигонов,
+    боксы переводятся обратно в координаты кадра. Детекции, центр которых
+    вне полигонов, отбрасываются; mask=True дополнительно закрашивает
+    пиксели вне полигонов внутри прямоугольника.
+    """
+
+    def __init__(self, polygons: Sequence[Polygon], frame_shape: Tuple[int, ...], mask: bool = False):
+        height, width = frame_shape[:2]
+        self.frame_shape = (height, width)
+        self.polygons = [
+            np.round(np.asarray(polygon, dtype=np.float64) * (width, height)).astype(np.int32)
+            for polygon in polygons
+        ]
+        points = np.concatenate(self.polygons)
+        self.x1 = int(np.clip(points[:, 0].min(), 0, width))
+        self.y1 = int(np.clip(points[:, 1].min(), 0, height))
+        self.x2 = int(np.clip(points[:, 0].max(), 0, width))
+        self.y2 = int(np.clip(points[:, 1].max(), 0, height))
+        if self.x2 <= self.x1 or self.y2 <= self.y1:
+            raise ValueError("ROI has an empty bounding rectangle")
+        self.size = (self.y2 - self.y1, self.x2 - self.x1)
+        self.area_ratio = (self.x2 - self.x1) * (self.y2 - self.y1) / float(width * height)
+
+        self._mask = None
+        self._channel_masks = {}
+        if mask:
+            self._mask = np.zeros((self.y2 - self.y1, self.x2 - self.x1), dtype=np.uint8)
+            shifted = [polygon - (self.x1, self.y1) for polygon in self.polygons]
+            cv2.fillPoly(self._mask, shifted, 255)
+
+    @property
+    def offset(self) -> Tuple[int, int]:
+        return self.x1, self.y1
+
+    def crop(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Прямоугольник ROI; без маски это представление кадра без копирования.
+
+        С маской результат пишется в out (форма size плюс каналы кадра), если он передан.
+        """
+        region = frame[self.y1:self.y2, self.x1:self.x2]
+        if self._mask is None:
+            return region
+        return cv2.bitwise_and(region, self._mask_like(region), dst=out)
+
+    def _mask_like(self, region: np.ndarray) -> np.ndarray:
+        # Маска с тем же числом каналов: bitwise_and перезаписывает out целиком
+        channels = region.shape[2] if region.ndim == 3 else 1
+        mask = self._channel_masks.get(channels)
+        if mask is None:
+            mask = self._mask if channels == 1 else cv2.merge([self._mask] * channels)
+            self._channel_masks[channels] = mask
+        return mask
+
+    def to_frame(self, box) -> Tuple[int, int, int, int]:
+        """Переводит бокс из координат прямоугольника ROI в координаты кадра"""
+        x1, y1, x2, y2 = box
+        return int(x1) + self.x1, int(y1) + self.y1, int(x2) + self.x1, int(y2) + self.y1
+
+    def contains(self, box) -> bool:
+        """Лежит ли центр бокса (в координатах кадра) внутри какого-нибудь полигона"""
+        cx, cy = (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+        return any(cv2.pointPolygonTest(polygon, (cx, cy), False) >= 0 for polygon in self.polygons)
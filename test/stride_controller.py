@@ -0,0 +1,130 @@
+import math
+import time
+from typing import Dict, List, Optional
+
+from metrics import Metrics, metrics as default_metrics
+
+# Сколько кадров сверх шага детекции трек живёт без подтверждения
+DETECTION_LIFETIME_MARGIN = 10
+
+
+def iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class StrideController:
+    """Подбирает шаг детекции (каждый stride-й кадр) по измеренным задержкам.
+
+    За секунду выводится F = min(stream_fps, target_fps) кадров. Каждый
+    кадр стоит frame_cost (ресайз, отрисовка, запись), кадр с детекцией -
+    ещё detect_cost (YOLO и распознавание). Шаг выбирается минимальным, при
+    котором F * frame_cost + F / stride * detect_cost укладывается в budget
+    секунд процессорного времени на секунду видео.
+    """
+
+    def __init__(self, stream_fps: float, target_fps: Optional[float] = None, budget: float = 0.8,
+                 min_stride: int = 1, max_stride: int = 30, initial_stride: int = 5,
+                 update_interval: float = 1.0, smoothing: float = 0.2, metrics: Optional[Metrics] = None):
+        self.stream_fps = stream_fps if stream_fps and stream_fps > 0 else 30.0
+        self.target_fps = target_fps or self.stream_fps
+        self.budget = budget
+        self.min_stride = min_stride
+        self.max_stride = max_stride
+        self.update_interval = update_interval
+        self.smoothing = smoothing
+        self.metrics = metrics or default_metrics
+        self.stride = max(min_stride, min(max_stride, initial_stride))
+        self.costs: Dict[str, Optional[float]] = {"frame": None, "detect": None}
+        self._since_detection = self.stride  # Первый же кадр идёт на детекцию
+        self._last_update = time.monotonic()
+        self.metrics.set_gauge("detection_stride", self.stride)
+
+    @property
+    def output_fps(self) -> float:
+        return min(self.stream_fps, self.target_fps)
+
+    def observe(self, kind: str, seconds: float):
+        """Учитывает задержку: kind = "frame" (любой кадр) или "detect" (детекция и распознавание)"""
+        previous = self.costs[kind]
+        self.costs[kind] = seconds if previous is None else previous + self.smoothing * (seconds - previous)
+
+    def should_detect(self) -> bool:
+        """Вызывается на каждом кадре; True, если на этом кадре нужна детекция"""
+        self._since_detection += 1
+        if self._since_detection >= self.stride:
+            self._since_detection = 0
+            return True
+        return False
+
+    def compute_stride(self) -> int:
+        detect_cost = self.costs["detect"]
+        if detect_cost is None:
+            return self.stride
+        frames = self.output_fps
+        available = self.budget - frames * (self.costs["frame"] or 0.0)
+        if available <= 0:
+            return self.max_stride
+        stride = math.ceil(frames * detect_cost / available)
+        return max(self.min_stride, min(self.max_stride, stride))
+
+    def update(self, now: Optional[float] = None) -> int:
+        """Пересчитывает шаг не чаще update_interval секунд"""
+        now = time.monotonic() if now is None else now
+        if now - self._last_update >= self.update_interval:
+            self._last_update = now
+            self.stride = self.compute_stride()
+            self.metrics.set_gauge("detection_stride", self.stride)
+        return self.stride
+
+
+def match_detections(previous: List[dict], current: List[dict], min_iou: float = 0.3):
+    """Сопоставляет новые детекции со старыми по IoU.
+
+    Новой детекции достаются скорость бокса в пикселях на кадр и имя
+    человека, если он уже был распознан.
+    """
+    used = set()
+    for det in current:
+        det.setdefault("velocity", (0.0, 0.0, 0.0, 0.0))
+        best, best_iou = None, min_iou
+        for i, old in enumerate(previous):
+            if i in used:
+                continue
+            overlap = iou(predict_box(old, det["frame"]), det["box"])
+            if overlap > best_iou:
+                best, best_iou = i, overlap
+        if best is None:
+            continue
+        used.add(best)
+        old = previous[best]
+        frames = max(1, det["frame"] - old["frame"])
+        det["velocity"] = tuple((n - o) / frames for n, o in zip(det["box"], old["box"]))
+        if det.get("person") is None:
+            det["person"] = old.get("person")
+    return current
+
+
+def predict_box(det: dict, frame: int):
+    """Бокс детекции, сдвинутый с постоянной скоростью на кадр frame"""
+    dt = frame - det["frame"]
+    velocity = det.get("velocity", (0.0, 0.0, 0.0, 0.0))
+    return tuple(int(round(c + v * dt)) for c, v in zip(det["box"], velocity))
+
+
+def predict_detections(detections: List[dict], frame: int) -> List[dict]:
+    """Копии детекций с боксами, предсказанными на кадр frame"""
+    return [dict(det, box=predict_box(det, frame)) for det in detections]
+
+
+def live_detections(detections: List[dict], frame: int, stride: int,
+                    margin: int = DETECTION_LIFETIME_MARGIN) -> List[dict]:
+    """Детекции моложе stride + margin кадров.
+
+    Следующая детекция приходит через stride кадров, поэтому при любом шаге
+    треки доживают до неё и передают ей имя и скорость.
+    """
+    return [det for det in detections if frame - det["frame"] < stride + margin]
@@ -2,9 +2,7 @@ import logging
 import os
 import cv2
 import numpy as np
-import dlib
 import requests
-from ultralytics import YOLO
 from threading import Thread, Lock
 from queue import Queue
 import argparse
@@ -12,6 +10,13 @@ import time
 import sys
 from collections import deque
 
+from annotation_renderer import AnnotationRenderer
+from frame_pool import FramePool, ScratchBuffers
+from metrics import MetricsReporter, metrics
+from pipeline import CAPTURE_POLICIES, FrameQueue
+from stride_controller import StrideController, live_detections, match_detections, predict_detections
+from model_registry import models, register_default_models
+
 # Настраиваем логирование для Kubernetes
 logging.basicConfig(
     level=logging.INFO,
@@ -29,14 +34,15 @@ os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "rtsp_transport;tcp|buffer_size;40
 RTSP_INPUT_URL = os.getenv("RTSP_IN", "rtsp://mediamtx-svc:8554/mediamtx/stream3")
 RTSP_OUTPUT_URL = os.getenv("RTSP_OUT", "rtsp://mediamtx-svc:8554/mediamtx/newstream1")
 
-# Настройки YOLO
-FACE_MODEL = YOLO("ml_models/yolov8n-face.pt")
-FACE_MODEL.conf = 0.5
-FACE_MODEL.iou = 0.45
-FACE_MODEL.agnostic = True
-FACE_MODEL.max_det = 10
-FACE_MODEL.classes = None
-FACE_MODEL.verbose = False
+# Настройки YOLO-модели лиц; модели загружаются реестром при первом обращении
+register_default_models(models, face_settings=dict(
+    conf=0.5,
+    iou=0.45,
+    agnostic=True,
+    max_det=10,
+    classes=None,
+    verbose=False,
+))
 
 # Оптимизация размера изображения
 TARGET_WIDTH = 640
@@ -44,29 +50,33 @@ TARGET_HEIGHT = 360
 YOLO_WIDTH = 640  # Размер для YOLO
 YOLO_HEIGHT = 360
 
-# Оптимизация обработки
-process_every_n_frames = 5  # Обрабатываем каждый 5-й кадр
-face_recognition_interval = 5  # Распознаем лица на каждом 5-м кадре
-
-# Настройки YOLO
-OBJECT_MODEL = YOLO("ml_models/yolov8n.pt")  # Модель для обнаружения объектов
-HELMET_MODEL = YOLO("ml_models/hemletYoloV8_100epochs.pt")  # Модель для обнаружения шлемов
-face_detector = dlib.get_frontal_face_detector()
-shape_predictor = dlib.shape_predictor("ml_models/shape_predictor_68_face_landmarks.dat")
-face_rec_model = dlib.face_recognition_model_v1("ml_models/dlib_face_recognition_resnet_model_v1.dat")
+# Оптимизация обработки: шаг детекции подбирает StrideController по измеренным задержкам,
+# лица распознаются на каждом кадре с детекцией
+DETECTION_BUDGET = float(os.getenv("DETECTION_BUDGET", "0.8"))  # Доля ядра на обработку потока
+MAX_DETECTION_STRIDE = int(os.getenv("MAX_DETECTION_STRIDE", "30"))
 
 used_faces = []  # Список для хранения уже распознанных лиц
 url = "http://face-recognition-svc:80/find_face"
 LOGGING_SERVICE_URL = "http://logging_service:8000/log"  # URL сервиса логирования
 
-# Оптимизация буфера
-frame_queue = Queue(maxsize=3)
+# Оптимизация буфера: кадры для YOLO и результаты детекции в отдельных очередях;
+# очередь кадров с камеры создаётся после разбора --capture-policy
+FRAME_QUEUE_SIZE = 3
+yolo_queue = Queue(maxsize=3)
 detection_queue = Queue(maxsize=3)
+metrics.register_gauge("yolo_queue_depth", yolo_queue.qsize)
+metrics.register_gauge("detection_queue_depth", detection_queue.qsize)
 detection_lock = Lock()
 
+# Кадры захвата переиспользуются через пул, кадры отображения и YOLO - через рабочие буферы
+capture_pool = FramePool(FRAME_QUEUE_SIZE + 2)
+scratch = ScratchBuffers()
+metrics.register_gauge("frame_pool_misses", lambda: capture_pool.misses)
+renderer = AnnotationRenderer()
+
 # Статистика обработки
 frame_times = []
-target_fps = 30
+target_fps = float(os.getenv("TARGET_FPS", "30"))
 last_face_recognition_time = 0
 
 # Кэш для эмбеддингов лиц
@@ -76,7 +86,6 @@ CACHE_SIZE = 100  # Максимальный размер кэша
 # Кэш для последних детекций
 last_detections = []  # Список последних обнаруженных лиц
 MAX_DETECTIONS_CACHE = 10  # Размер кэша
-detection_lifetime = 10  # Время жизни детекции в кадрах
 
 # Настройки интерполяции
 current_interpolation = []  # Текущие интерполированные позиции
@@ -143,21 +152,21 @@ def get_face_embedding(image: np.ndarray):
     try:
         # Преобразование изображения в RGB
         if image.shape[2] == 3 and image.dtype == np.uint8:
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=scratch.get("rgb_face", image.shape))
         else:
             rgb_image = image
 
         # Обнаружение лиц
-        dets = face_detector(rgb_image, 1)
+        dets = models.get("face_detector")(rgb_image, 1)
         if len(dets) == 0:
             logger.debug("Лицо не обнаружено в ROI")
             return None
 
         # Получение ключевых точек лица
-        shape = shape_predictor(rgb_image, dets[0])
+        shape = models.get("shape_predictor")(rgb_image, dets[0])
 
         # Извлечение эмбеддинга лица
-        face_descriptor = face_rec_model.compute_face_descriptor(rgb_image, shape, num_jitters=1)
+        face_descriptor = models.get("face_rec_model").compute_face_descriptor(rgb_image, shape, num_jitters=1)
         embedding = np.array(face_descriptor)
         logger.debug("Эмбеддинг лица успешно извлечен")
         return embedding
@@ -268,12 +277,12 @@ def interpolate_detections(old_dets, new_dets, alpha):
     
     return interpolated
 
-def update_detection_cache(boxes, frame_count):
-    """Обновляет кэш детекций"""
+def update_detection_cache(boxes, frame_count, stride):
+    """Обновляет кэш детекций; stride - текущий шаг детекции"""
     global last_detections
     
-    # Удаляем устаревшие детекции
-    last_detections = [d for d in last_detections if frame_count - d['frame'] < detection_lifetime]
+    # Удаляем устаревшие детекции: время жизни растёт вместе с шагом
+    last_detections = live_detections(last_detections, frame_count, stride)
     
     # Добавляем новые детекции
     new_detections = []
@@ -303,29 +312,17 @@ def update_detection_cache(boxes, frame_count):
             logger.error(f"Ошибка при обработке box: {str(e)}")
             continue
     
-    # Обновляем кэш
-    last_detections = new_detections
+    # Переносим скорость и имя с совпавших старых детекций, обновляем кэш
+    last_detections = match_detections(last_detections, new_detections)
     if len(last_detections) > MAX_DETECTIONS_CACHE:
         last_detections = last_detections[-MAX_DETECTIONS_CACHE:]
 
 def draw_detections(frame, detections):
-    """Отрисовывает детекции на кадре"""
-    for det in detections:
-        x1, y1, x2, y2 = det['box']
-        person = det['person']
-        conf = det['conf']
-        
-        # Отрисовка рамки с прозрачностью
-        overlay = frame.copy()
-        # Используем прозрачность в зависимости от уверенности
-        alpha = 0.3 + 0.4 * conf  # Прозрачность от 0.3 до 0.7
-        cv2.rectangle(overlay, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-        
-        # Отрисовка имени, если есть
-        if person:
-            cv2.putText(frame, person, (x1, y1-10), 
-                      cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    """Отрисовывает детекции на кадре: рамки смешиваются только в своей области, имена берутся из кэша"""
+    # Прозрачность рамки зависит от уверенности: от 0.3 до 0.7
+    boxes = [(det['box'], 0.3 + 0.4 * det['conf']) for det in detections]
+    labels = [(det['person'], (det['box'][0], det['box'][1] - 10)) for det in detections if det['person']]
+    renderer.draw(frame, boxes, labels)
 
 def process_detection(frame, model):
     """Обработка детекции в отдельном потоке"""
@@ -339,19 +336,16 @@ def process_detection(frame, model):
 def detection_worker():
     """Рабочий поток для детекции"""
     while True:
-        if not frame_queue.empty():
-            frame = frame_queue.get()
-            if frame is None:
-                break
-                
-            profiler.start('yolo_detection')
-            results = process_detection(frame, FACE_MODEL)
-            profiler.stop('yolo_detection')
+        # Блокирующее ожидание кадра вместо опроса очереди
+        frame = yolo_queue.get()
+        if frame is None:
+            break
             
-            if results is not None:
-                detection_queue.put(results)
-            else:
-                detection_queue.put(None)
+        profiler.start('yolo_detection')
+        results = process_detection(frame, models.get("face"))
+        profiler.stop('yolo_detection')
+        
+        detection_queue.put(results)
 
 def resize_frame(frame, target_width, target_height, buffer=None, interpolation=cv2.INTER_LINEAR):
     """Оптимизированный ресайз кадра с проверкой качества"""
@@ -381,9 +375,16 @@ def resize_frame(frame, target_width, target_height, buffer=None, interpolation=
         logger.error(f"Ошибка при ресайзе кадра: {str(e)}")
         return None
 
-def process_frames(parameters):
+def process_frames(parameters, stream_fps):
     global last_face_recognition_time
     frame_count = 0
+    stride_controller = StrideController(
+        stream_fps,
+        target_fps=target_fps,
+        budget=DETECTION_BUDGET,
+        max_stride=MAX_DETECTION_STRIDE,
+        metrics=metrics,
+    )
     start_time = time.time()
     error_count = 0
     max_errors = 10
@@ -401,125 +402,143 @@ def process_frames(parameters):
     detection_thread.start()
     
     while True:
-        if not frame_queue.empty():
-            frame = frame_queue.get()
-            if frame is None:
-                break
+        # Блокирующее ожидание кадра вместо опроса очереди
+        item = frame_queue.get()
+        if item is None:
+            break
+        captured_at, frame = item
 
-            try:
-                profiler.start('total_frame')
+        try:
+            profiler.start('total_frame')
+            
+            if frame is not None and frame.size > 0:
+                # Ресайз для отображения
+                profiler.start('resize_display')
+                display_frame = resize_frame(frame, TARGET_WIDTH, TARGET_HEIGHT,
+                                             buffer=scratch.get("display", (TARGET_HEIGHT, TARGET_WIDTH, 3)))
+                profiler.stop('resize_display')
+                
+                if display_frame is None:
+                    logger.error("Ошибка при ресайзе для отображения")
+                    continue
                 
-                if frame is not None and frame.size > 0:
-                    # Ресайз для отображения
-                    profiler.start('resize_display')
-                    display_frame = resize_frame(frame, TARGET_WIDTH, TARGET_HEIGHT)
-                    profiler.stop('resize_display')
+                detect = stride_controller.should_detect()
+                detect_time = 0.0
+                if detect:
+                    detect_start = time.time()
+                    # Ресайз для YOLO
+                    profiler.start('resize_yolo')
+                    yolo_frame = resize_frame(frame, YOLO_WIDTH, YOLO_HEIGHT,
+                                              buffer=scratch.get("yolo", (YOLO_HEIGHT, YOLO_WIDTH, 3)))
+                    profiler.stop('resize_yolo')
                     
-                    if display_frame is None:
-                        logger.error("Ошибка при ресайзе для отображения")
+                    if yolo_frame is None:
+                        logger.error("Ошибка при ресайзе для YOLO")
                         continue
-                    
-                    if frame_count % process_every_n_frames == 0:
-                        # Ресайз для YOLO
-                        profiler.start('resize_yolo')
-                        yolo_frame = resize_frame(frame, YOLO_WIDTH, YOLO_HEIGHT)
-                        profiler.stop('resize_yolo')
-                        
-                        if yolo_frame is None:
-                            logger.error("Ошибка при ресайзе для YOLO")
-                            continue
-                            
-                        # Отправляем кадр в очередь детекции
-                        frame_queue.put(yolo_frame.copy())
                         
-                        # Получаем результаты детекции
-                        results = detection_queue.get()
-                        
-                        if results is not None:
-                            for result in results:
-                                boxes = result.boxes
-                                scaled_boxes = []
-                                profiler.start('process_boxes')
-                                for box in boxes:
-                                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                                    conf = box.conf[0].cpu().numpy()
-                                    if conf > 0.5:
-                                        # Масштабируем координаты к размеру отображения
-                                        x1, y1, x2, y2 = scale_coordinates(x1, y1, x2, y2, scale_x, scale_y)
-                                        logger.debug(f"Детекция: conf={conf:.2f}, box=({x1}, {y1}, {x2}, {y2})")
-                                        scaled_boxes.append({
-                                            'box': (int(x1), int(y1), int(x2), int(y2)),
-                                            'conf': float(conf),
-                                            'frame': frame_count,
-                                            'person': None
-                                        })
-                                profiler.stop('process_boxes')
-                                
-                                with detection_lock:
-                                    profiler.start('update_cache')
-                                    update_detection_cache(scaled_boxes, frame_count)
-                                    profiler.stop('update_cache')
-                                
-                                # Обрабатываем новые детекции
-                                profiler.start('face_recognition')
-                                for det in scaled_boxes:
-                                    x1, y1, x2, y2 = det['box']
-                                    if frame_count % face_recognition_interval == 0:
-                                        face_roi = frame[y1:y2, x1:x2]
-                                        if face_roi.size > 0:
-                                            logger.debug(f"Обработка ROI размера {face_roi.shape}")
-                                            embedding = get_face_embedding(face_roi)
-                                            if embedding is not None:
-                                                person = find_matching_face(embedding)
-                                                with detection_lock:
-                                                    for d in last_detections:
-                                                        if d['box'] == (x1, y1, x2, y2):
-                                                            d['person'] = person
-                                profiler.stop('face_recognition')
-                    
-                    # Отрисовываем детекции на кадре для отображения
-                    profiler.start('draw_detections')
-                    with detection_lock:
-                        draw_detections(display_frame, last_detections)
-                    profiler.stop('draw_detections')
+                    # Отправляем кадр в очередь детекции; копия не нужна, пока ждём результат
+                    yolo_queue.put(yolo_frame)
                     
-                    # Отправляем обработанный кадр
-                    profiler.start('write_frame')
-                    out.write(display_frame)
-                    profiler.stop('write_frame')
+                    # Получаем результаты детекции
+                    results = detection_queue.get()
                     
-                    # Измерение времени обработки
-                    total_time = profiler.stop('total_frame')
-                    frame_times.append(total_time)
-                    frame_count += 1
-                    error_count = 0
-                    
-                    # Логирование статистики каждые 30 секунд
-                    if frame_count % 900 == 0:
-                        elapsed_time = time.time() - start_time
-                        current_fps = frame_count / elapsed_time
-                        avg_frame_time = sum(frame_times[-900:]) / len(frame_times[-900:])
-                        logger.info("\n" + "=" * 50)
-                        logger.info("СТАТИСТИКА ПРОИЗВОДИТЕЛЬНОСТИ:")
-                        logger.info("=" * 50)
-                        logger.info(f"FPS: {current_fps:.2f}")
-                        logger.info(f"Среднее время обработки кадра: {avg_frame_time*1000:.2f} мс")
-                        logger.info(f"Целевой FPS: {target_fps}")
-                        logger.info(f"Обработано кадров: {frame_count}")
-                        logger.info(f"Время работы: {elapsed_time:.1f} сек")
-                        profiler.log_stats(logger)
-                else:
-                    logger.warning("Получен пустой или некорректный кадр")
-                    
-            except Exception as e:
-                error_count += 1
-                logger.error(f"Ошибка при обработке кадра: {str(e)}")
-                if error_count >= max_errors:
-                    logger.error("Превышено максимальное количество ошибок, переподключение...")
-                    return
-    
+                    if results is not None:
+                        for result in results:
+                            boxes = result.boxes
+                            scaled_boxes = []
+                            profiler.start('process_boxes')
+                            for box in boxes:
+                                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+                                conf = box.conf[0].cpu().numpy()
+                                if conf > 0.5:
+                                    # Масштабируем координаты к размеру отображения
+                                    x1, y1, x2, y2 = scale_coordinates(x1, y1, x2, y2, scale_x, scale_y)
+                                    logger.debug(f"Детекция: conf={conf:.2f}, box=({x1}, {y1}, {x2}, {y2})")
+                                    scaled_boxes.append({
+                                        'box': (int(x1), int(y1), int(x2), int(y2)),
+                                        'conf': float(conf),
+                                        'frame': frame_count,
+                                        'person': None
+                                    })
+                            profiler.stop('process_boxes')
+                            
+                            with detection_lock:
+                                profiler.start('update_cache')
+                                update_detection_cache(scaled_boxes, frame_count, stride_controller.stride)
+                                profiler.stop('update_cache')
+                            
+                            # Распознаём только детекции, которым match_detections не перенёс имя
+                            profiler.start('face_recognition')
+                            with detection_lock:
+                                unnamed = [d['box'] for d in last_detections if not d['person']]
+                            for box in unnamed:
+                                x1, y1, x2, y2 = box
+                                face_roi = frame[y1:y2, x1:x2]
+                                if face_roi.size > 0:
+                                    logger.debug(f"Обработка ROI размера {face_roi.shape}")
+                                    embedding = get_face_embedding(face_roi)
+                                    if embedding is not None:
+                                        person = find_matching_face(embedding)
+                                        # Неудачный поиск не стирает имя, найденное раньше
+                                        if person is not None:
+                                            with detection_lock:
+                                                for d in last_detections:
+                                                    if d['box'] == box and not d['person']:
+                                                        d['person'] = person
+                            profiler.stop('face_recognition')
+                    detect_time = time.time() - detect_start
+                    stride_controller.observe("detect", detect_time)
+                
+                # Отрисовываем детекции; на кадрах без детекции боксы сдвигаются по скорости трека
+                profiler.start('draw_detections')
+                with detection_lock:
+                    live = live_detections(last_detections, frame_count, stride_controller.stride)
+                    draw_detections(display_frame, predict_detections(live, frame_count))
+                profiler.stop('draw_detections')
+                
+                # Отправляем обработанный кадр
+                profiler.start('write_frame')
+                out.write(display_frame)
+                profiler.stop('write_frame')
+                metrics.observe("capture_to_output_ms", (time.monotonic() - captured_at) * 1000)
+                
+                # Измерение времени обработки
+                total_time = profiler.stop('total_frame')
+                frame_times.append(total_time)
+                stride_controller.observe("frame", total_time - detect_time)
+                stride_controller.update()
+                frame_count += 1
+                error_count = 0
+                
+                # Логирование статистики каждые 30 секунд
+                if frame_count % 900 == 0:
+                    elapsed_time = time.time() - start_time
+                    current_fps = frame_count / elapsed_time
+                    avg_frame_time = sum(frame_times[-900:]) / len(frame_times[-900:])
+                    logger.info("\n" + "=" * 50)
+                    logger.info("СТАТИСТИКА ПРОИЗВОДИТЕЛЬНОСТИ:")
+                    logger.info("=" * 50)
+                    logger.info(f"FPS: {current_fps:.2f}")
+                    logger.info(f"Среднее время обработки кадра: {avg_frame_time*1000:.2f} мс")
+                    logger.info(f"Целевой FPS: {target_fps}")
+                    logger.info(f"Шаг детекции: {stride_controller.stride}")
+                    logger.info(f"Обработано кадров: {frame_count}")
+                    logger.info(f"Время работы: {elapsed_time:.1f} сек")
+                    profiler.log_stats(logger)
+            else:
+                logger.warning("Получен пустой или некорректный кадр")
+                
+        except Exception as e:
+            error_count += 1
+            logger.error(f"Ошибка при обработке кадра: {str(e)}")
+            if error_count >= max_errors:
+                logger.error("Превышено максимальное количество ошибок, переподключение...")
+                break
+        finally:
+            capture_pool.release(frame)
+
     # Останавливаем поток детекции
-    frame_queue.put(None)
+    yolo_queue.put(None)
     detection_thread.join()
 
 # Парсинг аргументов командной строки
@@ -531,8 +550,33 @@ parser.add_argument(
     default=["person"],  # Changed default to an empty list
     help="List of parameters to process: person, car, cell phone, traffic light, helmet."
 )
+parser.add_argument(
+    "--capture-policy",
+    choices=CAPTURE_POLICIES,
+    default=os.getenv("CAPTURE_POLICY", "drop-oldest"),
+    help="What to do when processing falls behind: block capture, drop the oldest frame or keep only the latest one."
+)
 args = parser.parse_args()
 
+# Очередь кадров с камеры с выбранной политикой переполнения
+def release_dropped(item):
+    """Возвращает в пул кадр, выброшенный политикой захвата"""
+    if item is not None:
+        capture_pool.release(item[1])
+
+frame_queue = FrameQueue(maxsize=FRAME_QUEUE_SIZE, policy=args.capture_policy, on_drop=release_dropped)
+metrics.register_gauge("frame_queue_depth", frame_queue.qsize)
+metrics.register_gauge("frames_dropped", lambda: frame_queue.dropped)
+logger.info(f"Политика захвата: {args.capture_policy}")
+
+# Загружаем только модели, нужные для выбранных параметров
+models.preload(args.parameters)
+logger.info(f"Загруженные модели:\n{models.report()}")
+
+# Периодический вывод глубины очередей и загрузки CPU
+metrics_reporter = MetricsReporter(metrics, interval=30, log=logger)
+metrics_reporter.start()
+
 # Основной цикл обработки
 while True:
     cap = reconnect_rtsp()
@@ -578,23 +622,27 @@ while True:
         continue
 
     # Запуск потока для обработки кадров
-    processor_thread = Thread(target=process_frames, args=(args.parameters,))
+    processor_thread = Thread(target=process_frames, args=(args.parameters, fps))
     processor_thread.start()
 
     frame_ind = 0
     while cap.isOpened():
-        ret, frame = cap.read()
+        # Декодер пишет кадр прямо в буфер из пула; первый кадр задаёт размер буферов
+        buffer = capture_pool.acquire() if capture_pool.shape else None
+        ret, frame = cap.read(buffer) if buffer is not None else cap.read()
         if not ret:
+            capture_pool.release(buffer)
             logger.error("❌ Ошибка при чтении кадра из RTSP потока!")
             break
+        if frame.shape != capture_pool.shape:
+            capture_pool.resize(frame.shape)
 
-        # Отправляем кадр в очередь, даже если он поврежден
-        if not frame_queue.full():
-            frame_queue.put(frame)
+        # Отправляем кадр в очередь, даже если он поврежден; при переполнении действует политика захвата
+        frame_queue.offer((time.monotonic(), frame))
         frame_ind += 1
 
     # Остановка потока обработки
-    frame_queue.put(None)
+    frame_queue.offer(None)
     processor_thread.join()
 
     # Освобождение ресурсов
@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+from ann_index import ARRAYS, CURRENT_FILE, IndexOverlay, IVFFlatIndex, build_from_database
+from face_gallery import FaceGallery, GallerySync
+
+
+def clustered_embeddings(n_persons=40, per_person=10, seed=0):
+    """Синтетическая галерея: несколько снимков на человека вокруг общего центра"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_persons, 128)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    person_ids = np.repeat(np.arange(n_persons), per_person)
+    embeddings = centers[person_ids] + rng.normal(scale=0.02, size=(person_ids.size, 128)).astype(np.float32)
+    return embeddings, person_ids, centers
+
+
+@pytest.fixture
+def data():
+    embeddings, person_ids, centers = clustered_embeddings()
+    index = IVFFlatIndex.build(
+        embeddings, np.arange(person_ids.size) + 100, person_ids,
+        names={i: f"Person {i}" for i in range(40)}, nlist=16,
+    )
+    gallery = FaceGallery()
+    gallery.add(np.arange(person_ids.size) + 100, person_ids, embeddings)
+    return index, gallery, centers
+
+
+def test_lists_partition_all_faces(data):
+    index, gallery, _ = data
+    assert index.list_offsets[0] == 0
+    assert index.list_offsets[-1] == len(gallery)
+    assert sorted(index.face_ids.tolist()) == sorted(gallery.face_ids.tolist())
+
+
+def test_full_probe_matches_exact_search(data):
+    index, gallery, centers = data
+    queries = centers + 0.01
+    ann_idx, ann_dist = index.nearest(queries, nprobe=index.nlist)
+    exact_idx, exact_dist = gallery.nearest(queries)
+    assert index.face_ids[ann_idx].tolist() == gallery.face_ids[exact_idx].tolist()
+    np.testing.assert_allclose(ann_dist, exact_dist, atol=1e-5)
+
+
+def test_match_returns_person_and_name(data):
+    index, _, centers = data
+    person_id, distance = index.match(centers[5])
+    assert person_id == 5
+    assert index.name_of(person_id) == "Person 5"
+    assert index.match(-centers[5])[0] is None
+
+
+def test_save_and_load_memory_mapped(data, tmp_path):
+    index, _, centers = data
+    index.save(str(tmp_path))
+    loaded = IVFFlatIndex.load(str(tmp_path), nprobe=4)
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert loaded.nprobe == 4
+    assert loaded.names == index.names
+    person_ids, _ = loaded.match_batch(centers)
+    assert person_ids.tolist() == list(range(40))
+
+
+def test_save_switches_current_build_and_keeps_previous(data, tmp_path):
+    index, _, centers = data
+    builds = [index.save(str(tmp_path)) for _ in range(3)]
+    assert (tmp_path / CURRENT_FILE).read_text() == builds[-1]
+    # Самая старая сборка удалена, предыдущая остаётся для подов, которые её ещё читают
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == sorted(builds[1:])
+    person_ids, _ = IVFFlatIndex.load(str(tmp_path)).match_batch(centers)
+    assert person_ids.tolist() == list(range(40))
+
+
+def test_load_reads_flat_layout(data, tmp_path):
+    index, _, centers = data
+    build = index.save(str(tmp_path))
+    for name in ARRAYS + ("meta.json",):
+        file_name = name if name.endswith(".json") else f"{name}.npy"
+        (tmp_path / build / file_name).rename(tmp_path / file_name)
+    (tmp_path / CURRENT_FILE).unlink()
+    person_ids, _ = IVFFlatIndex.load(str(tmp_path)).match_batch(centers)
+    assert person_ids.tolist() == list(range(40))
+
+
+def test_build_from_empty_database(tmp_path):
+    from sqlalchemy import create_engine, text
+
+    url = f"sqlite:///{tmp_path / 'faces.db'}"
+    with create_engine(url).begin() as conn:
+        conn.execute(text("CREATE TABLE persons (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("CREATE TABLE faces (id INTEGER PRIMARY KEY, person_id INTEGER, encoding BLOB)"))
+        conn.execute(text("CREATE TABLE face_changes (id INTEGER PRIMARY KEY, version BIGINT)"))
+    with pytest.raises(ValueError, match="no valid embeddings"):
+        build_from_database(url)
+
+
+def test_build_rejects_empty_gallery():
+    with pytest.raises(ValueError):
+        IVFFlatIndex.build(np.empty((0, 128)), [], [])
+
+
+def test_overlay_applies_changes_while_index_is_loaded(data, tmp_path):
+    index, _, centers = data
+    index.gallery_version = 7
+    index.save(str(tmp_path))
+    overlay = IndexOverlay(IVFFlatIndex.load(str(tmp_path)))
+    assert overlay.version == 7
+
+    rng = np.random.default_rng(1)
+    newcomer = rng.normal(size=128).astype(np.float32)
+    newcomer /= np.linalg.norm(newcomer)
+    log = [
+        (8, "add", 1000, 99, "Newcomer", newcomer),
+        (9, "rename", 100, 0, "Person 0 renamed", None),
+        # Человек 5 удалён вместе со всеми лицами
+        *[(10 + i, "delete", 150 + i, 5, None, None) for i in range(10)],
+    ]
+    sync = GallerySync(overlay, lambda since, limit: [c for c in log if c[0] > since][:limit])
+    assert overlay.match(newcomer)[0] is None
+    sync.poll()
+
+    assert overlay.version == 19
+    assert len(overlay) == len(index) - 10 + 1
+    person_id, _ = overlay.match(newcomer)
+    assert (person_id, overlay.name_of(person_id)) == (99, "Newcomer")
+    assert overlay.name_of(overlay.match(centers[0])[0]) == "Person 0 renamed"
+    assert overlay.match(centers[5])[0] is None
+    assert overlay.name_of(5) is None
+    person_ids, _ = overlay.match_batch(centers)
+    assert person_ids.tolist() == [p if p != 5 else -1 for p in range(40)]
+
+
+def test_overlay_load_replaces_index(data):
+    index, _, centers = data
+    overlay = IndexOverlay(index)
+    overlay.load([(1, 3, "Only", centers[3])])
+    assert len(overlay) == 1
+    assert overlay.match(centers[3])[0] == 3
+    assert overlay.match(centers[4])[0] is None
+    assert overlay.name_of(4) is None
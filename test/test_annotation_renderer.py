@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from annotation_renderer import AnnotationRenderer
+
+
+def frame():
+    return np.random.default_rng(0).integers(0, 255, (360, 640, 3), dtype=np.uint8)
+
+
+def blend_full_frame(image, box, alpha):
+    """Прежний способ: копия всего кадра и смешивание всего кадра"""
+    overlay = image.copy()
+    cv2.rectangle(overlay, box[:2], box[2:], (0, 255, 0), 2)
+    cv2.addWeighted(overlay, alpha, image, 1 - alpha, 0, image)
+
+
+@pytest.mark.parametrize("box", [(10, 20, 100, 120), (0, 0, 639, 359), (600, 300, 700, 400)])
+def test_box_blend_matches_full_frame_blend(box):
+    expected, actual = frame(), frame()
+    blend_full_frame(expected, box, 0.62)
+    AnnotationRenderer().draw_box(actual, box, 0.62)
+    assert np.array_equal(expected, actual)
+
+
+@pytest.mark.parametrize("origin", [(50, 60), (0, 5), (630, 350), (-10, 20)])
+def test_cached_label_matches_put_text(origin):
+    renderer = AnnotationRenderer()
+    for color in ((0, 255, 0), (0, 0, 255)):
+        expected, actual = frame(), frame()
+        cv2.putText(expected, "Ivan Petrov", origin, cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+        renderer.draw_label(actual, "Ivan Petrov", origin, color)
+        assert np.array_equal(expected, actual)
+
+
+def test_labels_are_rasterized_once_and_evicted_lru():
+    renderer = AnnotationRenderer(max_labels=2)
+    image = frame()
+    for _ in range(3):
+        renderer.draw(image, [((10, 10, 50, 50), 0.5)], [("Anna", (10, 5)), ("Boris", (10, 80))])
+    assert renderer.label_misses == 2 and renderer.label_hits == 4
+    renderer.draw_label(image, "Vera", (10, 150))
+    assert renderer.cached_labels == 2
+    renderer.draw_label(image, "Anna", (10, 5))  # Вытеснена как давно не использованная
+    assert renderer.label_misses == 4
+
+
+def test_labels_are_drawn_over_boxes():
+    renderer = AnnotationRenderer()
+    image = np.zeros((100, 200, 3), np.uint8)
+    # Верхняя сторона рамки проходит через подпись
+    renderer.draw(image, [((0, 20, 199, 99), 0.5)], [("A", (5, 30), (0, 0, 255))])
+    coverage, dx, dy = renderer.label_mask("A")
+    solid = np.argwhere(coverage[..., 0] == 1.0) + (30 + dy, 5 + dx)
+    assert (solid[:, 0] == 20).any()
+    assert all(image[y, x].tolist() == [0, 0, 255] for y, x in solid)
@@ -239,4 +239,49 @@ def test_delete_camera_not_found(db, test_user, auth_headers):
     """Тест удаления несуществующей камеры"""
     response = client.delete("/api/cameras/999", headers=auth_headers)
     assert response.status_code == 404
-    assert "Камера не найдена" in response.text 
\ No newline at end of file
+    assert "Камера не найдена" in response.text 
+
+
+def test_create_camera_with_roi(db, test_user, auth_headers):
+    """Тест создания камеры с ROI"""
+    camera_data = {
+        "name": "Test Camera",
+        "url": "rtsp://test.com/stream",
+        "roi": [[[0.5, 0.0], [1.0, 0.0], [1.0, 1.0]]]
+    }
+    response = client.post("/api/cameras/", json=camera_data, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json()["roi"] == [[[0.5, 0.0], [1.0, 0.0], [1.0, 1.0]]]
+
+def test_create_camera_invalid_roi(db, test_user, auth_headers):
+    """Тест создания камеры с некорректным ROI"""
+    for roi in ([[[0.0, 0.0], [1.0, 1.0]]], [[[0.0, 0.0], [1.5, 0.0], [1.0, 1.0]]]):
+        camera_data = {"name": "Test Camera", "url": "rtsp://test.com/stream", "roi": roi}
+        response = client.post("/api/cameras/", json=camera_data, headers=auth_headers)
+        assert response.status_code == 422
+
+def test_set_and_delete_camera_roi(db, test_user, auth_headers):
+    """Тест задания и удаления ROI камеры"""
+    camera = models.Camera(name="Test Camera", url="rtsp://test.com/stream", is_active=True)
+    db.add(camera)
+    db.commit()
+    db.refresh(camera)
+
+    polygons = [[[0.0, 0.5], [1.0, 0.5], [1.0, 1.0], [0.0, 1.0]]]
+    response = client.put(f"/api/cameras/{camera.id}/roi", json={"polygons": polygons}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["roi"] == polygons
+
+    response = client.get(f"/api/cameras/{camera.id}", headers=auth_headers)
+    assert response.json()["roi"] == polygons
+
+    response = client.delete(f"/api/cameras/{camera.id}/roi", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["roi"] is None
+
+def test_set_camera_roi_not_found(db, test_user, auth_headers):
+    """Тест задания ROI несуществующей камеры"""
+    polygons = [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0]]]
+    response = client.put("/api/cameras/999/roi", json={"polygons": polygons}, headers=auth_headers)
+    assert response.status_code == 404
+    assert "Камера не найдена" in response.text
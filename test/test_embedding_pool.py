@@ -0,0 +1,138 @@
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from embedding_pool import EmbeddingPool
+from metrics import Metrics
+
+
+class FakeEmbedder:
+    """Яркость кропа становится дескриптором; кропы ярче 200 отбрасывает shape_filter"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.rejected = 0
+        self.pid = os.getpid()
+
+    def embed_crops(self, crops, face_boxes=None):
+        time.sleep(self.delay)
+        embeddings = np.zeros((len(crops), 128), dtype=np.float32)
+        valid = np.zeros(len(crops), dtype=bool)
+        for row, crop in enumerate(crops):
+            if crop is None:
+                continue
+            if crop.mean() > 200:
+                self.rejected += 1
+                continue
+            embeddings[row, 0] = crop.mean()
+            embeddings[row, 1] = os.getpid()
+            embeddings[row, 2] = face_boxes[row][0] if face_boxes is not None else -1
+            valid[row] = True
+        return embeddings, valid
+
+
+def crop(value, size=40):
+    return np.full((size, size, 3), value, dtype=np.uint8)
+
+
+def wait_results(pool, count, timeout=10.0):
+    results = []
+    deadline = time.monotonic() + timeout
+    while len(results) < count and time.monotonic() < deadline:
+        results.extend(pool.poll())
+        time.sleep(0.01)
+    return results
+
+
+@pytest.fixture
+def pool():
+    pool = EmbeddingPool(FakeEmbedder, workers=2, slots=2, metrics=Metrics())
+    yield pool
+    pool.close()
+
+
+def test_pool_embeds_in_worker_processes(pool):
+    face = crop(10)
+    assert pool.submit("a", [face, None, crop(250)], [(5, 0, 10, 10), None, (0, 0, 1, 1)])
+    # Кроп скопирован в общую память при submit: кадр можно переиспользовать сразу
+    face[...] = 99
+    [result] = wait_results(pool, 1)
+    assert result.key == "a"
+    assert result.valid.tolist() == [True, False, False]
+    assert result.rejected == 1
+    assert result.embeddings[0, 0] == 10
+    assert result.embeddings[0, 2] == 5
+    assert result.embeddings[0, 1] != os.getpid()
+    assert pool.pending == 0
+
+
+def test_submit_refuses_when_slots_are_taken(pool):
+    assert pool.submit(1, [crop(1)])
+    assert pool.submit(2, [crop(2)])
+    assert not pool.submit(3, [crop(3)])
+    assert pool.metrics.counter("embedding_pool_busy") == 1
+    results = wait_results(pool, 2)
+    assert sorted(result.key for result in results) == [1, 2]
+    assert pool.submit(3, [crop(3)])
+
+
+def test_poll_does_not_block_on_slow_workers():
+    pool = EmbeddingPool(lambda: FakeEmbedder(delay=0.5), workers=1, metrics=Metrics())
+    try:
+        pool.submit("slow", [crop(1)])
+        start = time.monotonic()
+        assert pool.poll() == []
+        assert time.monotonic() - start < 0.1
+        assert [result.key for result in wait_results(pool, 1)] == ["slow"]
+    finally:
+        pool.close()
+
+
+def test_timed_out_job_returns_empty_result_and_frees_slot():
+    pool = EmbeddingPool(lambda: FakeEmbedder(delay=1.0), workers=1, slots=1, job_timeout=0.05, metrics=Metrics())
+    try:
+        pool.submit("stuck", [crop(1), crop(2)])
+        time.sleep(0.1)
+        [result] = pool.poll()
+        assert result.key == "stuck" and result.valid.tolist() == [False, False]
+        assert pool.metrics.counter("embedding_timeouts") == 1
+        assert pool.submit("next", [crop(3)])
+    finally:
+        pool.close()
+
+
+def test_inline_pool_without_workers():
+    pool = EmbeddingPool(FakeEmbedder, workers=0, metrics=Metrics())
+    assert pool.submit("a", [crop(7)])
+    [result] = pool.poll()
+    assert result.embeddings[0, 0] == 7 and result.embeddings[0, 1] == os.getpid()
+    assert pool.poll() == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_dead_worker_is_restarted(workers):
+    pool = EmbeddingPool(FakeEmbedder, workers=workers, job_timeout=0.5, restart_delay=0.0, metrics=Metrics())
+    try:
+        pool.submit("before", [crop(5)])
+        [result] = wait_results(pool, 1)
+        worker_pid = int(result.embeddings[0, 1])
+        assert worker_pid != os.getpid()
+        os.kill(worker_pid, signal.SIGKILL)
+
+        deadline = time.monotonic() + 5
+        while pool.metrics.counter("embedding_worker_restarts") == 0 and time.monotonic() < deadline:
+            pool.poll()
+            time.sleep(0.01)
+        # Вместе с упавшим перезапускаются все воркеры: он мог оставить заблокированной очередь
+        assert pool.metrics.counter("embedding_worker_restarts") == workers
+        assert pool.workers_alive == workers
+        pool.submit("after", [crop(5)])
+        [result] = wait_results(pool, 1)
+        assert result.key == "after" and result.valid.tolist() == [True]
+        assert int(result.embeddings[0, 1]) not in (worker_pid, os.getpid())
+    finally:
+        pool.close()
+    assert pool.workers_alive == 0
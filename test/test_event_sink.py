@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+
+from event_sink import EventSink
+from metrics import Metrics
+
+
+class FakeDatabase:
+    """write_batch, который можно "уронить" и задержать"""
+
+    def __init__(self):
+        self.batches = []
+        self.down = False
+        self.bad_tracks = set()  # События, которые база отвергает всегда (нарушение ограничений)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def write(self, events):
+        self.gate.wait(5)
+        if self.down:
+            raise ConnectionError("database is unreachable")
+        if any(event["track_id"] in self.bad_tracks for event in events):
+            raise ValueError("foreign key violation")
+        self.batches.append(list(events))
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def make_sink(db, **kwargs):
+    kwargs.setdefault("metrics", Metrics())
+    sink = EventSink(db.write, **kwargs)
+    sink.start()
+    return sink
+
+
+def test_events_are_written_in_batches_of_batch_size():
+    db = FakeDatabase()
+    db.gate.clear()
+    sink = make_sink(db, batch_size=2, flush_interval=5)
+    for i in range(5):
+        assert sink.emit({"track_id": i})
+    db.gate.set()
+    # Полные пачки уходят сразу, остаток - при закрытии
+    assert wait_for(lambda: len(db.events) >= 4)
+    sink.close(5)
+    assert [len(batch) for batch in db.batches] == [2, 2, 1]
+    assert [event["track_id"] for event in db.events] == list(range(5))
+
+
+def test_partial_batch_is_flushed_after_interval():
+    db = FakeDatabase()
+    sink = make_sink(db, batch_size=100, flush_interval=0.05)
+    sink.emit({"track_id": 1})
+    assert wait_for(lambda: db.events == [{"track_id": 1}], timeout=1)
+    assert sink.metrics.counter("events_written") == 1
+    sink.close(5)
+
+
+def test_events_spill_to_file_while_database_is_down_and_replay(tmp_path):
+    db = FakeDatabase()
+    db.down = True
+    spill = tmp_path / "events.jsonl"
+    sink = make_sink(db, batch_size=10, flush_interval=0.01, retry_interval=0.1, spill_path=str(spill))
+    sink.emit({"track_id": 1, "event_type": "enter"})
+    assert wait_for(lambda: sink.metrics.counter("events_spilled") == 1)
+    # Пока повтор не наступил, база не дёргается, события сразу уходят в файл
+    sink.emit({"track_id": 1, "event_type": "exit"})
+    assert wait_for(lambda: sink.metrics.counter("events_spilled") == 2)
+    assert sink.metrics.counter("events_write_errors") == 1
+    assert [json.loads(line)["event_type"] for line in spill.read_text().splitlines()] == ["enter", "exit"]
+
+    db.down = False
+    assert wait_for(lambda: len(db.events) == 2)
+    assert [event["event_type"] for event in db.events] == ["enter", "exit"]
+    assert not spill.exists()
+    assert sink.metrics.counter("events_replayed") == 2
+    sink.close(5)
+
+
+def test_full_buffer_applies_backpressure_then_spills(tmp_path):
+    db = FakeDatabase()
+    db.gate.clear()
+    spill = tmp_path / "events.jsonl"
+    sink = make_sink(db, max_buffer=1, batch_size=1, put_timeout=0.01, spill_path=str(spill))
+    assert sink.emit({"track_id": 1})
+    assert wait_for(lambda: sink.buffered == 0)  # Первое событие взято потоком записи и ждёт базу
+    assert sink.emit({"track_id": 2})
+    start = time.monotonic()
+    assert not sink.emit({"track_id": 3})
+    assert time.monotonic() - start >= 0.01
+    assert sink.metrics.counter("events_backpressure") == 1
+    assert json.loads(spill.read_text())["track_id"] == 3
+    db.gate.set()
+    sink.close(5)
+    assert sorted(event["track_id"] for event in db.events) == [1, 2, 3]
+
+
+def test_spill_left_by_previous_run_is_replayed(tmp_path):
+    spill = tmp_path / "events.jsonl"
+    spill.write_text('{"track_id": 7}\n{"track_id": 8\n')
+    db = FakeDatabase()
+    sink = make_sink(db, flush_interval=0.01, spill_path=str(spill))
+    assert wait_for(lambda: db.events == [{"track_id": 7}])
+    assert sink.metrics.counter("events_dropped") == 1
+    sink.close(5)
+
+
+def test_rejected_event_is_isolated_to_dead_letter(tmp_path):
+    db = FakeDatabase()
+    db.gate.clear()
+    db.bad_tracks = {57}
+    spill = tmp_path / "events.jsonl"
+    dead_letter = tmp_path / "rejected.jsonl"
+    sink = make_sink(db, batch_size=200, flush_interval=0.05, spill_path=str(spill), dead_letter_path=str(dead_letter))
+    for i in range(201):
+        sink.emit({"track_id": i})
+    db.gate.set()
+    # Ошибка данных не включает повтор: хорошие события пишутся сразу, файл повтора не нужен
+    assert wait_for(lambda: len(db.events) == 200)
+    sink.emit({"track_id": 300})
+    assert wait_for(lambda: len(db.events) == 201, timeout=1)
+    sink.close(5)
+    assert 57 not in [event["track_id"] for event in db.events]
+    assert not spill.exists()
+    [rejected] = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert rejected["event"] == {"track_id": 57} and "foreign key" in rejected["error"]
+    assert sink.metrics.counter("events_dead_lettered") == 1
+    assert sink.metrics.counter("events_write_errors") == 0
+
+
+def test_connection_error_while_isolating_spills_the_rest(tmp_path):
+    errors = [ValueError("foreign key violation"), ConnectionError("database is unreachable")]
+
+    def write(events):
+        # Первая запись - ошибка данных, при делении пачки база пропадает
+        raise errors.pop(0) if errors else ConnectionError("database is unreachable")
+
+    spill = tmp_path / "events.jsonl"
+    sink = EventSink(write, spill_path=str(spill), dead_letter_path=str(tmp_path / "rejected.jsonl"), metrics=Metrics())
+    assert not sink._write([{"track_id": i} for i in range(4)])
+    assert sorted(json.loads(line)["track_id"] for line in spill.read_text().splitlines()) == [0, 1, 2, 3]
+    assert sink.metrics.counter("events_write_errors") == 1
+    assert not (tmp_path / "rejected.jsonl").exists()
@@ -0,0 +1,138 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from app.main import app
+from app import models, auth
+from app.database import SessionLocal, Base
+from app.events import event_id_floor, event_id_time, make_event_id
+import uuid
+
+client = TestClient(app)
+
+BASE_TS = datetime(2025, 3, 1, 12, 0, 0)
+
+@pytest.fixture(scope="function")
+def db():
+    db = SessionLocal()
+    try:
+        for table in reversed(Base.metadata.sorted_tables):
+            db.execute(table.delete())
+        db.commit()
+        yield db
+    finally:
+        for table in reversed(Base.metadata.sorted_tables):
+            db.execute(table.delete())
+        db.commit()
+        db.close()
+
+@pytest.fixture(scope="function")
+def test_user(db):
+    unique_id = str(uuid.uuid4())[:8]
+    user = models.User(
+        email=f"test_{unique_id}@example.com",
+        username=f"testuser_{unique_id}",
+        hashed_password=auth.get_password_hash("testpass"),
+        is_active=True,
+        is_superuser=True
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+@pytest.fixture(scope="function")
+def auth_headers(test_user):
+    response = client.post(
+        "/api/auth/token",
+        data={"username": test_user.username, "password": "testpass"}
+    )
+    token = response.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="function")
+def events(db):
+    """Десять событий своей камеры с шагом в минуту: чётные - процессор 1, нечётные - процессор 2"""
+    person = models.Person(name=f"Person {uuid.uuid4().hex[:8]}")
+    db.add(person)
+    db.commit()
+    camera_id = uuid.uuid4().int % 10**9
+    rows = []
+    for i in range(10):
+        ts = BASE_TS + timedelta(minutes=i)
+        rows.append(models.Event(
+            id=make_event_id(ts),
+            event_type="enter" if i % 2 == 0 else "exit",
+            person_id=person.id if i < 5 else None,
+            stream_processor_id=1 if i % 2 == 0 else 2,
+            camera_id=camera_id,
+            track_id=i,
+            ts=ts,
+        ))
+    db.add_all(rows)
+    db.commit()
+    yield person, camera_id
+    for row in rows:
+        db.delete(row)
+    db.delete(person)
+    db.commit()
+
+def test_event_ids_follow_time():
+    ids = [make_event_id(BASE_TS) for _ in range(3)]
+    assert len(set(ids)) == 3
+    assert make_event_id(BASE_TS + timedelta(milliseconds=1)) > max(ids)
+    assert event_id_time(ids[0]) == BASE_TS
+    assert event_id_floor(BASE_TS) <= min(ids)
+    assert make_event_id(BASE_TS.replace(tzinfo=timezone.utc)) >> 22 == ids[0] >> 22
+
+def test_get_events_requires_auth(db):
+    response = client.get("/api/events/")
+    assert response.status_code == 401
+
+def test_get_events_pages_with_cursor(db, auth_headers, events):
+    track_ids = []
+    cursor = None
+    for _ in range(4):
+        params = {"camera_id": events[1], "limit": 4}
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = client.get("/api/events/", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        page = response.json()
+        track_ids.extend(event["track_id"] for event in page["events"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert track_ids == list(range(9, -1, -1))
+
+def test_get_events_last_full_page_has_no_cursor(db, auth_headers, events):
+    response = client.get("/api/events/", params={"camera_id": events[1], "limit": 10}, headers=auth_headers)
+    assert len(response.json()["events"]) == 10
+    assert response.json()["next_cursor"] is None
+
+def test_get_events_filters(db, auth_headers, events):
+    person, camera_id = events
+    response = client.get("/api/events/", params={"person_id": person.id}, headers=auth_headers)
+    assert [event["track_id"] for event in response.json()["events"]] == [4, 3, 2, 1, 0]
+    params = {"camera_id": camera_id, "stream_processor_id": 2, "event_type": "exit"}
+    response = client.get("/api/events/", params=params, headers=auth_headers)
+    assert [event["track_id"] for event in response.json()["events"]] == [9, 7, 5, 3, 1]
+
+def test_get_events_time_range(db, auth_headers, events):
+    params = {
+        "camera_id": events[1],
+        "start": (BASE_TS + timedelta(minutes=2)).isoformat(),
+        "end": (BASE_TS + timedelta(minutes=5)).isoformat(),
+    }
+    response = client.get("/api/events/", params=params, headers=auth_headers)
+    assert [event["track_id"] for event in response.json()["events"]] == [4, 3, 2]
+
+def test_get_events_time_range_with_timezone(db, auth_headers, events):
+    # 15:02+03:00 - это 12:02 UTC
+    params = {"camera_id": events[1], "start": "2025-03-01T15:02:00+03:00", "end": "2025-03-01T15:04:00+03:00"}
+    response = client.get("/api/events/", params=params, headers=auth_headers)
+    assert [event["track_id"] for event in response.json()["events"]] == [3, 2]
+
+def test_get_events_invalid_range(db, auth_headers):
+    params = {"start": BASE_TS.isoformat(), "end": BASE_TS.isoformat()}
+    response = client.get("/api/events/", params=params, headers=auth_headers)
+    assert response.status_code == 400
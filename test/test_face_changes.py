@@ -0,0 +1,129 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app import models, auth
+from app.database import SessionLocal
+import uuid
+from unittest.mock import patch
+
+client = TestClient(app)
+
+@pytest.fixture(scope="function")
+def db():
+    db = SessionLocal()
+    try:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            db.execute(table.delete())
+        db.commit()
+        yield db
+    finally:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            db.execute(table.delete())
+        db.commit()
+        db.close()
+
+@pytest.fixture(scope="function")
+def auth_headers(db):
+    unique_id = str(uuid.uuid4())[:8]
+    user = models.User(
+        email=f"test_{unique_id}@example.com",
+        username=f"testuser_{unique_id}",
+        hashed_password=auth.get_password_hash("testpass"),
+        is_active=True
+    )
+    db.add(user)
+    db.commit()
+    response = client.post(
+        "/api/auth/token",
+        data={"username": user.username, "password": "testpass"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="function")
+def test_person(db):
+    person = models.Person(name=f"Test Person {str(uuid.uuid4())[:8]}")
+    db.add(person)
+    db.commit()
+    db.refresh(person)
+    return person
+
+def upload_face(person_id, headers):
+    with patch("app.routers.faces.get_face_embedding", return_value=[0.5] * 128):
+        files = {"files": ("face.jpg", b"fakeimagebytes", "image/jpeg")}
+        return client.post(f"/api/faces/upload/{person_id}", files=files, headers=headers)
+
+def test_changes_empty(db, auth_headers):
+    response = client.get("/api/faces/changes", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"version": 0, "changes": []}
+
+def test_changes_report_added_faces(db, auth_headers, test_person):
+    assert upload_face(test_person.id, auth_headers).status_code == 201
+    data = client.get("/api/faces/changes?since=0", headers=auth_headers).json()
+    assert len(data["changes"]) == 1
+    change = data["changes"][0]
+    assert change["op"] == "add"
+    assert change["person_id"] == test_person.id
+    assert change["encoding"].split(",")[0] == "0.5"
+    assert data["version"] == change["version"]
+
+    # Клиент с актуальной версией получает пустой список
+    data = client.get(f"/api/faces/changes?since={data['version']}", headers=auth_headers).json()
+    assert data["changes"] == []
+
+def test_changes_report_deleted_faces(db, auth_headers, test_person):
+    upload_face(test_person.id, auth_headers)
+    version = client.get("/api/faces/changes", headers=auth_headers).json()["version"]
+
+    assert client.delete(f"/api/persons/{test_person.id}", headers=auth_headers).status_code == 200
+    data = client.get(f"/api/faces/changes?since={version}", headers=auth_headers).json()
+    assert [c["op"] for c in data["changes"]] == ["delete"]
+    assert data["changes"][0]["encoding"] is None
+    assert data["version"] > version
+
+def test_changes_report_renamed_persons(db, auth_headers, test_person):
+    upload_face(test_person.id, auth_headers)
+    version = client.get("/api/faces/changes", headers=auth_headers).json()["version"]
+
+    # Сохранение без смены имени в журнал не попадает
+    response = client.put(f"/api/persons/{test_person.id}", json={"name": test_person.name}, headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get(f"/api/faces/changes?since={version}", headers=auth_headers).json()["changes"] == []
+
+    response = client.put(f"/api/persons/{test_person.id}", json={"name": "Renamed Person"}, headers=auth_headers)
+    assert response.status_code == 200
+    data = client.get(f"/api/faces/changes?since={version}", headers=auth_headers).json()
+    assert [(c["op"], c["person_id"], c["name"]) for c in data["changes"]] == [
+        ("rename", test_person.id, "Renamed Person")
+    ]
+
+def test_change_versions_come_from_locked_counter(db, auth_headers, test_person):
+    upload_face(test_person.id, auth_headers)
+    upload_face(test_person.id, auth_headers)
+    data = client.get("/api/faces/changes", headers=auth_headers).json()
+    versions = [c["version"] for c in data["changes"]]
+    db.expire_all()
+    state = db.query(models.GalleryState).one()
+    assert versions == sorted(versions)
+    assert state.version == versions[-1] == data["version"]
+
+def test_changes_report_lower_version_after_log_restart(db, auth_headers):
+    # Клиент с версией больше текущей видит её уменьшение и перезагружает галерею
+    data = client.get("/api/faces/changes?since=1000", headers=auth_headers).json()
+    assert data == {"version": 0, "changes": []}
+
+def test_reset_record_continues_versions(db, auth_headers, test_person):
+    from app.gallery import GALLERY_RESET, record_gallery_reset
+
+    upload_face(test_person.id, auth_headers)
+    version = client.get("/api/faces/changes", headers=auth_headers).json()["version"]
+    for table in (models.FaceChange, models.GalleryState):
+        db.query(table).delete()
+    record_gallery_reset(db, version)
+    db.commit()
+    data = client.get(f"/api/faces/changes?since={version}", headers=auth_headers).json()
+    assert [(c["op"], c["version"]) for c in data["changes"]] == [(GALLERY_RESET, version + 1)]
+
+    upload_face(test_person.id, auth_headers)
+    data = client.get(f"/api/faces/changes?since={version + 1}", headers=auth_headers).json()
+    assert [(c["op"], c["version"]) for c in data["changes"]] == [("add", version + 2)]
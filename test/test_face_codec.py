@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import schemas
+from app.face_codec import (
+    HEADER,
+    decode_embedding,
+    embedding_to_text,
+    encode_embedding,
+    is_legacy_encoding,
+    migrate_face_encodings,
+)
+from face_gallery import decode_embedding as gallery_decode_embedding
+
+
+@pytest.fixture
+def embedding():
+    return np.random.default_rng(0).normal(size=128).astype(np.float32)
+
+
+def test_encode_is_compact(embedding):
+    blob = encode_embedding(embedding)
+    assert len(blob) == HEADER.size + 128 * 4
+    assert not is_legacy_encoding(blob)
+
+
+def test_decode_is_zero_copy(embedding):
+    blob = encode_embedding(embedding)
+    decoded = decode_embedding(blob)
+    assert decoded.dtype == np.float32
+    assert np.array_equal(decoded, embedding)
+    assert not decoded.flags["OWNDATA"]
+    assert not decoded.flags["WRITEABLE"]
+
+
+def test_decode_legacy_text(embedding):
+    legacy = ",".join(map(str, embedding.astype(np.float64)))
+    assert is_legacy_encoding(legacy)
+    assert is_legacy_encoding(legacy.encode())
+    np.testing.assert_allclose(decode_embedding(legacy), embedding)
+    np.testing.assert_allclose(decode_embedding(legacy.encode()), embedding)
+
+
+def test_stream_processor_decoder_reads_same_format(embedding):
+    assert np.array_equal(gallery_decode_embedding(encode_embedding(embedding)), embedding)
+
+
+def test_face_schema_accepts_binary_encoding():
+    face = schemas.Face(id=1, person_id=1, encoding=encode_embedding([0.5, 0.25]))
+    assert face.encoding == "0.5,0.25"
+    assert embedding_to_text("0.1,0.2") == "0.1,0.2"
+
+
+def test_migrate_face_encodings(embedding):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE faces (id INTEGER PRIMARY KEY, person_id INTEGER, encoding TEXT NOT NULL)"))
+        conn.execute(
+            text("INSERT INTO faces (person_id, encoding) VALUES (1, :legacy), (1, :binary)"),
+            {"legacy": ",".join(map(str, embedding)), "binary": encode_embedding(embedding)},
+        )
+
+    assert migrate_face_encodings(engine, batch_size=1) == 1
+    assert migrate_face_encodings(engine) == 0
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT encoding FROM faces ORDER BY id")).scalars().all()
+    for value in rows:
+        assert not is_legacy_encoding(value)
+        np.testing.assert_allclose(decode_embedding(value), embedding)
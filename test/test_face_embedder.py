@@ -0,0 +1,112 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+
+class FakeFaceRecModel:
+    def __init__(self):
+        self.calls = 0
+
+    def compute_face_descriptor(self, images, shapes, num_jitters):
+        self.calls += 1
+        assert isinstance(images, list)
+        return [[np.full(128, detections[0])] for detections in shapes]
+
+
+@pytest.fixture
+def face_embedder(monkeypatch):
+    """Модуль face_embedder с подменённым dlib"""
+    mock_dlib = types.ModuleType("dlib")
+    mock_dlib.full_object_detections = list
+    mock_dlib.rectangle = lambda left, top, right, bottom: (left, top, right, bottom)
+    monkeypatch.setitem(sys.modules, "dlib", mock_dlib)
+    monkeypatch.delitem(sys.modules, "face_embedder", raising=False)
+    import face_embedder
+    return face_embedder
+
+
+@pytest.fixture
+def embedder(face_embedder):
+    # Пустой (чёрный) кроп - "лицо не найдено", яркость кропа становится дескриптором
+    detector = lambda image, upsample: ["rect"] if image.mean() > 0 else []
+    predictor = lambda image, rect: float(image.mean())
+    return face_embedder.FaceEmbedder(detector, predictor, FakeFaceRecModel())
+
+
+def crop(value):
+    return np.full((40, 40, 3), value, dtype=np.uint8)
+
+
+def test_embed_crops_uses_one_batched_descriptor_call(embedder):
+    embeddings, valid = embedder.embed_crops([crop(10), crop(0), crop(30), np.empty((0, 0, 3), np.uint8)])
+    assert embedder.face_rec_model.calls == 1
+    assert embeddings.shape == (4, 128)
+    assert embeddings.dtype == np.float32
+    assert valid.tolist() == [True, False, True, False]
+    assert embeddings[0, 0] == 10
+    assert embeddings[2, 0] == 30
+    assert not embeddings[1].any()
+
+
+def test_embed_crops_without_faces_skips_descriptor(embedder):
+    embeddings, valid = embedder.embed_crops([crop(0)])
+    assert embedder.face_rec_model.calls == 0
+    assert not valid.any()
+
+
+def test_embed_frames_flattens_boxes_in_order(embedder):
+    frame_a = np.zeros((100, 100, 3), np.uint8)
+    frame_a[:50, :50] = 20
+    frame_b = np.full((100, 100, 3), 40, np.uint8)
+    embeddings, valid = embedder.embed_frames(
+        [frame_a, frame_b],
+        [[(0, 0, 50, 50), (50, 50, 100, 100)], [(10, 10, 60, 60)]],
+    )
+    assert embedder.face_rec_model.calls == 1
+    assert valid.tolist() == [True, False, True]
+    assert embeddings[:, 0].tolist() == [20, 0, 40]
+
+
+def test_embed_single_crop(embedder):
+    assert embedder.embed(crop(0)) is None
+    assert embedder.embed(crop(5))[0] == 5
+
+
+def test_box_mode_skips_hog_detector(face_embedder):
+    def detector(image, upsample):
+        raise AssertionError("HOG detector must not run")
+
+    rects = []
+
+    def predictor(image, rect):
+        rects.append(rect)
+        return float(image.mean())
+
+    embedder = face_embedder.FaceEmbedder(detector, predictor, FakeFaceRecModel(), redetect=False)
+    embeddings, valid = embedder.embed_crops([crop(0), crop(7), crop(9)], [(20, 10, 30, 35), None, (50, 50, 60, 60)])
+    # Бокс вне кропа отбрасывается, без бокса лицом считается весь кроп
+    assert valid.tolist() == [True, True, False]
+    assert rects == [(20, 10, 29, 34), (0, 0, 39, 39)]
+    assert embeddings[1, 0] == 7
+    assert embedder.face_rec_model.calls == 1
+
+
+def test_shape_filter_drops_faces_before_descriptor(face_embedder):
+    detector = lambda image, upsample: ["rect"]
+    predictor = lambda image, rect: float(image.mean())
+    embedder = face_embedder.FaceEmbedder(detector, predictor, FakeFaceRecModel(), shape_filter=lambda shape: shape > 5)
+    embeddings, valid = embedder.embed_crops([crop(3), crop(8)])
+    assert valid.tolist() == [False, True]
+    assert embeddings[1, 0] == 8
+    assert embedder.rejected == 1
+
+
+def test_rgb_crops_reuse_scratch_buffers(embedder):
+    embedder.embed_crops([crop(10), crop(20)])
+    allocated = embedder.scratch.nbytes
+    embeddings, valid = embedder.embed_crops([crop(30)[:20, :20], crop(40)])
+    assert embedder.scratch.nbytes == allocated
+    assert valid.all()
+    assert embeddings[:, 0].tolist() == [30, 40]
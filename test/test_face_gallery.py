@@ -0,0 +1,169 @@
+import numpy as np
+import pytest
+
+from face_gallery import FaceGallery, GallerySync
+
+
+def random_embeddings(count, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(count, 128)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def gallery():
+    embeddings = random_embeddings(50)
+    g = FaceGallery(capacity=4)
+    g.load(
+        (face_id, face_id % 10, f"Person {face_id % 10}", embeddings[face_id])
+        for face_id in range(50)
+    )
+    return g
+
+
+def test_load_builds_contiguous_matrix(gallery):
+    assert len(gallery) == 50
+    assert gallery.embeddings.dtype == np.float32
+    assert gallery.embeddings.flags["C_CONTIGUOUS"]
+    assert gallery.person_ids.tolist() == [i % 10 for i in range(50)]
+
+
+def test_load_skips_invalid_embeddings():
+    g = FaceGallery()
+    g.load([(1, 1, "A", np.zeros(128)), (2, 1, "A", np.zeros(5)), (3, 2, "B", None)])
+    assert g.face_ids.tolist() == [1]
+
+
+def test_match_returns_person_of_nearest_face(gallery):
+    query = gallery.embeddings[17] + 0.01
+    person_id, distance = gallery.match(query)
+    assert person_id == 7
+    assert gallery.name_of(person_id) == "Person 7"
+    assert distance < 0.6
+
+
+def test_match_rejects_faces_beyond_threshold(gallery):
+    person_id, distance = gallery.match(-gallery.embeddings[0])
+    assert person_id is None
+    assert distance >= 0.6
+
+
+def test_match_on_empty_gallery():
+    person_id, distance = FaceGallery().match(np.zeros(128))
+    assert person_id is None
+    assert distance == np.inf
+
+
+def test_match_batch_agrees_with_python_loop(gallery, monkeypatch):
+    monkeypatch.setattr("face_gallery.SEARCH_CHUNK_SIZE", 7)
+    queries = np.concatenate([gallery.embeddings[[3, 21, 48]] + 0.02, random_embeddings(2, seed=1)])
+    person_ids, distances = gallery.match_batch(queries)
+
+    for query, person_id, distance in zip(queries, person_ids, distances):
+        dists = np.linalg.norm(gallery.embeddings - query, axis=1)
+        best = int(np.argmin(dists))
+        assert distance == pytest.approx(dists[best], abs=1e-5)
+        expected = gallery.person_ids[best] if dists[best] < 0.6 else -1
+        assert person_id == expected
+
+
+def test_remove_keeps_rows_consistent(gallery):
+    removed = gallery.remove([0, 49, 12, 999])
+    assert removed == 3
+    assert len(gallery) == 47
+    assert 12 not in gallery
+    for row, face_id in enumerate(gallery.face_ids):
+        assert gallery.person_ids[row] == face_id % 10
+    person_id, distance = gallery.match(gallery.embeddings[gallery.face_ids.tolist().index(48)])
+    assert person_id == 8
+    assert distance == pytest.approx(0, abs=1e-3)
+
+
+def test_apply_changes_adds_deletes_and_tracks_version():
+    g = FaceGallery()
+    embeddings = random_embeddings(3)
+    applied = g.apply_changes([
+        (1, "add", 10, 1, "Alice", embeddings[0]),
+        (2, "add", 11, 2, "Bob", embeddings[1]),
+        (3, "add", 12, 2, "Bob", None),  # лицо уже удалено
+        (4, "add", 10, 1, "Alice", embeddings[0]),  # повтор после полной загрузки
+        (5, "delete", 11, 2, None, None),
+    ])
+    assert applied == 3
+    assert g.version == 5
+    assert g.face_ids.tolist() == [10]
+    assert g.name_of(g.match(embeddings[0])[0]) == "Alice"
+
+
+def test_rename_and_last_face_delete_update_person_names():
+    g = FaceGallery()
+    embeddings = random_embeddings(3)
+    g.apply_changes([
+        (1, "add", 10, 1, "Alice", embeddings[0]),
+        (2, "add", 11, 1, "Alice", embeddings[1]),
+        (3, "add", 12, 2, "Bob", embeddings[2]),
+        (4, "rename", 10, 1, "Alice Smith", None),
+        (5, "rename", 99, 7, "Nobody", None),  # человека нет в галерее
+    ])
+    person_id, _ = g.match(embeddings[1])
+    assert (person_id, g.name_of(person_id)) == (1, "Alice Smith")
+    assert g.name_of(7) is None
+
+    # Имя забывается только вместе с последним лицом человека
+    g.apply_changes([(6, "delete", 10, 1, None, None)])
+    assert g.name_of(1) == "Alice Smith"
+    g.apply_changes([(7, "delete", 11, 1, None, None)])
+    assert g.name_of(1) is None
+    assert g.name_of(2) == "Bob"
+
+
+def test_gallery_sync_polls_in_batches():
+    g = FaceGallery()
+    embeddings = random_embeddings(5)
+    log = [(v + 1, "add", v, 1, "Alice", embeddings[v]) for v in range(5)]
+    calls = []
+
+    def fetch_changes(since, limit):
+        calls.append(since)
+        return [c for c in log if c[0] > since][:limit]
+
+    sync = GallerySync(g, fetch_changes, batch_size=2)
+    assert sync.poll() == 5
+    assert calls == [0, 2, 4]
+    assert g.version == 5
+    assert sync.poll() == 0
+
+
+def test_gallery_sync_reloads_after_reset():
+    g = FaceGallery()
+    embeddings = random_embeddings(2)
+    g.apply_changes([(1, "add", 10, 1, "Alice", embeddings[0]), (2, "add", 11, 2, "Bob", embeddings[1])])
+    reloads = []
+
+    def reload():
+        reloads.append(g.version)
+        g.load([(20, 3, "Carol", embeddings[0])])
+        g.version = 3
+
+    sync = GallerySync(g, lambda since, limit: [(3, "reset", 0, None, None, None)] if since < 3 else [],
+                       reload=reload)
+    assert sync.poll() == 1
+    assert reloads == [2]
+    assert g.face_ids.tolist() == [20]
+    assert sync.poll() == 0
+
+
+def test_gallery_sync_reloads_when_database_version_goes_back():
+    g = FaceGallery()
+    g.version = 7
+    reloads = []
+
+    def reload():
+        reloads.append(g.version)
+        g.version = 2
+
+    sync = GallerySync(g, lambda since, limit: [], reload=reload, fetch_version=lambda: 2)
+    sync.poll()
+    assert reloads == [7]
+    sync.poll()
+    assert reloads == [7]
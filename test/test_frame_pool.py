@@ -0,0 +1,97 @@
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from frame_pool import FramePool, ScratchBuffers
+
+SHAPE = (720, 1280, 3)
+FRAME_BYTES = int(np.prod(SHAPE))
+
+
+def test_pool_hands_out_buffers_in_ring_order():
+    pool = FramePool(3, SHAPE)
+    first = [pool.acquire() for _ in range(3)]
+    for buffer in first:
+        pool.release(buffer)
+    assert all(pool.acquire() is buffer for buffer in first)
+    assert pool.misses == 0
+
+
+def test_exhausted_pool_allocates_and_counts_miss():
+    pool = FramePool(1, SHAPE)
+    pool.acquire()
+    extra = pool.acquire()
+    assert extra.shape == SHAPE
+    assert pool.misses == 1 and pool.allocated == 2
+    pool.release(extra)
+    pool.release(np.empty(SHAPE, np.uint8))  # Сверх размера пула не хранится
+    assert pool.available == 1
+
+
+def test_pool_follows_stream_resolution():
+    pool = FramePool(2)
+    assert pool.shape is None
+    buffer = pool.acquire((360, 640, 3))
+    assert buffer.shape == (360, 640, 3)
+    pool.release(np.empty((10, 10, 3), np.uint8))  # Кадр старого размера отбрасывается
+    assert pool.available == 1
+
+
+def test_scratch_views_are_contiguous_and_reused():
+    scratch = ScratchBuffers()
+    big = scratch.get("rgb", (100, 120, 3))
+    small = scratch.get("rgb", (40, 30, 3))
+    assert small.flags.c_contiguous
+    assert np.shares_memory(big, small)
+    assert scratch.nbytes == 100 * 120 * 3
+    scratch.get("rgb", (200, 200, 3))
+    assert scratch.nbytes == 200 * 200 * 3
+
+
+def process(frame, scratch):
+    """Типичная работа стадии обработки на буферах из пула"""
+    resized = cv2.resize(frame, (256, 144), dst=scratch.get("resized", (144, 256, 3)))
+    face = frame[100:260, 200:340]
+    rgb = cv2.cvtColor(face, cv2.COLOR_BGR2RGB, dst=scratch.get("rgb", face.shape))
+    cv2.rectangle(frame, (200, 100), (340, 260), (0, 255, 0), 2)
+    return resized, rgb
+
+
+def process_unpooled(frame):
+    annotated = frame.copy()
+    resized = cv2.resize(frame, (256, 144))
+    rgb = cv2.cvtColor(frame[100:260, 200:340], cv2.COLOR_BGR2RGB)
+    cv2.rectangle(annotated, (200, 100), (340, 260), (0, 255, 0), 2)
+    return annotated, resized, rgb
+
+
+def peak_bytes(fn, frames=50):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(frames):
+            fn()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def test_steady_state_allocates_almost_nothing_per_frame():
+    source = np.random.default_rng(0).integers(0, 255, SHAPE, dtype=np.uint8)
+    pool = FramePool(4, SHAPE)
+    scratch = ScratchBuffers()
+
+    def step():
+        frame = pool.acquire()
+        np.copyto(frame, source)  # Так декодер пишет в переданный буфер
+        process(frame, scratch)
+        pool.release(frame)
+
+    step()  # Прогрев выделяет рабочие буферы
+    assert peak_bytes(step) < 64 * 1024
+    assert pool.misses == 0
+
+    # Без пула каждый кадр выделяет как минимум полную копию
+    assert peak_bytes(lambda: process_unpooled(source.copy())) > FRAME_BYTES
@@ -184,4 +184,96 @@ def test_get_stream_processors(mock_run_helm_command, db, test_user, auth_header
     )
     assert response.status_code == 200
     data = response.json()
-    assert len(data["processors"]) == 3 
\ No newline at end of file
+    assert len(data["processors"]) == 3 
+
+
+@patch("app.routers.kuber.yaml.dump")
+@patch("app.routers.kuber.run_helm_command")
+@patch("app.routers.kuber.HELM_CHART_PATH", new_callable=MagicMock)
+def test_deploy_multi_camera_stream_processor(mock_chart_path, mock_run_helm_command, mock_dump,
+                                              db, test_user, test_camera, auth_headers):
+    mock_chart_path.exists.return_value = True
+    mock_run_helm_command.return_value = (0, "ok", "")
+    second = models.Camera(name="second_camera", url="rtsp://test.com/second", is_active=True)
+    db.add(second)
+    db.commit()
+    db.refresh(second)
+
+    data = {"name": f"multiproc_{str(uuid.uuid4())[:8]}", "camera_ids": [test_camera.id, second.id]}
+    response = client.post("/api/kubernetes/stream-processor", json=data, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["camera_id"] == test_camera.id
+    assert response.json()["camera_ids"] == [test_camera.id, second.id]
+    # Выход у каждой камеры свой, общего пути процессора никто не публикует
+    output_streams = response.json()["output_streams"]
+    assert output_streams[str(second.id)].endswith(f"/processed/{data['name']}/{second.id}")
+    assert response.json()["output_stream"] == output_streams[str(test_camera.id)]
+
+    # Один релиз со списком камер в CAMERAS
+    values = mock_dump.call_args[0][0]
+    env = {item["name"]: item["value"] for item in values["env"]}
+    cameras = json.loads(env["CAMERAS"])
+    assert [camera["rtsp_in"] for camera in cameras] == [test_camera.url, second.url]
+    assert cameras[1]["rtsp_out"].endswith(f"/{data['name']}/{second.id}")
+    assert "RTSP_IN" not in env
+    assert "MAX_BATCH" not in env
+
+@patch("app.routers.kuber.yaml.dump")
+@patch("app.routers.kuber.run_helm_command")
+@patch("app.routers.kuber.HELM_CHART_PATH", new_callable=MagicMock)
+def test_deploy_stream_processor_batching_settings(mock_chart_path, mock_run_helm_command, mock_dump,
+                                                   db, test_user, test_camera, auth_headers):
+    mock_chart_path.exists.return_value = True
+    mock_run_helm_command.return_value = (0, "ok", "")
+    data = {"name": f"batchproc_{str(uuid.uuid4())[:8]}", "camera_id": test_camera.id,
+            "max_batch": 4, "max_batch_wait_ms": 15}
+    response = client.post("/api/kubernetes/stream-processor", json=data, headers=auth_headers)
+    assert response.status_code == 200
+    env = {item["name"]: item["value"] for item in mock_dump.call_args[0][0]["env"]}
+    assert env["MAX_BATCH"] == "4"
+    assert env["MAX_BATCH_WAIT_MS"] == "15.0"
+
+    data["max_batch"] = 0
+    response = client.post("/api/kubernetes/stream-processor", json=data, headers=auth_headers)
+    assert response.status_code == 422
+
+@patch("app.routers.kuber.run_helm_command")
+@patch("app.routers.kuber.HELM_CHART_PATH", new_callable=MagicMock)
+def test_deploy_stream_processor_unknown_camera(mock_chart_path, mock_run_helm_command,
+                                                db, test_user, test_camera, auth_headers):
+    mock_chart_path.exists.return_value = True
+    data = {"name": f"multiproc_{str(uuid.uuid4())[:8]}", "camera_ids": [test_camera.id, 999999]}
+    response = client.post("/api/kubernetes/stream-processor", json=data, headers=auth_headers)
+    assert response.status_code == 404
+    mock_run_helm_command.assert_not_called()
+
+def test_deploy_stream_processor_requires_camera(db, test_user, auth_headers):
+    response = client.post("/api/kubernetes/stream-processor", json={"name": "nocamera"}, headers=auth_headers)
+    assert response.status_code == 422
+
+@patch("app.routers.kuber.yaml.dump")
+@patch("app.routers.kuber.run_helm_command")
+@patch("app.routers.kuber.HELM_CHART_PATH", new_callable=MagicMock)
+def test_deploy_passes_stream_processor_id(mock_chart_path, mock_run_helm_command, mock_dump,
+                                           db, test_user, test_camera, auth_headers):
+    mock_chart_path.exists.return_value = True
+    mock_run_helm_command.return_value = (0, "ok", "")
+    data = {"name": f"idproc_{str(uuid.uuid4())[:8]}", "camera_id": test_camera.id}
+    response = client.post("/api/kubernetes/stream-processor", json=data, headers=auth_headers)
+    assert response.status_code == 200
+    processor = db.query(models.StreamProcessor).filter(models.StreamProcessor.name == data["name"]).one()
+    env = {item["name"]: item["value"] for item in mock_dump.call_args[0][0]["env"]}
+    assert env["STREAM_PROCESSOR_ID"] == str(processor.id)
+
+@patch("app.routers.kuber.yaml.dump")
+@patch("app.routers.kuber.run_helm_command")
+@patch("app.routers.kuber.HELM_CHART_PATH", new_callable=MagicMock)
+def test_failed_deploy_removes_stream_processor(mock_chart_path, mock_run_helm_command, mock_dump,
+                                                db, test_user, test_camera, auth_headers):
+    mock_chart_path.exists.return_value = True
+    mock_run_helm_command.return_value = (1, "", "boom")
+    data = {"name": f"failproc_{str(uuid.uuid4())[:8]}", "camera_id": test_camera.id}
+    response = client.post("/api/kubernetes/stream-processor", json=data, headers=auth_headers)
+    assert response.status_code == 500
+    db.expire_all()
+    assert db.query(models.StreamProcessor).filter(models.StreamProcessor.name == data["name"]).first() is None
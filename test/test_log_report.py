@@ -0,0 +1,97 @@
+import re
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import log_report
+from log_report import find_offset, log_report as make_report, read_log, render_report
+
+START = datetime(2025, 3, 18, 8, 0)
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Строка каждые 5 минут за сутки, у некоторых - продолжение без времени"""
+    path = tmp_path / "person_detection.log"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(288):
+            ts = START + timedelta(minutes=5 * i)
+            f.write(f"{ts:%Y-%m-%d %H:%M:%S} - 🟢 Кирилл вошел в кадр {i}\n")
+            if i % 7 == 0:
+                f.write("    продолжение сообщения\n")
+    return str(path)
+
+
+def test_find_offset_points_at_first_line_of_period(log_file):
+    with open(log_file, "rb") as f:
+        for start, expected in [
+            (START - timedelta(days=1), START),
+            (START + timedelta(minutes=62), START + timedelta(minutes=65)),
+            (START + timedelta(minutes=65), START + timedelta(minutes=65)),
+        ]:
+            f.seek(find_offset(f, start))
+            assert f.readline().decode().startswith(f"{expected:%Y-%m-%d %H:%M:%S}")
+        size = f.seek(0, 2)
+        assert find_offset(f, START + timedelta(days=2)) == size
+
+
+def test_read_log_range(log_file):
+    lines = list(read_log(log_file, START + timedelta(minutes=30), START + timedelta(minutes=40)))
+    assert lines == [
+        "2025-03-18 08:30:00 - 🟢 Кирилл вошел в кадр 6",
+        "2025-03-18 08:35:00 - 🟢 Кирилл вошел в кадр 7",
+        "    продолжение сообщения",
+    ]
+    assert len(list(read_log(log_file))) == 288 + 42
+
+
+def test_encode_text_keeps_cyrillic_and_replaces_the_rest():
+    # é в cp1252 занимает код кириллицы
+    assert log_report.encode_text("Ёж (x) 🟢 é°") == "Ёж (x) ? ?".encode("cp1251") + "°".encode("cp1252")
+
+
+def parse_pdf(data):
+    """Проверяет таблицу xref и возвращает тексты страниц"""
+    assert data.startswith(b"%PDF-1.4\n") and data.endswith(b"%%EOF\n")
+    xref_offset = int(re.search(rb"startxref\n(\d+)\n", data).group(1))
+    assert data[xref_offset:].startswith(b"xref\n")
+    count = int(re.search(rb"/Size (\d+)", data).group(1))
+    entries = data[xref_offset:].split(b"\n")[3:2 + count]
+    for object_id, entry in enumerate(entries, start=1):
+        assert data[int(entry[:10]):].startswith(b"%d 0 obj" % object_id)
+    pages = []
+    for stream in re.finditer(rb"stream\n(.*?)\nendstream", data, re.S):
+        pages.append(zlib.decompress(stream.group(1)))
+    return pages
+
+
+def test_report_is_streamed_page_by_page(log_file):
+    chunks = list(make_report(log_file))
+    pages = parse_pdf(b"".join(chunks))
+    lines_total = 288 + 42
+    assert len(pages) == -(-lines_total // log_report.LINES_PER_PAGE)
+    # Начало, по куску на страницу и конец
+    assert len(chunks) == len(pages) + 2
+    assert b"/Count %d" % len(pages) in chunks[-1]
+    assert "Кирилл".encode("cp1251") in pages[0]
+    assert b"Person detection report - 2" in pages[1]
+
+
+def test_report_for_period_and_long_lines(log_file, tmp_path):
+    # Время с поясом переводится в локальное, как в логе
+    start = datetime(2025, 3, 18, 9, 0).astimezone(timezone.utc)
+    pages = parse_pdf(b"".join(make_report(log_file, start, start + timedelta(minutes=10))))
+    assert len(pages) == 1
+    assert pages[0].count(b"Tj") == 1 + 2  # Заголовок и две строки
+    assert b"2025-03-18 09:00:00 - 2025-03-18 09:10:00" in pages[0]
+
+    pages = parse_pdf(b"".join(render_report(["a" * (log_report.CHARS_PER_LINE * 2 + 1), "(b)"], "title")))
+    assert pages[0].count(b"Tj") == 1 + 4
+    assert b"(\\(b\\)) Tj" in pages[0]
+
+
+def test_empty_report_has_one_page(tmp_path):
+    path = tmp_path / "empty.log"
+    path.write_text("")
+    assert len(parse_pdf(b"".join(make_report(str(path))))) == 1
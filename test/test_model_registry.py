@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from model_registry import ModelRegistry, models_for
+
+
+def test_models_are_loaded_once_on_first_use():
+    calls = []
+    registry = ModelRegistry()
+    registry.register("face", lambda: calls.append("face") or object())
+    registry.register("helmet", lambda: calls.append("helmet") or object())
+    assert calls == []
+    model = registry.get("face")
+    assert registry.get("face") is model
+    assert calls == ["face"]
+    assert not registry.is_loaded("helmet")
+    assert set(registry.stats) == {"face"}
+    assert registry.stats["face"]["load_time"] >= 0
+    assert "face" in registry.report()
+
+
+def test_concurrent_first_use_loads_once():
+    calls = []
+    started = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        started.wait(0.1)
+        return object()
+
+    registry = ModelRegistry()
+    registry.register("face", slow_loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("face"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len({id(r) for r in results}) == 1
+
+
+def test_preload_loads_only_requested_parameters():
+    registry = ModelRegistry()
+    for name in ("face", "face_detector", "shape_predictor", "face_rec_model", "object", "helmet"):
+        registry.register(name, object)
+    assert registry.preload(["car", "traffic light"]) == ["object"]
+    assert registry.is_loaded("object")
+    assert not registry.is_loaded("face")
+    assert not registry.is_loaded("helmet")
+
+
+def test_unknown_model():
+    with pytest.raises(KeyError):
+        ModelRegistry().get("missing")
+    assert models_for(["person", "helmet", "person"]) == [
+        "face", "face_detector", "shape_predictor", "face_rec_model", "helmet"]
@@ -0,0 +1,39 @@
+import numpy as np
+
+from motion_gate import MotionGate
+
+
+def scene(rng, person_at=None):
+    frame = np.full((360, 640, 3), 90, dtype=np.uint8)
+    # Шум сенсора не должен считаться движением
+    frame += rng.integers(0, 6, frame.shape, dtype=np.uint8)
+    if person_at is not None:
+        frame[100:300, person_at:person_at + 80] = 220
+    return frame
+
+
+def test_static_scene_is_skipped():
+    rng = np.random.default_rng(0)
+    gate = MotionGate()
+    assert gate.check(scene(rng))  # Первый кадр всегда идёт на детекцию
+    assert not any(gate.check(scene(rng)) for _ in range(20))
+    assert gate.skipped == 20
+    assert gate.skip_ratio == 20 / 21
+
+
+def test_motion_triggers_detection_and_updates_reference():
+    rng = np.random.default_rng(1)
+    gate = MotionGate()
+    gate.check(scene(rng))
+    assert gate.check(scene(rng, person_at=200))
+    assert gate.last_change > gate.threshold
+    # Человек стоит на месте - кадр совпадает с новым опорным
+    assert not gate.check(scene(rng, person_at=200))
+    assert gate.check(scene(rng, person_at=300))
+
+
+def test_max_skip_forces_periodic_detection():
+    rng = np.random.default_rng(2)
+    gate = MotionGate(max_skip=3)
+    results = [gate.check(scene(rng)) for _ in range(9)]
+    assert results == [True, False, False, False, True, False, False, False, True]
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from metrics import Metrics
+from multi_camera import CameraConfig, CameraSource, FairScheduler, IouTracker, parse_cameras
+
+
+class FakeCapture:
+    """Захват из count кадров с яркостью, равной номеру кадра"""
+
+    def __init__(self, count, shape=(36, 64, 3)):
+        self.count = count
+        self.shape = shape
+        self.read_count = 0
+        self.released = False
+
+    def get(self, prop):
+        return 25.0
+
+    def read(self, image=None):
+        if self.read_count >= self.count:
+            return False, None
+        frame = image if image is not None else np.empty(self.shape, np.uint8)
+        frame[...] = self.read_count
+        self.read_count += 1
+        return True, frame
+
+    def release(self):
+        self.released = True
+
+
+def make_source(name, frames=0, queue_size=10):
+    captures = [FakeCapture(frames)]
+    source = CameraSource(CameraConfig(None, name, f"rtsp://{name}", f"rtsp://out/{name}"),
+                          lambda url: captures.pop() if captures else None,
+                          queue_size=queue_size, policy="drop-oldest", metrics=Metrics())
+    return source
+
+
+def test_parse_cameras_from_json():
+    value = json.dumps([
+        {"id": 1, "rtsp_in": "rtsp://a", "rtsp_out": "rtsp://out/a"},
+        {"id": 2, "name": "door", "rtsp_in": "rtsp://b", "rtsp_out": "rtsp://out/b", "roi": [[[0, 0], [1, 0], [1, 1]]]},
+    ])
+    cameras = parse_cameras(value)
+    assert [(camera.id, camera.name) for camera in cameras] == [(1, "1"), (2, "door")]
+    assert cameras[1].roi == [[[0, 0], [1, 0], [1, 1]]]
+
+
+def test_parse_cameras_falls_back_to_single_camera_env():
+    cameras = parse_cameras(None, "rtsp://in", "rtsp://out", "7")
+    assert cameras == [CameraConfig(7, "7", "rtsp://in", "rtsp://out")]
+    with pytest.raises(ValueError):
+        parse_cameras(None)
+    with pytest.raises(ValueError):
+        parse_cameras(json.dumps([
+            {"name": "a", "rtsp_in": "rtsp://a", "rtsp_out": "rtsp://x"},
+            {"name": "a", "rtsp_in": "rtsp://b", "rtsp_out": "rtsp://y"},
+        ]))
+
+
+def test_source_reads_into_pool_and_finishes():
+    source = make_source("a", frames=5)
+    source.start()
+    source.join(5)
+    assert source.finished.is_set()
+    assert source.frames == 5 and source.fps == 25.0
+    items = [source.queue.get_nowait() for _ in range(5)]
+    assert [frame_id for frame_id, _, _ in items] == list(range(5))
+    assert [int(frame[0, 0, 0]) for _, _, frame in items] == list(range(5))
+    assert source.pool.shape == (36, 64, 3)
+    # Первый кадр выделил декодер, кадры 2-5 заняли буферы пула; буфер неудачного чтения вернулся в пул
+    assert source.pool.available == source.pool.size - 4
+
+
+def test_scheduler_takes_one_frame_per_camera_round_robin():
+    sources = [make_source(name) for name in "abc"]
+    for source in sources:
+        for i in range(4):
+            source.queue.put((i, 0.0, None))
+    scheduler = FairScheduler(sources, max_batch=2, metrics=Metrics())
+    served = []
+    for _ in range(6):
+        batch = scheduler.next_batch(timeout=0)
+        served.append([source.config.name for source, _ in batch])
+    # Пачка не больше max_batch, камеры обходятся по кругу без пропусков
+    assert served == [["a", "b"], ["c", "a"], ["b", "c"], ["a", "b"], ["c", "a"], ["b", "c"]]
+
+
+def test_busy_camera_does_not_starve_others():
+    busy, quiet = make_source("busy", queue_size=100), make_source("quiet")
+    for i in range(50):
+        busy.queue.put((i, 0.0, None))
+    quiet.queue.put((0, 0.0, None))
+    scheduler = FairScheduler([busy, quiet], max_batch=1, metrics=Metrics())
+    first_two = [scheduler.next_batch(timeout=0)[0][0].config.name for _ in range(2)]
+    assert "quiet" in first_two
+
+
+def test_scheduler_wakes_on_new_frame_and_stops_when_sources_finish():
+    source = make_source("a")
+    scheduler = FairScheduler([source], metrics=Metrics())
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(scheduler.next_batch(timeout=5)))
+    waiter.start()
+    source.queue.put((0, 0.0, None))
+    scheduler.notify()
+    waiter.join(5)
+    assert len(result[0]) == 1
+    source.finished.set()
+    assert scheduler.finished
+    assert scheduler.next_batch(timeout=5) == []
+
+
+def test_scheduler_waits_for_other_cameras_up_to_max_wait():
+    a, b = make_source("a"), make_source("b")
+    metrics = Metrics()
+    scheduler = FairScheduler([a, b], max_wait=5.0, metrics=metrics)
+    a.queue.put((0, time.monotonic(), None))
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(scheduler.next_batch(timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    # Пачка ещё не отдана: ждём кадр второй камеры
+    assert not result
+    b.queue.put((0, time.monotonic(), None))
+    scheduler.notify()
+    waiter.join(5)
+    assert [source.config.name for source, _ in result[0]] == ["a", "b"]
+    snapshot = metrics.snapshot()
+    assert snapshot["inference_max_batch"] == 2 and snapshot["inference_max_wait_ms"] == 5000
+    assert snapshot["inference_batches_full"] == 1
+
+
+def test_scheduler_sends_partial_batch_after_max_wait():
+    a, b = make_source("a"), make_source("b")
+    metrics = Metrics()
+    scheduler = FairScheduler([a, b], max_wait=0.05, metrics=metrics)
+    a.queue.put((0, time.monotonic(), None))
+    start = time.monotonic()
+    batch = scheduler.next_batch(timeout=5)
+    assert [source.config.name for source, _ in batch] == ["a"]
+    assert 0.04 <= time.monotonic() - start < 1
+    assert metrics.counter("inference_batches_partial") == 1
+    assert metrics.snapshot()["inference_batch_wait_ms_max"] >= 40
+    # Кадр, который уже прождал max_wait в очереди, уходит сразу
+    a.queue.put((1, time.monotonic() - 1, None))
+    start = time.monotonic()
+    assert len(scheduler.next_batch(timeout=5)) == 1
+    assert time.monotonic() - start < 0.04
+
+
+def test_iou_tracker_keeps_ids_and_shares_counter():
+    counter = iter(range(1, 100))
+    door, hall = IouTracker(id_source=counter), IouTracker(id_source=counter)
+    assert door.update([(0, 0, 10, 10), (50, 50, 60, 60)]) == [1, 2]
+    assert hall.update([(0, 0, 10, 10)]) == [3]
+    # Сдвинутые боксы продолжают свои треки, новый бокс получает новый номер
+    assert door.update([(52, 51, 62, 61), (1, 0, 11, 10), (100, 100, 120, 120)]) == [2, 1, 4]
+
+
+def test_iou_tracker_forgets_tracks_after_max_age():
+    tracker = IouTracker(max_age=2)
+    assert tracker.update([(0, 0, 10, 10)]) == [1]
+    tracker.update([])
+    assert len(tracker) == 1
+    tracker.update([])
+    assert len(tracker) == 0
+    assert tracker.update([(0, 0, 10, 10)]) == [2]
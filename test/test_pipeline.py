@@ -0,0 +1,135 @@
+import threading
+
+import pytest
+
+from metrics import Metrics
+from pipeline import STOP, FrameQueue, Pipeline, Stage
+
+
+def test_stages_process_in_order_and_stop_after_draining():
+    metrics = Metrics()
+    results = []
+    pipeline = Pipeline(metrics)
+    pipeline.add_stage("double", lambda x: x * 2, maxsize=2)
+    pipeline.add_stage("sink", results.append, maxsize=2)
+    pipeline.start()
+    for i in range(20):
+        pipeline.put(i)
+    pipeline.close(timeout=5)
+    assert results == [i * 2 for i in range(20)]
+    assert all(not stage.is_alive() for stage in pipeline.stages)
+    assert metrics.counter("double_items") == 20
+
+
+def test_none_results_are_not_forwarded_and_errors_are_counted():
+    metrics = Metrics()
+    results = []
+
+    def handler(x):
+        if x == 3:
+            raise ValueError("bad frame")
+        return x if x % 2 else None
+
+    pipeline = Pipeline(metrics).add_stage("filter", handler).add_stage("sink", results.append).start()
+    for i in range(6):
+        pipeline.put(i)
+    pipeline.close(timeout=5)
+    assert results == [1, 5]
+    assert metrics.counter("filter_errors") == 1
+
+
+def test_queue_depth_gauges():
+    metrics = Metrics()
+    release = threading.Event()
+    pipeline = Pipeline(metrics).add_stage("slow", lambda x: release.wait(5), maxsize=5)
+    pipeline.start()
+    for i in range(4):
+        pipeline.put(i)
+    # Первый элемент уже в обработке, остальные ждут в очереди
+    assert metrics.snapshot()["slow_queue_depth"] in (3, 4)
+    assert pipeline.queue_depths()["slow"] in (3, 4)
+    release.set()
+    pipeline.close(timeout=5)
+    assert metrics.snapshot()["slow_queue_depth"] == 0
+
+
+def test_stage_forwards_stop_sentinel():
+    from queue import Queue
+    inbox, outbox = Queue(), Queue()
+    stage = Stage("noop", lambda x: x, inbox, outbox, metrics=Metrics())
+    stage.start()
+    inbox.put(STOP)
+    stage.join(5)
+    assert outbox.get_nowait() is STOP
+
+
+def test_metrics_snapshot_combines_counters_and_gauges():
+    metrics = Metrics()
+    metrics.inc("frames", 2)
+    metrics.set_gauge("fps", 12.5)
+    metrics.register_gauge("depth", lambda: 3)
+    metrics.register_gauge("broken", lambda: 1 / 0)
+    assert metrics.snapshot() == {"frames": 2, "fps": 12.5, "depth": 3}
+
+
+def test_block_policy_keeps_every_frame():
+    queue = FrameQueue(maxsize=2, policy="block")
+    assert queue.offer(1) == 0
+    assert queue.offer(2) == 0
+    assert queue.full()
+
+
+def test_drop_oldest_policy_evicts_oldest_frames():
+    queue = FrameQueue(maxsize=2, policy="drop-oldest")
+    dropped = sum(queue.offer(i) for i in range(5))
+    assert dropped == 3 and queue.dropped == 3
+    assert [queue.get_nowait(), queue.get_nowait()] == [3, 4]
+
+
+def test_dropped_items_are_passed_to_on_drop():
+    evicted = []
+    queue = FrameQueue(maxsize=2, policy="drop-oldest", on_drop=evicted.append)
+    for i in range(5):
+        queue.offer(i)
+    assert evicted == [0, 1, 2]
+
+
+def test_latest_only_policy_is_single_slot_mailbox():
+    queue = FrameQueue(maxsize=10, policy="latest-only")
+    for i in range(4):
+        queue.offer(i)
+    assert queue.qsize() == 1
+    assert queue.get_nowait() == 3
+    assert queue.dropped == 3
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        FrameQueue(policy="drop-newest")
+
+
+def test_pipeline_counts_dropped_frames():
+    metrics = Metrics()
+    release = threading.Event()
+    seen = []
+    pipeline = Pipeline(metrics).add_stage("process", lambda x: release.wait(5) and seen.append(x),
+                                           policy="latest-only").start()
+    pipeline.put(0)
+    # Ждём, пока стадия заберёт первый кадр, чтобы остальные конкурировали за одно место
+    while pipeline.queue_depths()["process"]:
+        pass
+    for i in range(1, 6):
+        pipeline.put(i)
+    release.set()
+    pipeline.close(timeout=5)
+    assert seen == [0, 5]
+    assert metrics.counter("process_dropped") == 4
+
+
+def test_metrics_observe_window():
+    metrics = Metrics(window=3)
+    for value in (100, 10, 20, 30):
+        metrics.observe("latency_ms", value)
+    snapshot = metrics.snapshot()
+    assert snapshot["latency_ms_avg"] == 20
+    assert snapshot["latency_ms_max"] == 30
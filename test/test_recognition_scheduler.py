@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from recognition_scheduler import RecognitionScheduler, yaw_ratio
+from track_store import TrackState
+
+
+def sharp_crop(size=64):
+    # Шахматная доска - заведомо резкий кроп
+    board = (np.indices((size, size)).sum(axis=0) % 2 * 255).astype(np.uint8)
+    return np.dstack([board] * 3)
+
+
+def track(track_id, **kwargs):
+    return TrackState(track_id=track_id, first_seen=0.0, last_seen=0.0, **kwargs)
+
+
+def test_select_respects_budget_and_prefers_fresh_tracks():
+    scheduler = RecognitionScheduler(budget=2)
+    old, fresh_a, fresh_b = track(1, attempts=3), track(2), track(3)
+    selected = scheduler.select([(old, sharp_crop()), (fresh_a, sharp_crop()), (fresh_b, sharp_crop())], now=0.0)
+    assert [t.track_id for t, _ in selected] == [2, 3]
+    assert scheduler.counters["attempted"] == 2
+    assert scheduler.counters["skipped_budget"] == 1
+
+
+def test_recognized_tracks_are_not_selected():
+    scheduler = RecognitionScheduler()
+    assert scheduler.select([(track(1, name="Alice"), sharp_crop())], now=0.0) == []
+    assert scheduler.counters["attempted"] == 0
+
+
+def test_exponential_backoff_for_unrecognized_tracks():
+    scheduler = RecognitionScheduler(base_delay=1.0, max_delay=3.0)
+    t = track(1)
+    delays = []
+    for _ in range(4):
+        scheduler.record(t, recognized=False, now=10.0)
+        delays.append(t.next_attempt - 10.0)
+    assert delays == [1.0, 2.0, 3.0, 3.0]
+    assert scheduler.select([(t, sharp_crop())], now=12.0) == []
+    assert scheduler.counters["skipped_backoff"] == 1
+    assert len(scheduler.select([(t, sharp_crop())], now=13.0)) == 1
+
+
+def test_quality_gate_rejects_small_and_blurry_crops():
+    scheduler = RecognitionScheduler(min_face_size=40)
+    flat = np.full((64, 64, 3), 128, dtype=np.uint8)
+    selected = scheduler.select([(track(1), sharp_crop(20)), (track(2), flat), (track(3), sharp_crop())], now=0.0)
+    assert [t.track_id for t, _ in selected] == [3]
+    assert scheduler.counters["skipped_size"] == 1
+    assert scheduler.counters["skipped_blur"] == 1
+
+
+def fake_shape(nose_x):
+    points = {30: (nose_x, 50), 36: (20, 30), 45: (80, 30)}
+    return SimpleNamespace(part=lambda i: SimpleNamespace(x=points[i][0], y=points[i][1]))
+
+
+def test_pose_filter_uses_landmarks():
+    scheduler = RecognitionScheduler(max_yaw_ratio=2.0)
+    assert yaw_ratio(fake_shape(50)) == 1.0
+    assert scheduler.check_pose(fake_shape(50))
+    assert not scheduler.check_pose(fake_shape(78))
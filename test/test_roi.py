@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from roi import RegionOfInterest, parse_roi
+
+# Правая половина кадра и треугольник в её нижней части
+RIGHT_HALF = [[0.5, 0.0], [1.0, 0.0], [1.0, 1.0], [0.5, 1.0]]
+TRIANGLE = [[0.5, 0.5], [1.0, 0.5], [1.0, 1.0]]
+
+
+def test_crop_is_bounding_rectangle_view():
+    frame = np.arange(360 * 640 * 3, dtype=np.uint32).reshape(360, 640, 3).astype(np.uint8)
+    roi = RegionOfInterest([RIGHT_HALF], frame.shape)
+    region = roi.crop(frame)
+    assert region.shape == (360, 320, 3)
+    assert np.shares_memory(region, frame)
+    assert roi.offset == (320, 0)
+    assert roi.area_ratio == pytest.approx(0.5)
+
+
+def test_to_frame_maps_back_by_offset():
+    roi = RegionOfInterest([TRIANGLE], (360, 640))
+    assert roi.offset == (320, 180)
+    assert roi.to_frame((10, 20, 30, 40)) == (330, 200, 350, 220)
+
+
+def test_contains_uses_box_centre():
+    roi = RegionOfInterest([TRIANGLE], (360, 640))
+    assert roi.contains((600, 320, 630, 350))  # Под диагональю треугольника
+    assert not roi.contains((330, 300, 360, 350))  # В прямоугольнике, но вне треугольника
+
+
+def test_mask_blanks_pixels_outside_polygons():
+    frame = np.full((360, 640, 3), 200, dtype=np.uint8)
+    region = RegionOfInterest([TRIANGLE], frame.shape, mask=True).crop(frame)
+    assert region.shape == (180, 320, 3)
+    assert region[170, 310].tolist() == [200, 200, 200]
+    assert region[10, 10].tolist() == [0, 0, 0]
+
+
+def test_parse_roi_accepts_json_and_lists():
+    assert parse_roi('[[[0, 0], [1, 0], [1, 1]]]') == [[[0, 0], [1, 0], [1, 1]]]
+    assert parse_roi([TRIANGLE]) == [TRIANGLE]
+    assert parse_roi(None) is None
+    assert parse_roi("") is None
+    assert parse_roi("[]") is None
+
+
+def test_empty_rectangle_is_rejected():
+    with pytest.raises(ValueError):
+        RegionOfInterest([[[0.5, 0.5], [0.5, 0.5], [0.5, 0.5]]], (360, 640))
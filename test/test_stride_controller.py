@@ -0,0 +1,78 @@
+from metrics import Metrics
+from stride_controller import StrideController, live_detections, match_detections, predict_detections
+
+
+def make_controller(**kwargs):
+    kwargs.setdefault("metrics", Metrics())
+    return StrideController(30, **kwargs)
+
+
+def test_should_detect_follows_stride():
+    controller = make_controller(initial_stride=3)
+    assert [controller.should_detect() for _ in range(7)] == [True, False, False, True, False, False, True]
+
+
+def test_stride_grows_with_detection_latency():
+    controller = make_controller(budget=0.8, smoothing=1.0)
+    controller.observe("frame", 0.005)  # 30 кадров * 5 мс = 0.15 с
+    controller.observe("detect", 0.1)   # 30 детекций * 100 мс не помещаются в 0.65 с
+    assert controller.compute_stride() == 5
+    controller.observe("detect", 0.01)
+    assert controller.compute_stride() == 1
+
+
+def test_stride_is_clamped_and_uses_target_fps():
+    controller = make_controller(max_stride=10, smoothing=1.0)
+    controller.observe("frame", 0.05)  # Кадры сами по себе съедают весь бюджет
+    controller.observe("detect", 0.1)
+    assert controller.compute_stride() == 10
+    slow_target = make_controller(target_fps=5, smoothing=1.0)
+    slow_target.observe("frame", 0.005)
+    slow_target.observe("detect", 0.1)
+    assert slow_target.compute_stride() == 1
+
+
+def test_update_is_rate_limited_and_exports_gauge():
+    metrics = Metrics()
+    controller = StrideController(30, initial_stride=5, smoothing=1.0, update_interval=1.0, metrics=metrics)
+    controller._last_update = 0.0
+    controller.observe("frame", 0.0)
+    controller.observe("detect", 0.02)
+    assert controller.update(now=0.5) == 5
+    assert controller.update(now=1.5) == 1
+    assert metrics.snapshot()["detection_stride"] == 1
+
+
+def test_match_detections_carries_velocity_and_person():
+    previous = [{"box": (0, 0, 10, 10), "frame": 0, "conf": 0.9, "person": "Alice"}]
+    current = [
+        {"box": (2, 0, 12, 10), "frame": 2, "conf": 0.9, "person": None},
+        {"box": (100, 100, 110, 110), "frame": 2, "conf": 0.9, "person": None},
+    ]
+    matched = match_detections(previous, current)
+    assert matched[0]["velocity"] == (1.0, 0.0, 1.0, 0.0)
+    assert matched[0]["person"] == "Alice"
+    assert matched[1]["velocity"] == (0.0, 0.0, 0.0, 0.0)
+    assert matched[1]["person"] is None
+
+    predicted = predict_detections(matched, 5)
+    assert predicted[0]["box"] == (5, 0, 15, 10)
+    assert matched[0]["box"] == (2, 0, 12, 10)
+
+
+def test_names_carry_over_at_large_stride():
+    controller = StrideController(30.0, initial_stride=20, max_stride=30, metrics=Metrics())
+    assert controller.stride > 10
+    tracks = []
+    for frame in range(61):
+        if controller.should_detect():
+            box = (frame, 0, frame + 40, 40)
+            current = [{"box": box, "frame": frame, "conf": 0.9, "person": None}]
+            tracks = match_detections(live_detections(tracks, frame, controller.stride), current)
+            if frame == 0:
+                tracks[0]["person"] = "Alice"
+            assert tracks[0]["person"] == "Alice"
+        # Между детекциями трек продолжает отрисовываться
+        assert live_detections(tracks, frame, controller.stride)
+    assert tracks[0]["frame"] == 60
+    assert tracks[0]["velocity"] == (1.0, 0.0, 1.0, 0.0)
@@ -0,0 +1,58 @@
+import numpy as np
+
+from track_store import TrackStore
+
+
+def test_touch_creates_and_updates_track():
+    store = TrackStore(ttl=3.0)
+    track = store.touch(1, now=10.0)
+    assert track.first_seen == track.last_seen == 10.0
+    assert store.touch(1, now=12.5) is track
+    assert track.duration == 2.5
+    assert 1 in store and len(store) == 1
+
+
+def test_expire_evicts_stale_tracks_with_callback():
+    evicted = []
+    store = TrackStore(ttl=3.0, on_evict=evicted.append)
+    store.touch(1, now=0.0)
+    store.touch(2, now=1.0)
+    store.touch(1, now=2.0)
+    assert [t.track_id for t in store.expire(now=4.5)] == [2]
+    assert [t.track_id for t in evicted] == [2]
+    assert 1 in store and 2 not in store
+    store.expire(now=10.0)
+    assert [t.track_id for t in evicted] == [2, 1]
+    assert len(store) == 0
+
+
+def test_size_limit_evicts_least_recently_seen():
+    evicted = []
+    store = TrackStore(max_tracks=2, on_evict=evicted.append)
+    store.touch(1, now=0.0)
+    store.touch(2, now=1.0)
+    store.touch(1, now=2.0)
+    store.touch(3, now=3.0)
+    assert [t.track_id for t in evicted] == [2]
+    assert sorted(t.track_id for t in store) == [1, 3]
+
+
+def test_update_embedding_keeps_closest():
+    store = TrackStore()
+    store.touch(1)
+    assert store.update_embedding(1, np.full(128, 1.0), 0.5)
+    assert not store.update_embedding(1, np.full(128, 2.0), 0.7)
+    assert store.update_embedding(1, np.full(128, 3.0), 0.3)
+    track = store.get(1)
+    assert track.distance == 0.3
+    assert track.embedding[0] == 3.0
+    assert not store.update_embedding(2, np.zeros(128), 0.1)
+
+
+def test_clear_evicts_everything():
+    evicted = []
+    store = TrackStore(on_evict=evicted.append)
+    store.touch(1)
+    store.touch(2)
+    store.clear()
+    assert len(evicted) == 2 and len(store) == 0
@@ -0,0 +1,96 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class TrackState:
+    """Состояние одного трека: кто это и насколько уверенно распознан"""
+    track_id: int
+    first_seen: float
+    last_seen: float
+    name: Optional[str] = None
+    person_id: Optional[int] = None  # id в persons, известен вместе с name
+    embedding: Optional[np.ndarray] = None  # Лучший эмбеддинг за время жизни трека
+    distance: float = field(default=float("inf"))  # Расстояние до галереи для этого эмбеддинга
+    attempts: int = 0  # Сколько раз пытались распознать
+    next_attempt: float = 0.0  # Раньше этого времени повторно не распознаём
+
+    @property
+    def duration(self) -> float:
+        return self.last_seen - self.first_seen
+
+
+class TrackStore:
+    """Ограниченное хранилище треков с вытеснением по TTL и по размеру.
+
+    Треки лежат в OrderedDict в порядке последнего появления, поэтому поиск
+    по track_id - O(1), а самые старые треки всегда в начале. Вытесненные
+    треки передаются в on_evict (stream-processor логирует по ним exit).
+    """
+
+    def __init__(self, max_tracks: int = 1024, ttl: float = 3.0,
+                 on_evict: Optional[Callable[[TrackState], None]] = None):
+        self.max_tracks = max_tracks
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._tracks: "OrderedDict[int, TrackState]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def __iter__(self) -> Iterator[TrackState]:
+        return iter(list(self._tracks.values()))
+
+    def get(self, track_id: int) -> Optional[TrackState]:
+        return self._tracks.get(track_id)
+
+    def touch(self, track_id: int, now: Optional[float] = None) -> TrackState:
+        """Отмечает появление трека в кадре, создавая его при необходимости"""
+        now = time.time() if now is None else now
+        state = self._tracks.get(track_id)
+        if state is None:
+            state = TrackState(track_id=track_id, first_seen=now, last_seen=now)
+            self._tracks[track_id] = state
+            while len(self._tracks) > self.max_tracks:
+                self._evict(next(iter(self._tracks)))
+        else:
+            state.last_seen = now
+            self._tracks.move_to_end(track_id)
+        return state
+
+    def update_embedding(self, track_id: int, embedding: np.ndarray, distance: float) -> bool:
+        """Запоминает эмбеддинг, если он ближе к галерее, чем сохранённый"""
+        state = self._tracks.get(track_id)
+        if state is None or (state.embedding is not None and distance >= state.distance):
+            return False
+        state.embedding = np.array(embedding, dtype=np.float32)
+        state.distance = float(distance)
+        return True
+
+    def expire(self, now: Optional[float] = None) -> List[TrackState]:
+        """Вытесняет треки, которых не было дольше ttl секунд"""
+        now = time.time() if now is None else now
+        expired = []
+        while self._tracks:
+            state = next(iter(self._tracks.values()))
+            if now - state.last_seen <= self.ttl:
+                break
+            expired.append(self._evict(state.track_id))
+        return expired
+
+    def clear(self) -> List[TrackState]:
+        """Вытесняет все треки, например при остановке потока"""
+        return [self._evict(track_id) for track_id in list(self._tracks)]
+
+    def _evict(self, track_id: int) -> TrackState:
+        state = self._tracks.pop(track_id)
+        if self.on_evict is not None:
+            self.on_evict(state)
+        return state